@@ -1,30 +1,395 @@
+import itertools
+import threading
+import time
+from contextlib import ExitStack, contextmanager
 import requests
-from .utils.log import debug
+from .cache import DEFAULT_CACHE_BYTES, ResponseCache
+from .governor import RateGovernor, is_throttled
+from .metrics import Metrics
+from .transport import DEFAULT_RETRIES, SessionToken, make_session
+from .utils.index import MoIndex
+from .utils.jsonstream import ImdataStream
+from .utils.log import debug, warn
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-class AciApi:
-    def __init__(self, apic, user, pw, insecure=False, debug_enabled=False):
-        self.apic = apic.rstrip('/')
-        self.s = requests.Session()
-        self.s.verify = not insecure
+
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# Seconds a failed APIC cluster member is skipped before it is tried again.
+MEMBER_DOWN_SECONDS = 30
+
+class ApicMember:
+    """One APIC controller: its own keep-alive session, login token and rate governor."""
+
+    def __init__(self, url, user, pw, insecure=False, pool_size=10, retries=DEFAULT_RETRIES, max_rps=0,
+                 token_cache=None, debug_enabled=False):
+        self.url = url.rstrip('/')
+        # Size the pool for concurrent tenant workers sharing this session.
+        self.s = make_session(insecure, pool_size, retries)
+        # Adapts in-flight requests to this controller's throttling, never beyond the pool.
+        self.governor = RateGovernor(max_inflight=pool_size, max_rps=max_rps)
+        # Optional TokenCache: reuse a live session from an earlier run instead of logging in.
+        self.token_cache = token_cache
+        self.session_token = None
         self.debug_enabled = debug_enabled
-        self.login(user, pw)
+        self.down_until = 0.0
+        self._user, self._pw = user, pw
+        self._auth_lock = threading.Lock()
+
+    @property
+    def token(self):
+        return self.session_token.token if self.session_token else None
 
-    def login(self, user, pw):
-        url = f"{self.apic}/api/aaaLogin.json"
-        r = self.s.post(url, json={'aaaUser': {'attributes': {'name': user, 'pwd': pw}}})
+    def available(self):
+        return time.monotonic() >= self.down_until
+
+    def mark_down(self):
+        self.down_until = time.monotonic() + MEMBER_DOWN_SECONDS
+
+    def start_session(self):
+        cached = self.token_cache.get(self.url, self._user) if self.token_cache else None
+        if cached:
+            self.s.cookies.set('APIC-cookie', cached.token)
+            self.session_token = cached
+            try:
+                self.refresh_session()
+                debug(f"Reusing cached APIC session on {self.url}", self.debug_enabled)
+                return
+            except requests.RequestException:
+                self.s.cookies.clear()
+                self.session_token = None
+        self.login()
+
+    def login(self):
+        url = f"{self.url}/api/aaaLogin.json"
+        r = self.s.post(url, json={'aaaUser': {'attributes': {'name': self._user, 'pwd': self._pw}}})
         r.raise_for_status()
+        self._set_token(r.json())
 
-    def mo_subtree(self, dn, extra=""):
-        url = f"{self.apic}/api/node/mo/{dn}.json?query-target=subtree&rsp-subtree=full{extra}"
-        debug(f"GET {url}", self.debug_enabled)
-        r = self.s.get(url)
+    def refresh_session(self):
+        r = self.s.get(f"{self.url}/api/aaaRefresh.json")
         r.raise_for_status()
-        return r.json()
+        self._set_token(r.json())
 
-    def class_query(self, cls, extra=""):
+    def _set_token(self, data):
+        self.session_token = SessionToken.from_response(data) or self.session_token
+        if self.token_cache and self.session_token:
+            self.token_cache.put(self.url, self._user, self.session_token)
+
+    def _ensure_session(self):
+        """Refresh the session token before it expires; log in again if that fails."""
+        if self.session_token is None or not self.session_token.needs_refresh():
+            return
+        with self._auth_lock:
+            if not self.session_token.needs_refresh():
+                return
+            try:
+                self.refresh_session()
+            except requests.RequestException:
+                self.login()
+
+    def get(self, url, **kwargs):
+        """GET ``url`` with a live session, logging in again once on 401/403."""
+        if self.session_token is None:
+            # Down at startup; log in now that it is being tried again.
+            with self._auth_lock:
+                if self.session_token is None:
+                    self.start_session()
+        self._ensure_session()
+        token = self.token
+        r = self.s.get(url, **kwargs)
+        if r.status_code in (401, 403) and self._pw is not None:
+            r.close()
+            with self._auth_lock:
+                if self.token == token:
+                    debug(f"APIC session on {self.url} rejected, logging in again", self.debug_enabled)
+                    self.login()
+            r = self.s.get(url, **kwargs)
+        return r
+
+class AciApi:
+    def __init__(self, apic, user, pw, insecure=False, debug_enabled=False, cache_bytes=DEFAULT_CACHE_BYTES,
+                 pool_size=10, page_size=0, store=None, store_mode=None, retries=DEFAULT_RETRIES,
+                 token_cache=None, max_rps=0):
+        """
+        ``apic`` is one controller URL or a list of APIC cluster members;
+        queries are spread round-robin over the members that are up.
+        """
+        urls = [apic] if isinstance(apic, str) else list(apic)
+        self.members = [ApicMember(u, user, pw, insecure=insecure, pool_size=pool_size, retries=retries,
+                                   max_rps=max_rps, token_cache=token_cache, debug_enabled=debug_enabled)
+                        for u in urls]
+        # Request URLs are built on the first member and re-targeted per request.
+        self.apic = self.members[0].url
+        self._turn = itertools.count()
+        # Member holding the subscriptions and the event websocket, chosen on first use
+        self._pinned = None
+        self._pin_lock = threading.Lock()
+        self.debug_enabled = debug_enabled
+        # APIC page-size for class/subtree queries; 0 fetches each query in one response.
+        self.page_size = page_size
+        # Every harvester asks for the same tenant subtree; keep one parsed copy per run.
+        self.cache = ResponseCache(cache_bytes)
+        self.metrics = Metrics()
+        # url -> [lock, number of threads holding or waiting for it]; dropped when the last one leaves
+        self._fetch_locks = {}
+        self._fetch_locks_guard = threading.Lock()
+        self.subtree_classes = None
+        self.subtree_child_classes = None
+        # Optional on-disk ResponseStore: 'record' saves every response, 'replay' serves only from it.
+        self.store = store
+        self.store_mode = store_mode if store is not None else None
+        if self.store_mode != 'replay':
+            self._start_sessions()
+
+    @property
+    def token(self):
+        return self.members[0].token
+
+    def _start_sessions(self):
+        failures = []
+        for member in self.members:
+            try:
+                member.start_session()
+            except requests.RequestException as exc:
+                warn(f"APIC {member.url} unavailable: {exc}")
+                member.mark_down()
+                failures.append(exc)
+        if len(failures) == len(self.members):
+            raise failures[0]
+
+    def refresh_session(self):
+        for member in self.members:
+            if member.session_token is not None:
+                member.refresh_session()
+
+    def pinned_member(self):
+        """
+        The member subscriptions, their refreshes and the event websocket use:
+        the first member that is up and logged in when first asked, then kept.
+        """
+        with self._pin_lock:
+            if self._pinned is None:
+                self._pinned = next((m for m in self.members if m.available() and m.session_token is not None),
+                                    self.members[0])
+                debug(f"Subscriptions pinned to {self._pinned.url}", self.debug_enabled)
+            return self._pinned
+
+    def _members_in_turn(self):
+        """Members to try for one request: round-robin start, members that are up first."""
+        start = next(self._turn) % len(self.members)
+        order = self.members[start:] + self.members[:start]
+        return [m for m in order if m.available()] + [m for m in order if not m.available()]
+
+    @contextmanager
+    def _request(self, url, pinned=False, **kwargs):
+        """
+        GET ``url`` on the next APIC member, failing over to the others on
+        connection errors and 5xx answers.  ``pinned`` keeps the request on
+        pinned_member() (subscriptions live on the controller that made
+        them).  The member's governor slot is held until the block exits.
+        """
+        path = url[len(self.apic):]
+        members = [self.pinned_member()] if pinned else self._members_in_turn()
+        for i, member in enumerate(members):
+            last = i == len(members) - 1
+            debug(f"GET {member.url}{path}", self.debug_enabled)
+            member.governor.acquire()
+            try:
+                r = member.get(member.url + path, **kwargs)
+            except requests.RequestException as exc:
+                # No response at all (connection failed after retries) counts as throttling.
+                member.governor.release(None, True)
+                if last:
+                    raise
+                warn(f"APIC {member.url} failed ({exc}), trying the next member")
+                member.mark_down()
+                continue
+            if r.status_code >= 500 and not last:
+                member.governor.release(r.elapsed.total_seconds(), is_throttled(r))
+                r.close()
+                warn(f"APIC {member.url} answered {r.status_code}, trying the next member")
+                member.mark_down()
+                continue
+            break
+        try:
+            yield r
+        finally:
+            member.governor.release(r.elapsed.total_seconds(), is_throttled(r))
+            r.close()
+
+    def subscribe_class(self, cls, extra=""):
+        """
+        Run a class query with ``subscription=yes``.  Returns (MOs, subscription
+        id); the APIC then pushes changes to those MOs over the event websocket.
+        """
         url = f"{self.apic}/api/class/{cls}.json{extra}"
-        debug(f"GET {url}", self.debug_enabled)
-        r = self.s.get(url)
-        r.raise_for_status()
-        return r.json()
+        url += f"{'&' if '?' in url else '?'}subscription=yes"
+        page_info = {}
+        mos = list(self._get_page(url, page_info=page_info, pinned=True))
+        return mos, page_info['meta'].get('subscriptionId')
+
+    def refresh_subscription(self, subscription_id):
+        with self._request(f"{self.apic}/api/subscriptionRefresh.json?id={subscription_id}", pinned=True) as r:
+            r.raise_for_status()
+
+    def events_url(self):
+        """Websocket URL on which the pinned member pushes subscription events."""
+        member = self.pinned_member()
+        scheme = 'wss' if member.url.startswith('https://') else 'ws'
+        return f"{scheme}://{member.url.split('://', 1)[-1]}/socket{member.token}"
+
+    def set_subtree_classes(self, classes, child_classes=None):
+        """
+        Restrict subtree queries to the MO classes the harvesters consume.
+        ``child_classes`` are the classes some harvesters read inline from a
+        parent MO's ``children`` (e.g. healthInst under fvCtx).
+        """
+        self.subtree_classes = list(classes) if classes else None
+        self.subtree_child_classes = list(child_classes) if child_classes else None
+
+    def subtree_query(self, classes=None, child_classes=None):
+        if classes is None:
+            classes, child_classes = self.subtree_classes, self.subtree_child_classes
+        if not classes:
+            return "query-target=subtree&rsp-subtree=full"
+        query = f"query-target=subtree&target-subtree-class={','.join(classes)}"
+        if child_classes:
+            query += f"&rsp-subtree=children&rsp-subtree-class={','.join(child_classes)}"
+        return query
+
+    def _get_page(self, url, sizes=None, page_info=None, pinned=False):
+        """
+        GET ``url`` and yield its imdata MOs as they are decoded from the
+        response stream, so memory is bounded by the largest single MO rather
+        than the whole body.  ``page_info`` receives the MO count and totalCount.
+        """
+        received, count, first_byte = 0, 0, None
+        source = url
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                if self.store_mode == 'replay':
+                    debug(f"REPLAY {url}", self.debug_enabled)
+                    body = self.store.replay(url[len(self.apic):])
+                else:
+                    r = stack.enter_context(self._request(url, pinned=pinned, stream=True))
+                    source, first_byte = r.url, r.elapsed.total_seconds()
+                    r.raise_for_status()
+                    body = r.iter_content(STREAM_CHUNK_BYTES)
+                    if self.store_mode == 'record':
+                        body = self.store.record(url[len(self.apic):], body)
+
+                def chunks():
+                    nonlocal received
+                    for chunk in body:
+                        received += len(chunk)
+                        yield chunk
+
+                body_chunks = chunks()
+                stream = ImdataStream(body_chunks)
+                for mo in stream:
+                    count += 1
+                    yield mo
+                # Drain trailing bytes so a recording is stored complete.
+                for _ in body_chunks:
+                    pass
+                if page_info is not None:
+                    page_info.update(count=count, total=stream.total_count or 0, meta=stream.meta)
+        finally:
+            self.metrics.record_request(source, time.perf_counter() - start, received, count, first_byte)
+            if sizes is not None:
+                sizes.append(received)
+
+    def _get_mos(self, url, order_by=None, sizes=None):
+        """
+        Yield the imdata MOs of ``url``, one APIC page at a time when
+        ``page_size`` is set.  Pages are ordered by ``order_by`` so they stay
+        stable while we walk them.  Response body sizes are appended to ``sizes``.
+        """
+        if not self.page_size or 'page-size=' in url:
+            # Unpaged, or the caller asked for a specific page itself
+            yield from self._get_page(url, sizes)
+            return
+
+        sep = '&' if '?' in url else '?'
+        if order_by and 'order-by=' not in url:
+            url = f"{url}{sep}order-by={order_by}"
+            sep = '&'
+        page, seen = 0, 0
+        while True:
+            page_info = {}
+            yield from self._get_page(f"{url}{sep}page-size={self.page_size}&page={page}", sizes, page_info)
+            seen += page_info['count']
+            page += 1
+            if not page_info['count'] or seen >= page_info['total']:
+                break
+
+    def iter_subtree(self, dn, extra="", classes=None, child_classes=None, sizes=None):
+        """Stream the MOs of a (class-filtered) subtree without caching them."""
+        if classes is None:
+            classes = self.subtree_classes
+            child_classes = self.subtree_child_classes if child_classes is None else child_classes
+        url = f"{self.apic}/api/node/mo/{dn}.json?{self.subtree_query(classes, child_classes)}{extra}"
+        order_by = ','.join(f"{c}.dn" for c in classes) if classes else None
+        return self._get_mos(url, order_by=order_by, sizes=sizes)
+
+    def mo_subtree(self, dn, extra="", classes=None, child_classes=None):
+        index = self.subtree_index(dn, extra, classes=classes, child_classes=child_classes)
+        return {'totalCount': str(len(index)), 'imdata': index.imdata}
+
+    def subtree_index(self, dn, extra="", classes=None, child_classes=None):
+        """
+        Return a cached MoIndex over the subtree of ``dn``, limited to
+        ``classes`` (default: the set from set_subtree_classes, else everything).
+        """
+        url = f"{self.apic}/api/node/mo/{dn}.json?{self.subtree_query(classes, child_classes)}{extra}"
+        index = self.cache.get(url)
+        if index is not None:
+            debug(f"CACHE {url}", self.debug_enabled)
+            return index
+        # Concurrent workers asking for the same DN (e.g. a shared VMM domain) wait for one fetch.
+        with self._fetch_lock(url):
+            index = self.cache.get(url)
+            if index is not None:
+                return index
+            sizes = []
+            try:
+                index = MoIndex(self.iter_subtree(dn, extra, classes=classes, child_classes=child_classes, sizes=sizes))
+            except requests.HTTPError as exc:
+                # An APIC that does not know one of the filter classes rejects the whole query
+                filtered = classes if classes is not None else self.subtree_classes
+                if not filtered or exc.response is None or exc.response.status_code != 400:
+                    raise
+                warn(f"APIC rejected the class filter for {dn} ({exc}), fetching the whole subtree")
+                sizes = []
+                index = MoIndex(self.iter_subtree(dn, extra, classes=(), sizes=sizes))
+            self.cache.put(url, index, sum(sizes))
+        return index
+
+    def release_subtree(self, dn, extra="", classes=None, child_classes=None):
+        """Drop the cached subtree_index() of ``dn`` once nothing will read it again."""
+        self.cache.discard(f"{self.apic}/api/node/mo/{dn}.json?{self.subtree_query(classes, child_classes)}{extra}")
+
+    @contextmanager
+    def _fetch_lock(self, url):
+        with self._fetch_locks_guard:
+            entry = self._fetch_locks.setdefault(url, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._fetch_locks_guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._fetch_locks[url]
+
+    def iter_class(self, cls, extra=""):
+        """Stream every MO of ``cls``, paginated by DN when page_size is set."""
+        url = f"{self.apic}/api/class/{cls}.json{extra}"
+        return self._get_mos(url, order_by=f"{cls}.dn")
+
+    def class_query(self, cls, extra=""):
+        imdata = list(self.iter_class(cls, extra))
+        return {'totalCount': str(len(imdata)), 'imdata': imdata}
@@ -0,0 +1,136 @@
+import json
+import os
+import time
+from collections.abc import Mapping
+
+from .utils.log import info, warn
+
+CHECKPOINT_FILE = '.harvest-checkpoint.ndjson'
+
+
+def checkpoint_path(outdir):
+    return os.path.join(outdir, CHECKPOINT_FILE)
+
+
+def _line(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+class HarvestCheckpoint(Mapping):
+    """
+    The tenant entries of a harvest in progress, appended to an ndjson file
+    (one flushed and fsynced line per tenant) as each tenant completes.  The
+    first line records the sections and audit watermark of the run.
+
+    With ``resume``, the entries already in the file are kept and the file
+    is appended to; a line cut short by the crash is dropped, and a
+    checkpoint of other sections is started over.  Otherwise any previous
+    checkpoint is discarded.
+
+    As a mapping of tenant name -> entry it holds only byte offsets and
+    reads an entry back when asked, which is how iter_harvest's ``reuse``
+    consumes it.  Failed tenants are not written, so resuming retries them.
+    """
+
+    def __init__(self, path, sections, watermark=None, resume=False):
+        self.path = path
+        self.offsets = {}
+        self.failed = []
+        self.resumed = False
+        self.header = {'sections': sections, 'watermark': watermark,
+                       'started': time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+        end = self._load(sections) if resume else None
+        if end is not None:
+            self.resumed = True
+            self._file = open(path, 'r+b')
+            self._file.truncate(end)
+            self._file.seek(end)
+            info(f"Resuming the harvest started {self.header.get('started')}: "
+                 f"{len(self.offsets)} tenant(s) already harvested")
+        else:
+            if not resume and os.path.exists(path):
+                info("Discarding the checkpoint of an interrupted harvest (--resume continues it)")
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._file = open(path, 'wb')
+            self._append(_line(self.header))
+        self._reader = None
+
+    @property
+    def watermark(self):
+        return self.header.get('watermark')
+
+    def _load(self, sections):
+        """Offsets of the entries in an existing checkpoint; returns the end of its last complete line, or None."""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            info("No checkpoint to resume, harvesting everything")
+            return None
+        with f:
+            try:
+                header = json.loads(f.readline())
+            except ValueError:
+                header = None
+            if not isinstance(header, dict) or header.get('sections') != sections:
+                warn("The checkpoint is from other sections or unreadable, harvesting everything")
+                return None
+            end = f.tell()
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    name = json.loads(line)['name']
+                except (ValueError, KeyError, TypeError):
+                    break
+                self.offsets[name] = (end, len(line))
+                end += len(line)
+        self.header = header
+        return end
+
+    def _append(self, data):
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def add(self, entry):
+        name = entry.get('name')
+        if name in self.offsets:
+            return
+        data = _line(entry)
+        self.offsets[name] = (self._file.tell(), len(data))
+        self._append(data)
+
+    def fail(self, name):
+        self.failed.append(name)
+
+    def __getitem__(self, name):
+        offset, length = self.offsets[name]
+        if self._reader is None:
+            self._reader = open(self.path, 'rb')
+        self._reader.seek(offset)
+        return json.loads(self._reader.read(length))
+
+    def __contains__(self, name):
+        return name in self.offsets
+
+    def __iter__(self):
+        return iter(self.offsets)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def close(self):
+        self._file.close()
+        if self._reader is not None:
+            self._reader.close()
+
+    def finish(self):
+        """
+        End of a run whose output is written: the checkpoint is removed, or
+        kept when tenants failed so that ``--resume`` harvests only those.
+        """
+        self.close()
+        if self.failed:
+            info(f"{len(self.failed)} tenant(s) failed; --resume harvests only them")
+        else:
+            os.remove(self.path)
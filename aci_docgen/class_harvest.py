@@ -0,0 +1,108 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .utils.index import MoIndex
+from .utils.log import debug, warn
+
+def tenant_dn_of(dn):
+    """uni/tn-T/ap-A/epg-E -> uni/tn-T ('' for DNs outside a tenant)."""
+    if not dn or not dn.startswith('uni/tn-'):
+        return ''
+    return 'uni/tn-' + dn[len('uni/tn-'):].split('/', 1)[0]
+
+
+class ClassQueryApi:
+    """
+    Stand-in for AciApi that answers tenant ``subtree_index`` calls from
+    fabric-wide class queries, so the number of APIC requests depends on the
+    number of classes rather than the number of tenants.  Anything outside a
+    tenant (e.g. VMM domains) is passed through to the wrapped API.
+    """
+
+    def __init__(self, api, classes, child_classes=None, workers=1, subscribe=False):
+        self.api = api
+        self.classes = list(classes)
+        self.child_classes = child_classes or {}
+        self.workers = workers
+        # With subscribe=True every class query also opens an APIC event subscription.
+        self.subscribe = subscribe
+        self.subscription_ids = []
+        self.cache = api.cache
+        self.members = api.members
+        self.metrics = api.metrics
+        self.debug_enabled = api.debug_enabled
+        self._tenants = {}
+
+    def load(self):
+        def fetch(cls):
+            extra = f"?order-by={cls}.dn"
+            if self.child_classes.get(cls):
+                # Children some harvesters read inline from the parent MO
+                extra += f"&rsp-subtree=children&rsp-subtree-class={','.join(self.child_classes[cls])}"
+            if self.subscribe:
+                mos, subscription_id = self.api.subscribe_class(cls, extra)
+                if subscription_id:
+                    self.subscription_ids.append(subscription_id)
+                return mos
+            return self.api.iter_class(cls, extra)
+
+        def fetch_known(cls):
+            try:
+                yield from fetch(cls)
+            except requests.HTTPError as exc:
+                # An APIC answers 400 for a class its version lacks
+                if exc.response is None or exc.response.status_code != 400:
+                    raise
+                warn(f"APIC rejected class {cls} ({exc}), skipping it")
+
+        if self.workers > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                results = list(pool.map(lambda cls: list(fetch_known(cls)), self.classes))
+        else:
+            # Consume each class as a stream of pages
+            results = (fetch_known(cls) for cls in self.classes)
+
+        for mos in results:
+            for item in mos:
+                cls = next(iter(item))
+                tenant_dn = tenant_dn_of(item[cls].get('attributes', {}).get('dn', ''))
+                if tenant_dn:
+                    self.tenant_index(tenant_dn).add(item)
+        debug(f"Class queries: {len(self.classes)} classes over {len(self._tenants)} tenants", self.debug_enabled)
+        return self
+
+    def tenant_index(self, tenant_dn):
+        """The live MoIndex of a tenant, created empty if it has no MOs yet."""
+        if tenant_dn not in self._tenants:
+            self._tenants[tenant_dn] = MoIndex()
+        return self._tenants[tenant_dn]
+
+    def drop_tenant(self, tenant_dn):
+        self._tenants.pop(tenant_dn, None)
+
+    def release_subtree(self, dn, extra="", classes=None, child_classes=None):
+        if tenant_dn_of(dn) == dn:
+            self.drop_tenant(dn)
+        else:
+            self.api.release_subtree(dn, extra, classes=classes, child_classes=child_classes)
+
+    def subtree_index(self, dn, extra="", classes=None, child_classes=None):
+        if tenant_dn_of(dn) == dn:
+            return self._tenants.get(dn) or MoIndex()
+        return self.api.subtree_index(dn, extra, classes=classes, child_classes=child_classes)
+
+    def mo_subtree(self, dn, extra="", classes=None, child_classes=None):
+        index = self.subtree_index(dn, extra, classes=classes, child_classes=child_classes)
+        return {'totalCount': str(len(index)), 'imdata': index.imdata}
+
+    def iter_subtree(self, dn, extra="", classes=None, child_classes=None, sizes=None):
+        if tenant_dn_of(dn) == dn:
+            return iter(self.subtree_index(dn).imdata)
+        return self.api.iter_subtree(dn, extra, classes=classes, child_classes=child_classes, sizes=sizes)
+
+    def iter_class(self, cls, extra=""):
+        return self.api.iter_class(cls, extra)
+
+    def class_query(self, cls, extra=""):
+        return self.api.class_query(cls, extra)
@@ -0,0 +1,265 @@
+import hashlib
+import json
+import os
+
+from .snapshot import SnapshotReader, find_snapshot, read_snapshot
+
+TREE_FILE = 'hashtree.json'
+# Identity of an object within its section; EPG names repeat across application profiles
+OBJECT_KEYS = {'epgs': ('ap', 'name')}
+
+
+def _digest(text):
+    # 128-bit BLAKE2: collision-safe for change detection, half the size of sha256 in the stored tree
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def object_hash(obj):
+    return _digest(json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(',', ':')))
+
+
+def _combine(hashes):
+    """Hash of a node from its children's (key, hash) pairs."""
+    return _digest('\n'.join(f"{k}\t{h}" for k, h in sorted(hashes.items())))
+
+
+def object_key(section, obj, position):
+    if isinstance(obj, dict):
+        fields = OBJECT_KEYS.get(section, ('name',))
+        if all(obj.get(f) is not None for f in fields):
+            return '/'.join(str(obj[f]) for f in fields)
+        if obj.get('dn'):
+            return obj['dn']
+    return f"#{position}"
+
+
+def _keyed(section, objects):
+    keyed = {}
+    for position, obj in enumerate(objects):
+        key = object_key(section, obj, position)
+        unique, n = key, 1
+        while unique in keyed:
+            n += 1
+            unique = f"{key}#{n}"
+        keyed[unique] = obj
+    return keyed
+
+
+def _sections(entry):
+    """Section name -> {object key: object} for one tenant entry."""
+    sections = {}
+    for key, value in entry.items():
+        if key == 'name':
+            continue
+        sections[key] = _keyed(key, value) if isinstance(value, list) else {key: value}
+    return sections
+
+
+def tenant_node(entry):
+    """Hash tree of one tenant: a hash per object, per section and for the tenant."""
+    sections = {}
+    for section, objects in _sections(entry).items():
+        hashes = {k: object_hash(o) for k, o in objects.items()}
+        sections[section] = {'hash': _combine(hashes), 'objects': hashes}
+    return {'hash': _combine({s: n['hash'] for s, n in sections.items()}), 'sections': sections}
+
+
+class HashTree:
+    """
+    Merkle-style hashes of a snapshot: root -> tenant -> section (vrfs, bds,
+    epgs, ...) -> object, each node hashing its children.  Two trees are
+    compared top-down, descending only where hashes differ.
+    """
+
+    def __init__(self, tenants=None):
+        self.tenants = tenants if tenants is not None else {}
+
+    def add(self, entry):
+        node = self.tenants[entry['name']] = tenant_node(entry)
+        return node
+
+    @classmethod
+    def from_data(cls, data):
+        tree = cls()
+        for entry in data.get('tenants', []):
+            tree.add(entry)
+        return tree
+
+    @property
+    def root(self):
+        return _combine({name: node['hash'] for name, node in self.tenants.items()})
+
+    def to_json(self):
+        return json.dumps({'root': self.root, 'tenants': self.tenants}, ensure_ascii=False, sort_keys=True)
+
+    @classmethod
+    def load(cls, path):
+        """The tree stored at ``path``, or None if there is none (or it is unreadable)."""
+        try:
+            with open(path, encoding='utf-8') as f:
+                return cls(json.load(f)['tenants'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def _change(old, new):
+    if isinstance(old, list) and isinstance(new, list):
+        # Items of list fields (subnets, static paths, contracts...) are reported one by one
+        old_h, new_h = {object_hash(v): v for v in old}, {object_hash(v): v for v in new}
+        return {'added': [v for h, v in new_h.items() if h not in old_h],
+                'removed': [v for h, v in old_h.items() if h not in new_h]}
+    return {'old': old, 'new': new}
+
+
+def _fields(old, new):
+    """Top-level fields that differ between two versions of an object."""
+    if not (isinstance(old, dict) and isinstance(new, dict)):
+        return {'value': _change(old, new)}
+    return {f: _change(old.get(f), new.get(f)) for f in sorted(set(old) | set(new)) if old.get(f) != new.get(f)}
+
+
+def diff_tenant(old_node, new_node, old_entry=None, new_entry=None):
+    """
+    Changes in one tenant, descending only into sections whose hashes
+    differ.  With both entries at hand, modified objects list their changed
+    fields.  Returns {section: {'added': [...], 'removed': [...], 'modified': {key: fields}}}.
+    """
+    old_objects = _sections(old_entry) if old_entry is not None else {}
+    new_objects = _sections(new_entry) if new_entry is not None else {}
+    changes = {}
+    for section in sorted(set(old_node['sections']) | set(new_node['sections'])):
+        old = old_node['sections'].get(section, {'hash': None, 'objects': {}})
+        new = new_node['sections'].get(section, {'hash': None, 'objects': {}})
+        if old['hash'] == new['hash']:
+            continue
+        old_h, new_h = old['objects'], new['objects']
+        modified = {}
+        for key in sorted(set(old_h) & set(new_h)):
+            if old_h[key] == new_h[key]:
+                continue
+            if section in old_objects and section in new_objects:
+                modified[key] = _fields(old_objects[section].get(key), new_objects[section].get(key))
+            else:
+                modified[key] = {}
+        changes[section] = {
+            'added': sorted(set(new_h) - set(old_h)),
+            'removed': sorted(set(old_h) - set(new_h)),
+            'modified': modified,
+        }
+    return changes
+
+
+class ChangeTracker:
+    """
+    Builds the hash tree of a new snapshot tenant by tenant and diffs each
+    tenant against ``previous`` as it arrives, so only changed tenants are
+    looked up (``load_previous(name)`` returns the old entry, or None).
+    Without a previous tree there is nothing to compare (``result()['previous']`` is None).
+    """
+
+    def __init__(self, previous=None, load_previous=None):
+        self.tree = HashTree()
+        self.previous = previous
+        self.load_previous = load_previous
+        self.added = []
+        self.failed = []
+        self.changed = {}
+
+    def add(self, entry):
+        node = self.tree.add(entry)
+        if self.previous is None:
+            return
+        old = self.previous.tenants.get(entry['name'])
+        if old is None:
+            self.added.append(entry['name'])
+        elif old['hash'] != node['hash']:
+            old_entry = self.load_previous(entry['name']) if self.load_previous else None
+            self.changed[entry['name']] = diff_tenant(old, node, old_entry, entry)
+
+    def fail(self, name):
+        # Not harvested this time: unknown rather than removed
+        self.failed.append(name)
+
+    def result(self):
+        if self.previous is None:
+            return {'previous': None, 'current': self.tree.root, 'tenants': {}}
+        return {
+            'previous': self.previous.root,
+            'current': self.tree.root,
+            'tenants': {
+                'added': self.added,
+                'removed': sorted(set(self.previous.tenants) - set(self.tree.tenants) - set(self.failed)),
+                'failed': self.failed,
+                'changed': self.changed,
+            },
+        }
+
+
+def diff_trees(previous, current, load_previous=None, load_current=None, failed=()):
+    """
+    Diff two stored trees; the loaders give field-level detail for modified
+    objects, and ``failed`` names the tenants the current run could not harvest.
+    """
+    tracker = ChangeTracker(previous, load_previous)
+    tracker.tree = current
+    for name in failed:
+        tracker.fail(name)
+    if previous.root == current.root:
+        return tracker.result()
+    for name, node in current.tenants.items():
+        old = previous.tenants.get(name)
+        if old is None:
+            tracker.added.append(name)
+        elif old['hash'] != node['hash']:
+            tracker.changed[name] = diff_tenant(
+                old, node, load_previous(name) if load_previous else None, load_current(name) if load_current else None)
+    return tracker.result()
+
+
+def tree_path(repdir):
+    return os.path.join(repdir, TREE_FILE)
+
+
+def _entry_loader(reader):
+    def load(name):
+        try:
+            return reader.tenant(name)
+        except (KeyError, OSError, ValueError, RuntimeError):
+            return None
+    return load
+
+
+def previous_run(repdir):
+    """
+    (tree, reader) of the run last written to ``repdir``: its stored hash
+    tree and a SnapshotReader on its snapshot (None for what is missing).
+    """
+    tree = HashTree.load(tree_path(repdir))
+    path = find_snapshot(repdir) if tree is not None else None
+    try:
+        reader = SnapshotReader(path) if path else None
+    except (OSError, ValueError):
+        reader = None
+    return tree, reader
+
+
+def change_tracker(previous, reader):
+    return ChangeTracker(previous, _entry_loader(reader) if reader else None)
+
+
+def diff_reports(old_repdir, new_repdir):
+    """Diff the runs written to two reports directories (hash trees are rebuilt from snapshots that lack one)."""
+    trees, readers = [], []
+    try:
+        for repdir in (old_repdir, new_repdir):
+            path = find_snapshot(repdir)
+            if path is None:
+                raise ValueError(f"No snapshot in {repdir}")
+            tree = HashTree.load(tree_path(repdir)) or HashTree.from_data(read_snapshot(path))
+            trees.append(tree)
+            readers.append(SnapshotReader(path))
+        return diff_trees(trees[0], trees[1], _entry_loader(readers[0]), _entry_loader(readers[1]),
+                          failed=readers[1].failed_tenants())
+    finally:
+        for reader in readers:
+            reader.close()
@@ -0,0 +1,98 @@
+import threading
+import time
+
+THROTTLE_STATUSES = (429, 503)
+# Back off when smoothed latency exceeds this multiple of the quietest latency seen.
+DEFAULT_LATENCY_TOLERANCE = 3.0
+
+
+def is_throttled(response):
+    """True if the APIC throttled this request, including attempts urllib3 already retried."""
+    if response.status_code in THROTTLE_STATUSES:
+        return True
+    retries = getattr(response.raw, 'retries', None)
+    return any(h.status in THROTTLE_STATUSES for h in getattr(retries, 'history', ()))
+
+
+class RateGovernor:
+    """
+    Adaptive limit on in-flight APIC requests (AIMD).
+
+    Every request that completes without a throttle signal raises the limit
+    by about one per round trip, up to ``max_inflight``.  A 429/503 (the APIC
+    nginx throttle) or a failed connection halves it, at most once per round
+    trip; latency climbing past ``latency_tolerance`` times the quietest
+    latency seen trims it by 10%.  ``max_rps`` is a hard ceiling on request
+    starts per second, independent of the limit.
+    """
+
+    def __init__(self, max_inflight=10, min_inflight=1, max_rps=0, latency_tolerance=DEFAULT_LATENCY_TOLERANCE):
+        self.max_inflight = max(1, max_inflight)
+        self.min_inflight = max(1, min(min_inflight, self.max_inflight))
+        self.max_rps = max_rps
+        self.latency_tolerance = latency_tolerance
+        # Start halfway and let additive increase find the APIC's capacity.
+        self.limit = float(max(self.min_inflight, self.max_inflight // 2))
+        self.in_flight = 0
+        self.requests = 0
+        self.throttled = 0
+        self.peak = self.limit
+        self._base_latency = None
+        self._latency = None
+        self._last_decrease = 0.0
+        self._next_start = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Block until a request may start."""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+            delay = 0.0
+            if self.max_rps:
+                now = time.monotonic()
+                start = max(now, self._next_start)
+                self._next_start = start + 1.0 / self.max_rps
+                delay = start - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def release(self, latency=None, throttled=False):
+        """Record how a request started with acquire() went and adjust the limit."""
+        with self._cond:
+            self.in_flight -= 1
+            self.requests += 1
+            now = time.monotonic()
+            if latency is not None:
+                self._latency = latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+                if self._base_latency is None or latency < self._base_latency:
+                    self._base_latency = latency
+                else:
+                    # Let the baseline follow slow drift (e.g. a busier APIC).
+                    self._base_latency += (latency - self._base_latency) * 0.01
+            # Decrease at most once per round trip, so one burst counts as one signal.
+            can_decrease = now - self._last_decrease >= (self._latency or 0.1)
+            if throttled:
+                self.throttled += 1
+                if can_decrease:
+                    self.limit = max(self.min_inflight, self.limit / 2)
+                    self._last_decrease = now
+            elif self._latency is not None and self._latency > self._base_latency * self.latency_tolerance:
+                if can_decrease:
+                    self.limit = max(self.min_inflight, self.limit * 0.9)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.max_inflight, self.limit + 1.0 / self.limit)
+            self.peak = max(self.peak, self.limit)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'limit': int(self.limit),
+                'peak': int(self.peak),
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'latency_ms': round(self._latency * 1000, 1) if self._latency is not None else None,
+            }
@@ -1,36 +1,34 @@
 from ..utils.normalize import simple_attr
 
+CLASSES = ('fvBD', 'fvSubnet')
+
 def harvest_bds_for_tenant(api, tenant):
-    subtree = api.mo_subtree(tenant['dn'])
-    bds = []
+    index = api.subtree_index(tenant['dn'])
     dn_to_bd = {}
 
     # Collect BDs and key attributes
-    for item in subtree.get('imdata', []):
-        if 'fvBD' in item:
-            a = simple_attr(item, 'fvBD')
-            dn_to_bd[a.get('dn')] = {
-                'name': a.get('name'),
-                # Key features you asked for:
-                'unicastRoute': a.get('unicastRoute'),        # enabled/disabled (L3 GW)
-                'arpFlood': a.get('arpFlood'),                # true/false
-                'unkMacUcastAct': a.get('unkMacUcastAct'),    # proxy/flood
-                'limitIpLearnToSubnets': a.get('limitIpLearnToSubnets'),
-                # Keep other commonly useful flags if present (graceful if missing):
-                'ipLearning': a.get('ipLearning'),
-                'multiDstPktAct': a.get('multiDstPktAct'),
-                'subnets': []
-            }
+    for item in index.by_class('fvBD'):
+        a = simple_attr(item, 'fvBD')
+        dn = a.get('dn')
+        dn_to_bd[dn] = {
+            'name': a.get('name'),
+            # Key features you asked for:
+            'unicastRoute': a.get('unicastRoute'),        # enabled/disabled (L3 GW)
+            'arpFlood': a.get('arpFlood'),                # true/false
+            'unkMacUcastAct': a.get('unkMacUcastAct'),    # proxy/flood
+            'limitIpLearnToSubnets': a.get('limitIpLearnToSubnets'),
+            # Keep other commonly useful flags if present (graceful if missing):
+            'ipLearning': a.get('ipLearning'),
+            'multiDstPktAct': a.get('multiDstPktAct'),
+            'subnets': []
+        }
 
-    # Attach subnets with IP and scope (e.g., private/shared/public)
-    for item in subtree.get('imdata', []):
-        if 'fvSubnet' in item:
-            a = simple_attr(item, 'fvSubnet')
-            parent_dn = a.get('dn', '').split('/subnet-')[0]
-            if parent_dn in dn_to_bd:
-                dn_to_bd[parent_dn]['subnets'].append({
-                    'ip': a.get('ip'),
-                    'scope': a.get('scope')  # may be "", "public", "shared", etc.
-                })
+        # Attach subnets with IP and scope (e.g., private/shared/public)
+        for child in index.children(dn, 'fvSubnet'):
+            s = simple_attr(child, 'fvSubnet')
+            dn_to_bd[dn]['subnets'].append({
+                'ip': s.get('ip'),
+                'scope': s.get('scope')  # may be "", "public", "shared", etc.
+            })
 
     return list(dn_to_bd.values())
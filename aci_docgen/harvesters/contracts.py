@@ -1,5 +1,7 @@
 from ..utils.normalize import simple_attr, sorted_unique
 
+CLASSES = ('vzBrCP', 'vzSubj', 'vzRsSubjFiltAtt', 'vzRsSubjGraphAtt', 'fvRsProv', 'fvRsCons')
+
 
 def _extract_name_from_tdn(tdn: str, marker: str) -> str:
     if not tdn:
@@ -63,66 +65,50 @@ def _subject_flags(attrs: dict) -> list:
 
 
 def harvest_contracts_for_tenant(api, tenant):
-    subtree = api.mo_subtree(tenant['dn'])
+    index = api.subtree_index(tenant['dn'])
     cps = []
     dn_to_cp = {}
     subj_dn_to_subject = {}
 
-    for item in subtree.get('imdata', []):
-        if 'vzBrCP' in item:
-            a = simple_attr(item, 'vzBrCP')
-            dn_to_cp[a.get('dn')] = {
+    for item in index.by_class('vzBrCP'):
+        a = simple_attr(item, 'vzBrCP')
+        dn_to_cp[a.get('dn')] = {
+            'name': a.get('name'),
+            'scope': a.get('scope'),
+            'subjects': [],
+            'providers': [],
+            'consumers': []
+        }
+
+    for item in index.by_class('vzSubj'):
+        a = simple_attr(item, 'vzSubj')
+        parent = a.get('dn', '').split('/subj-')[0]
+        if parent in dn_to_cp:
+            subject = {
                 'name': a.get('name'),
-                'scope': a.get('scope'),
-                'subjects': [],
-                'providers': [],
-                'consumers': []
+                'flags': _subject_flags(a),
+                'filters': [],
+                'graphs': []
             }
+            dn_to_cp[parent]['subjects'].append(subject)
+            subj_dn_to_subject[a.get('dn')] = subject
 
-    for item in subtree.get('imdata', []):
-        if 'vzSubj' in item:
-            a = simple_attr(item, 'vzSubj')
-            parent = a.get('dn', '').split('/subj-')[0]
-            if parent in dn_to_cp:
-                subject = {
-                    'name': a.get('name'),
-                    'flags': _subject_flags(a),
-                    'filters': [],
-                    'graphs': []
-                }
-                dn_to_cp[parent]['subjects'].append(subject)
-                subj_dn_to_subject[a.get('dn')] = subject
-
-    for item in subtree.get('imdata', []):
-        if 'vzRsSubjFiltAtt' in item:
-            a = simple_attr(item, 'vzRsSubjFiltAtt')
+    for cls, marker, key in (('vzRsSubjFiltAtt', 'flt', 'filters'), ('vzRsSubjGraphAtt', 'graph', 'graphs')):
+        for item in index.by_class(cls):
+            a = simple_attr(item, cls)
             parent = a.get('dn', '').rsplit('/', 1)[0]
             if parent in subj_dn_to_subject:
-                name = _extract_name_from_tdn(a.get('tDn', ''), 'flt')
+                name = _extract_name_from_tdn(a.get('tDn', ''), marker)
                 if not name:
                     name = a.get('tDn', '')
-                subj_dn_to_subject[parent]['filters'].append(name)
-
-        if 'vzRsSubjGraphAtt' in item:
-            a = simple_attr(item, 'vzRsSubjGraphAtt')
-            parent = a.get('dn', '').rsplit('/', 1)[0]
-            if parent in subj_dn_to_subject:
-                name = _extract_name_from_tdn(a.get('tDn', ''), 'graph')
-                if not name:
-                    name = a.get('tDn', '')
-                subj_dn_to_subject[parent]['graphs'].append(name)
-
-        if 'fvRsProv' in item:
-            a = simple_attr(item, 'fvRsProv')
-            contract_dn = a.get('tDn')
-            if contract_dn in dn_to_cp:
-                dn_to_cp[contract_dn]['providers'].append(_binding_display(a.get('dn', '')))
+                subj_dn_to_subject[parent][key].append(name)
 
-        if 'fvRsCons' in item:
-            a = simple_attr(item, 'fvRsCons')
+    for cls, key in (('fvRsProv', 'providers'), ('fvRsCons', 'consumers')):
+        for item in index.by_class(cls):
+            a = simple_attr(item, cls)
             contract_dn = a.get('tDn')
             if contract_dn in dn_to_cp:
-                dn_to_cp[contract_dn]['consumers'].append(_binding_display(a.get('dn', '')))
+                dn_to_cp[contract_dn][key].append(_binding_display(a.get('dn', '')))
 
     for cp in dn_to_cp.values():
         for subject in cp['subjects']:
@@ -1,5 +1,7 @@
 from ..utils.normalize import simple_attr
 
+CLASSES = ('fvAEPg', 'fvRsDomAtt', 'fvRsPathAtt')
+
 def _pretty_domain(tdn: str) -> str:
     """
     Examples:
@@ -55,45 +57,46 @@ def _parse_path_tdn(tdn: str, encap: str) -> dict:
     return info
 
 def harvest_epgs_for_tenant(api, tenant):
-    subtree = api.mo_subtree(tenant['dn'])
+    index = api.subtree_index(tenant['dn'])
     epgs = []
+    # EPG names are not unique across APs; relations are matched by name as before
+    epgs_by_name = {}
 
     # Build basic EPG list
-    for item in subtree.get('imdata', []):
-        if 'fvAEPg' in item:
-            a = simple_attr(item, 'fvAEPg')
-            epgs.append({
-                'name': a.get('name'),
-                'ap': a.get('dn').split('/ap-')[1].split('/')[0],
-                'domains': [],
-                'static_paths': []
-            })
+    for item in index.by_class('fvAEPg'):
+        a = simple_attr(item, 'fvAEPg')
+        epg = {
+            'name': a.get('name'),
+            'ap': a.get('dn').split('/ap-')[1].split('/')[0],
+            'domains': [],
+            'static_paths': []
+        }
+        epgs.append(epg)
+        epgs_by_name.setdefault(epg['name'], []).append(epg)
 
     # Domains bound to EPGs
     # fvRsDomAtt is a child under EPG; use its parent DN to identify the EPG cleanly
-    for item in subtree.get('imdata', []):
-        if 'fvRsDomAtt' in item:
-            a = simple_attr(item, 'fvRsDomAtt')
-            parent_dn = a.get('dn', '')
-            # parent_dn like: uni/tn-<T>/ap-<AP>/epg-<EPG>/rsdomAtt-...
-            epg_name = parent_dn.split('/epg-')[-1].split('/')[0] if '/epg-' in parent_dn else ''
-            dom = _pretty_domain(a.get('tDn', ''))
-            for e in epgs:
-                if e['name'] == epg_name and dom:
-                    if dom not in e['domains']:
-                        e['domains'].append(dom)
+    for item in index.by_class('fvRsDomAtt'):
+        a = simple_attr(item, 'fvRsDomAtt')
+        parent_dn = a.get('dn', '')
+        # parent_dn like: uni/tn-<T>/ap-<AP>/epg-<EPG>/rsdomAtt-...
+        epg_name = parent_dn.split('/epg-')[-1].split('/')[0] if '/epg-' in parent_dn else ''
+        dom = _pretty_domain(a.get('tDn', ''))
+        if not dom:
+            continue
+        for e in epgs_by_name.get(epg_name, []):
+            if dom not in e['domains']:
+                e['domains'].append(dom)
 
     # Static path attachments (ports/PCs/vPCs) with VLAN
-    for item in subtree.get('imdata', []):
-        if 'fvRsPathAtt' in item:
-            a = simple_attr(item, 'fvRsPathAtt')
-            parent_dn = a.get('dn', '')
-            if '/epg-' in parent_dn:
-                epg_name = parent_dn.split('/epg-')[1].split('/')[0]
-                parsed = _parse_path_tdn(a.get('tDn', ''), a.get('encap', ''))
-                for e in epgs:
-                    if e['name'] == epg_name:
-                        e['static_paths'].append(parsed)
+    for item in index.by_class('fvRsPathAtt'):
+        a = simple_attr(item, 'fvRsPathAtt')
+        parent_dn = a.get('dn', '')
+        if '/epg-' in parent_dn:
+            epg_name = parent_dn.split('/epg-')[1].split('/')[0]
+            parsed = _parse_path_tdn(a.get('tDn', ''), a.get('encap', ''))
+            for e in epgs_by_name.get(epg_name, []):
+                e['static_paths'].append(parsed)
 
     # Sort for stable output
     for e in epgs:
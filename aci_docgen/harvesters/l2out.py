@@ -1,6 +1,9 @@
 from ..utils.normalize import simple_attr
 from .epgs import _parse_path_tdn
 
+CLASSES = ('l2extOut', 'l2extRsEBd', 'l2extRsL2DomAtt', 'l2extInstP', 'l2extSubnet',
+           'l2extRsPathL2OutAtt', 'fvRsProv', 'fvRsCons', 'fvRsProtBy')
+
 
 def _contract_name_from_tdn(tdn: str) -> str:
     """Render a friendly contract name from a target DN."""
@@ -12,99 +15,81 @@ def _contract_name_from_tdn(tdn: str) -> str:
     return tdn.split("uni/")[-1]
 
 def harvest_l2out_for_tenant(api, tenant):
-    subtree = api.mo_subtree(tenant['dn'])
-    outs = []
+    index = api.subtree_index(tenant['dn'])
     dn_to_out = {}
-    for item in subtree.get('imdata', []):
-        if 'l2extOut' in item:
-            a = simple_attr(item, 'l2extOut')
-            dn_to_out[a.get('dn')] = {
-                'name': a.get('name'),
-                'domains': [],
-                'bd': '',
-                'instps': []
-            }
+    for item in index.by_class('l2extOut'):
+        a = simple_attr(item, 'l2extOut')
+        dn_to_out[a.get('dn')] = {
+            'name': a.get('name'),
+            'domains': [],
+            'bd': '',
+            'instps': []
+        }
     # domain attachments
-    for item in subtree.get('imdata', []):
-        if 'l2extRsEBd' in item:
-            a = simple_attr(item, 'l2extRsEBd')
-            parent = a.get('dn', '').split('/rsEBd')[0]
-            if parent in dn_to_out:
-                dn_to_out[parent]['bd'] = a.get('tDn', '').split('/BD-')[-1]
-        if 'l2extRsL2DomAtt' in item:
-            a = simple_attr(item, 'l2extRsL2DomAtt')
-            parent = a.get('dn', '').split('/rsL2DomAtt')[0]
-            if parent in dn_to_out and a.get('tDn'):
-                dn_to_out[parent]['domains'].append(a.get('tDn').split('uni/')[1])
+    for item in index.by_class('l2extRsEBd'):
+        a = simple_attr(item, 'l2extRsEBd')
+        parent = a.get('dn', '').split('/rsEBd')[0]
+        if parent in dn_to_out:
+            dn_to_out[parent]['bd'] = a.get('tDn', '').split('/BD-')[-1]
+    for item in index.by_class('l2extRsL2DomAtt'):
+        a = simple_attr(item, 'l2extRsL2DomAtt')
+        parent = a.get('dn', '').split('/rsL2DomAtt')[0]
+        if parent in dn_to_out and a.get('tDn'):
+            dn_to_out[parent]['domains'].append(a.get('tDn').split('uni/')[1])
     # instance profiles
     instp_by_dn = {}
-    for item in subtree.get('imdata', []):
-        if 'l2extInstP' in item:
-            a = simple_attr(item, 'l2extInstP')
-            parent = a.get('dn', '').split('/instP-')[0]
-            for dn, out in dn_to_out.items():
-                if parent.startswith(dn):
-                    instp = {
-                        'name': a.get('name'),
-                        'subnets': [],
-                        'path_attachments': [],
-                        'provided_contracts': [],
-                        'consumed_contracts': [],
-                        'protected_by_contracts': []
-                    }
-                    out['instps'].append(instp)
-                    instp_by_dn[a.get('dn')] = instp
+    for item in index.by_class('l2extInstP'):
+        a = simple_attr(item, 'l2extInstP')
+        out = dn_to_out.get(a.get('dn', '').split('/instP-')[0])
+        if out is not None:
+            instp = {
+                'name': a.get('name'),
+                'subnets': [],
+                'path_attachments': [],
+                'provided_contracts': [],
+                'consumed_contracts': [],
+                'protected_by_contracts': []
+            }
+            out['instps'].append(instp)
+            instp_by_dn[a.get('dn')] = instp
 
     # enrich InstPs with subnets, paths, and contracts
-    for item in subtree.get('imdata', []):
-        if 'l2extSubnet' in item:
-            a = simple_attr(item, 'l2extSubnet')
-            parent = a.get('dn', '').split('/subnet-')[0]
-            instp = instp_by_dn.get(parent)
-            if instp:
-                subnet_info = {
-                    'ip': a.get('ip') or a.get('prefix'),
-                    'scope': a.get('scope'),
-                    'aggregate': a.get('aggregate'),
-                    'name': a.get('name')
-                }
-                if subnet_info not in instp['subnets']:
-                    instp['subnets'].append(subnet_info)
-        if 'l2extRsPathL2OutAtt' in item:
-            a = simple_attr(item, 'l2extRsPathL2OutAtt')
-            parent = a.get('dn', '').split('/rsPathL2OutAtt')[0]
-            instp = instp_by_dn.get(parent)
-            if instp:
-                parsed = _parse_path_tdn(a.get('tDn', ''), a.get('encap', ''))
-                if not any(
-                    p.get('raw_tdn') == parsed.get('raw_tdn') and p.get('vlan') == parsed.get('vlan')
-                    for p in instp['path_attachments']
-                ):
-                    instp['path_attachments'].append(parsed)
-        if 'fvRsProv' in item:
-            a = simple_attr(item, 'fvRsProv')
-            parent = a.get('dn', '').split('/rsprov-')[0]
-            instp = instp_by_dn.get(parent)
-            if instp:
-                name = _contract_name_from_tdn(a.get('tDn', ''))
-                if name and name not in instp['provided_contracts']:
-                    instp['provided_contracts'].append(name)
-        if 'fvRsCons' in item:
-            a = simple_attr(item, 'fvRsCons')
-            parent = a.get('dn', '').split('/rscons-')[0]
-            instp = instp_by_dn.get(parent)
-            if instp:
-                name = _contract_name_from_tdn(a.get('tDn', ''))
-                if name and name not in instp['consumed_contracts']:
-                    instp['consumed_contracts'].append(name)
-        if 'fvRsProtBy' in item:
-            a = simple_attr(item, 'fvRsProtBy')
-            parent = a.get('dn', '').split('/rsprotBy-')[0]
-            instp = instp_by_dn.get(parent)
+    for item in index.by_class('l2extSubnet'):
+        a = simple_attr(item, 'l2extSubnet')
+        parent = a.get('dn', '').split('/subnet-')[0]
+        instp = instp_by_dn.get(parent)
+        if instp:
+            subnet_info = {
+                'ip': a.get('ip') or a.get('prefix'),
+                'scope': a.get('scope'),
+                'aggregate': a.get('aggregate'),
+                'name': a.get('name')
+            }
+            if subnet_info not in instp['subnets']:
+                instp['subnets'].append(subnet_info)
+    for item in index.by_class('l2extRsPathL2OutAtt'):
+        a = simple_attr(item, 'l2extRsPathL2OutAtt')
+        parent = a.get('dn', '').split('/rsPathL2OutAtt')[0]
+        instp = instp_by_dn.get(parent)
+        if instp:
+            parsed = _parse_path_tdn(a.get('tDn', ''), a.get('encap', ''))
+            if not any(
+                p.get('raw_tdn') == parsed.get('raw_tdn') and p.get('vlan') == parsed.get('vlan')
+                for p in instp['path_attachments']
+            ):
+                instp['path_attachments'].append(parsed)
+    for cls, marker, key in (
+        ('fvRsProv', '/rsprov-', 'provided_contracts'),
+        ('fvRsCons', '/rscons-', 'consumed_contracts'),
+        ('fvRsProtBy', '/rsprotBy-', 'protected_by_contracts'),
+    ):
+        for item in index.by_class(cls):
+            a = simple_attr(item, cls)
+            instp = instp_by_dn.get(a.get('dn', '').split(marker)[0])
             if instp:
                 name = _contract_name_from_tdn(a.get('tDn', ''))
-                if name and name not in instp['protected_by_contracts']:
-                    instp['protected_by_contracts'].append(name)
+                if name and name not in instp[key]:
+                    instp[key].append(name)
 
     # sort for stable output
     for out in dn_to_out.values():
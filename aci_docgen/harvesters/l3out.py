@@ -1,5 +1,10 @@
 from ..utils.normalize import collect_children, simple_attr
 
+PROTOCOL_CLASSES = ('bgpExtP', 'bgpPeerP', 'bgpProtP', 'bgpRsPeerPfxPol', 'bgpAsP',
+                    'ospfExtP', 'ospfIfP', 'ospfCtxPol', 'ospfRsIfPol')
+CLASSES = ('l3extOut', 'l3extSubnet') + PROTOCOL_CLASSES
+CHILD_CLASSES = {'l3extOut': ('l3extRsEctx',)}
+
 def _l3out_dn_from(child_dn: str) -> str:
     """
     Given any DN under an L3Out, return the L3Out DN:
@@ -26,50 +31,44 @@ def harvest_l3out_for_tenant(api, tenant):
       - protocol hints (BGP/OSPF) if present in subtree
       - external subnet count (l3extSubnet under instPs)
     """
-    subtree = api.mo_subtree(tenant['dn'])
+    index = api.subtree_index(tenant['dn'])
     lo_by_dn = {}
 
     # Base L3Outs
-    for item in subtree.get('imdata', []):
-        if 'l3extOut' in item:
-            mo = item['l3extOut']
-            a = simple_attr(item, 'l3extOut')
-            dn = a.get('dn')
-            vrf = ""
-            for child in collect_children(mo, 'l3extRsEctx'):
-                attrs = child.get('attributes', {})
-                vrf = _vrf_name_from_tdn(attrs.get('tDn', ''))
-                if vrf:
-                    break
-            lo_by_dn[dn] = {
-                'name': a.get('name'),
-                'dn': dn,
-                'vrf': vrf,
-                'protocols': set(),
-                'external_subnets': 0
-            }
+    for item in index.by_class('l3extOut'):
+        mo = item['l3extOut']
+        a = simple_attr(item, 'l3extOut')
+        dn = a.get('dn')
+        vrf = ""
+        for child in collect_children(mo, 'l3extRsEctx'):
+            attrs = child.get('attributes', {})
+            vrf = _vrf_name_from_tdn(attrs.get('tDn', ''))
+            if vrf:
+                break
+        lo_by_dn[dn] = {
+            'name': a.get('name'),
+            'dn': dn,
+            'vrf': vrf,
+            'protocols': set(),
+            'external_subnets': 0
+        }
 
     if not lo_by_dn:
         return []
 
-    for item in subtree.get('imdata', []):
-        if 'l3extSubnet' in item:
-            a = simple_attr(item, 'l3extSubnet')
+    for item in index.by_class('l3extSubnet'):
+        a = simple_attr(item, 'l3extSubnet')
+        l3out_dn = _l3out_dn_from(a.get('dn', ''))
+        if l3out_dn in lo_by_dn:
+            lo_by_dn[l3out_dn]['external_subnets'] += 1
+
+    for cls in PROTOCOL_CLASSES:
+        protocol = 'BGP' if cls.startswith('bgp') else 'OSPF'
+        for item in index.by_class(cls):
+            a = simple_attr(item, cls)
             l3out_dn = _l3out_dn_from(a.get('dn', ''))
             if l3out_dn in lo_by_dn:
-                lo_by_dn[l3out_dn]['external_subnets'] += 1
-
-    for item in subtree.get('imdata', []):
-        for cls in ('bgpExtP', 'bgpPeerP', 'bgpProtP', 'bgpRsPeerPfxPol', 'bgpAsP',
-                    'ospfExtP', 'ospfIfP', 'ospfCtxPol', 'ospfRsIfPol'):
-            if cls in item:
-                a = simple_attr(item, cls)
-                l3out_dn = _l3out_dn_from(a.get('dn', ''))
-                if l3out_dn in lo_by_dn:
-                    if cls.startswith('bgp'):
-                        lo_by_dn[l3out_dn]['protocols'].add('BGP')
-                    if cls.startswith('ospf'):
-                        lo_by_dn[l3out_dn]['protocols'].add('OSPF')
+                lo_by_dn[l3out_dn]['protocols'].add(protocol)
 
     los = []
     for lo in lo_by_dn.values():
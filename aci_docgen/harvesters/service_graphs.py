@@ -1,103 +1,93 @@
 from collections import defaultdict
 
 from ..utils.normalize import simple_attr
+
+CLASSES = ('vnsAbsGraph', 'vnsAbsNode', 'vnsAbsFuncConn', 'vnsRedirectPol', 'vnsAbsConnection',
+           'vzRsSubjGraphAtt', 'vzRsGraphAtt')
 
 def harvest_service_graphs_for_tenant(api, tenant):
-    subtree = api.mo_subtree(tenant['dn'])
+    index = api.subtree_index(tenant['dn'])
     dn_to_graph = {}
     node_lookup = {}
     graph_name_to_dn = {}
     graph_bindings = defaultdict(list)
     # abstract graphs
-    for item in subtree.get('imdata', []):
-        if 'vnsAbsGraph' in item:
-            a = simple_attr(item, 'vnsAbsGraph')
-            dn = a.get('dn')
-            if not dn:
-                continue
-            graph = {
-                'name': a.get('name'),
-                'dn': dn,
-                'nodes': [],
-                'connections': [],
-                'redirect_policies': [],
-                'bound_contract_subjects': [],
-            }
-            dn_to_graph[dn] = graph
-            if a.get('name'):
-                graph_name_to_dn[a.get('name')] = dn
+    for item in index.by_class('vnsAbsGraph'):
+        a = simple_attr(item, 'vnsAbsGraph')
+        dn = a.get('dn')
+        if not dn:
+            continue
+        graph = {
+            'name': a.get('name'),
+            'dn': dn,
+            'nodes': [],
+            'connections': [],
+            'redirect_policies': [],
+            'bound_contract_subjects': [],
+        }
+        dn_to_graph[dn] = graph
+        if a.get('name'):
+            graph_name_to_dn[a.get('name')] = dn
     # nodes
-    for item in subtree.get('imdata', []):
-        if 'vnsAbsNode' in item:
-            a = simple_attr(item, 'vnsAbsNode')
-            parent = a.get('dn', '').split('/AbsNode-')[0]
-            if parent in dn_to_graph:
-                node = {
-                    'name': a.get('name'),
-                    'funcType': a.get('funcType'),
-                    'dn': a.get('dn'),
-                    'connectors': [],
-                }
-                dn_to_graph[parent]['nodes'].append(node)
-                if node['dn']:
-                    node_lookup[node['dn']] = node
-    # node connectors
-    for item in subtree.get('imdata', []):
-        if 'vnsAbsFuncConn' in item:
-            a = simple_attr(item, 'vnsAbsFuncConn')
-            node_dn = a.get('dn', '').split('/AbsFuncConn-')[0]
-            node = node_lookup.get(node_dn)
-            if not node:
-                continue
-            connector_attrs = _clean_attributes(a)
-            connector = {
+    for item in index.by_class('vnsAbsNode'):
+        a = simple_attr(item, 'vnsAbsNode')
+        parent = a.get('dn', '').split('/AbsNode-')[0]
+        if parent in dn_to_graph:
+            node = {
                 'name': a.get('name'),
-                'attributes': connector_attrs,
-                'summary': _build_connector_summary(a),
+                'funcType': a.get('funcType'),
+                'dn': a.get('dn'),
+                'connectors': [],
             }
-            node['connectors'].append(connector)
+            dn_to_graph[parent]['nodes'].append(node)
+            if node['dn']:
+                node_lookup[node['dn']] = node
+    # node connectors
+    for item in index.by_class('vnsAbsFuncConn'):
+        a = simple_attr(item, 'vnsAbsFuncConn')
+        node_dn = a.get('dn', '').split('/AbsFuncConn-')[0]
+        node = node_lookup.get(node_dn)
+        if not node:
+            continue
+        connector_attrs = _clean_attributes(a)
+        connector = {
+            'name': a.get('name'),
+            'attributes': connector_attrs,
+            'summary': _build_connector_summary(a),
+        }
+        node['connectors'].append(connector)
     # redirect policies (if any)
-    for item in subtree.get('imdata', []):
-        if 'vnsRedirectPol' in item:
-            a = simple_attr(item, 'vnsRedirectPol')
-            # try to associate to nearest graph by dn prefix
-            parent = a.get('dn', '').split('/redirectPol-')[0]
-            for dn in dn_to_graph:
-                if parent.startswith(dn):
-                    name = a.get('name')
-                    if name and name not in dn_to_graph[dn]['redirect_policies']:
-                        dn_to_graph[dn]['redirect_policies'].append(name)
+    for item in index.by_class('vnsRedirectPol'):
+        a = simple_attr(item, 'vnsRedirectPol')
+        # try to associate to nearest graph by dn prefix
+        parent = a.get('dn', '').split('/redirectPol-')[0]
+        for dn in dn_to_graph:
+            if parent.startswith(dn):
+                name = a.get('name')
+                if name and name not in dn_to_graph[dn]['redirect_policies']:
+                    dn_to_graph[dn]['redirect_policies'].append(name)
     # graph connections
-    for item in subtree.get('imdata', []):
-        if 'vnsAbsConnection' in item:
-            a = simple_attr(item, 'vnsAbsConnection')
-            parent = a.get('dn', '').split('/AbsConnection-')[0]
-            if parent in dn_to_graph:
-                connection_attrs = _clean_attributes(a)
-                connection = {
-                    'name': a.get('name'),
-                    'attributes': connection_attrs,
-                    'summary': _build_connection_summary(a),
-                }
-                dn_to_graph[parent]['connections'].append(connection)
-    # contract bindings (graph references)
-    for item in subtree.get('imdata', []):
-        if 'vzRsSubjGraphAtt' in item:
-            _record_binding(
-                item,
-                'vzRsSubjGraphAtt',
-                dn_to_graph,
-                graph_name_to_dn,
-                graph_bindings,
-            )
-        elif 'vzRsGraphAtt' in item:
-            _record_binding(
-                item,
-                'vzRsGraphAtt',
-                dn_to_graph,
-                graph_name_to_dn,
-                graph_bindings,
-            )
+    for item in index.by_class('vnsAbsConnection'):
+        a = simple_attr(item, 'vnsAbsConnection')
+        parent = a.get('dn', '').split('/AbsConnection-')[0]
+        if parent in dn_to_graph:
+            connection_attrs = _clean_attributes(a)
+            connection = {
+                'name': a.get('name'),
+                'attributes': connection_attrs,
+                'summary': _build_connection_summary(a),
+            }
+            dn_to_graph[parent]['connections'].append(connection)
+    # contract bindings (graph references), kept in payload order
+    for item in index.select('vzRsSubjGraphAtt', 'vzRsGraphAtt'):
+        cls = 'vzRsSubjGraphAtt' if 'vzRsSubjGraphAtt' in item else 'vzRsGraphAtt'
+        _record_binding(
+            item,
+            cls,
+            dn_to_graph,
+            graph_name_to_dn,
+            graph_bindings,
+        )
     # finalise graphs
     graphs = []
     for dn, graph in dn_to_graph.items():
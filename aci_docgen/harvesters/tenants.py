@@ -7,5 +7,7 @@ def harvest_tenants(api, debug_enabled=False):
     for mo in data.get('imdata', []):
         a = simple_attr(mo, 'fvTenant')
         tenants.append({'name': a.get('name'), 'dn': a.get('dn')})
+    # DN order, as paged queries return them, so output does not depend on --page-size
+    tenants.sort(key=lambda t: t['dn'] or '')
     debug(f"Found tenants: {[t['name'] for t in tenants]}", debug_enabled)
     return tenants
@@ -1,15 +1,8 @@
 from ..utils.normalize import simple_attr
 
-
-def _walk_imdata(nodes):
-    """Yield (class_name, attributes) pairs from an imdata-style list."""
-
-    for node in nodes or []:
-        for cls, body in node.items():
-            attributes = body.get('attributes', {})
-            yield cls, attributes
-            # Children are already in the same {cls: {...}} format.
-            yield from _walk_imdata(body.get('children', []))
+CLASSES = ('fvRsDomAtt',)
+# Read from each referenced domain's subtree rather than the tenant's
+DOMAIN_CLASSES = ('vmmDomP', 'vmmCtrlrP', 'infraRsVlanNs', 'vmmRsVlanNs')
 
 
 def _extract_vlan_pool_name(tdn):
@@ -25,43 +18,44 @@ def _extract_vlan_pool_name(tdn):
 
 def harvest_vmm_for_tenant(api, tenant):
     # There isn't a strict per-tenant VMM, but EPG -> fvRsDomAtt -> vmmDomP references.
-    subtree = api.mo_subtree(tenant['dn'])
+    index = api.subtree_index(tenant['dn'])
     vmm_refs = {}
-    for item in subtree.get('imdata', []):
-        if 'fvRsDomAtt' in item:
-            a = simple_attr(item, 'fvRsDomAtt')
-            tdn = a.get('tDn', '')
-            if '/vmmp-' in tdn and '/dom-' in tdn:
-                key = tdn.split('uni/')[1] if 'uni/' in tdn else tdn
-                domain_name = tdn.split('/dom-')[-1]
-                if '/' in domain_name:
-                    domain_name = domain_name.split('/')[0]
+    for item in index.by_class('fvRsDomAtt'):
+        a = simple_attr(item, 'fvRsDomAtt')
+        tdn = a.get('tDn', '')
+        if '/vmmp-' in tdn and '/dom-' in tdn:
+            key = tdn.split('uni/')[1] if 'uni/' in tdn else tdn
+            domain_name = tdn.split('/dom-')[-1]
+            if '/' in domain_name:
+                domain_name = domain_name.split('/')[0]
 
-                vmm_refs[key] = {
-                    'name': domain_name,
-                    'type': tdn.split('/vmmp-')[1].split('/')[0],
-                    'vcenter': [],
-                    'vlan_pools': [],
-                    'mode': '',
-                }
+            vmm_refs[key] = {
+                'name': domain_name,
+                'type': tdn.split('/vmmp-')[1].split('/')[0],
+                'vcenter': [],
+                'vlan_pools': [],
+                'mode': '',
+            }
 
     for tdn, info in vmm_refs.items():
-        domain_data = api.mo_subtree(f"uni/{tdn}")
+        # Domains are shared between tenants, so this is usually a cache hit.
+        domain = api.subtree_index(f"uni/{tdn}", classes=DOMAIN_CLASSES)
         controllers = []
         vlan_pools = []
         mode = info.get('mode', '')
 
-        for cls, attributes in _walk_imdata(domain_data.get('imdata', [])):
-            if cls == 'vmmDomP':
-                mode = attributes.get('mode') or mode
-            elif cls == 'vmmCtrlrP':
-                controller_name = attributes.get('name') or attributes.get('hostOrIp')
-                if controller_name and controller_name not in controllers:
-                    controllers.append(controller_name)
-            elif cls in ('infraRsVlanNs', 'vmmRsVlanNs'):
-                pool_name = _extract_vlan_pool_name(attributes.get('tDn'))
-                if pool_name and pool_name not in vlan_pools:
-                    vlan_pools.append(pool_name)
+        for item in domain.by_class('vmmDomP'):
+            mode = simple_attr(item, 'vmmDomP').get('mode') or mode
+        for item in domain.by_class('vmmCtrlrP'):
+            attributes = simple_attr(item, 'vmmCtrlrP')
+            controller_name = attributes.get('name') or attributes.get('hostOrIp')
+            if controller_name and controller_name not in controllers:
+                controllers.append(controller_name)
+        for item in domain.select('infraRsVlanNs', 'vmmRsVlanNs'):
+            cls = 'infraRsVlanNs' if 'infraRsVlanNs' in item else 'vmmRsVlanNs'
+            pool_name = _extract_vlan_pool_name(simple_attr(item, cls).get('tDn'))
+            if pool_name and pool_name not in vlan_pools:
+                vlan_pools.append(pool_name)
 
         info['mode'] = mode or ''
         info['vcenter'] = controllers
@@ -0,0 +1,138 @@
+import json
+import os
+
+from .class_harvest import tenant_dn_of
+from .harvesters import vrfs
+from .snapshot import find_snapshot, read_snapshot
+from .utils.log import debug, warn
+
+STATE_FILE = 'harvest_state.json'
+
+
+def _reports_dir(outdir):
+    return os.path.join(outdir, 'reports')
+
+
+def _audit_attrs(item):
+    return item.get('aaaModLR', {}).get('attributes', {})
+
+
+def audit_watermark(api):
+    """
+    Position in the aaaModLR audit log: the creation time of the newest
+    record and the ids of every record created at that time (more can be
+    logged within the same timestamp later), or None if there are none.
+    """
+    mos = list(api.iter_class('aaaModLR', '?order-by=aaaModLR.created|desc&page-size=1'))
+    if not mos:
+        return None
+    created = _audit_attrs(mos[0]).get('created')
+    latest = api.iter_class('aaaModLR', f'?query-target-filter=eq(aaaModLR.created,"{created}")')
+    return {'created': created, 'ids': sorted(filter(None, (_audit_attrs(item).get('id') for item in latest)))}
+
+
+def _position(watermark):
+    # State files written before record ids were kept hold just the time
+    return {'created': watermark, 'ids': []} if isinstance(watermark, str) else watermark
+
+
+def changed_since(api, watermark):
+    """
+    Return (tenant names, other DNs) touched by audit records logged after
+    ``watermark``: created later, or at the same time but not yet seen.
+    """
+    watermark = _position(watermark)
+    seen = set(watermark.get('ids') or ())
+    tenants, others = set(), set()
+    extra = f'?query-target-filter=ge(aaaModLR.created,"{watermark["created"]}")'
+    for item in api.iter_class('aaaModLR', extra):
+        a = _audit_attrs(item)
+        if a.get('created') == watermark['created'] and a.get('id') in seen:
+            continue
+        affected = a.get('affected', '')
+        tenant_dn = tenant_dn_of(affected)
+        if tenant_dn:
+            tenants.add(tenant_dn[len('uni/tn-'):])
+        elif affected:
+            others.add(affected)
+    return tenants, others
+
+
+def plan_incremental(api, outdir, sections, debug_enabled=False):
+    """
+    Compare the APIC audit log against the previous run in ``outdir``.
+
+    Returns (reuse, watermark): ``reuse`` maps tenant names to their previous
+    snapshot entries when the tenant has no audit records since the last
+    run, and ``watermark`` is the audit position to store for the next run.
+    Anything that makes the previous snapshot unusable yields an empty ``reuse``.
+    """
+    try:
+        watermark = audit_watermark(api)
+    except Exception as exc:
+        warn(f"Cannot read aaaModLR audit log, harvesting everything: {exc}")
+        return {}, None
+
+    repdir = _reports_dir(outdir)
+    try:
+        with open(os.path.join(repdir, STATE_FILE), encoding='utf-8') as f:
+            state = json.load(f)
+        snapshot = find_snapshot(repdir)
+        previous = read_snapshot(snapshot) if snapshot else None
+    except (OSError, ValueError, RuntimeError):
+        previous = None
+    if previous is None:
+        debug("No previous snapshot, harvesting everything", debug_enabled)
+        return {}, watermark
+
+    if state.get('sections') != sections:
+        debug("Sections changed since last run, harvesting everything", debug_enabled)
+        return {}, watermark
+    if not state.get('watermark'):
+        debug("The last run recorded no audit watermark, harvesting everything", debug_enabled)
+        return {}, watermark
+
+    try:
+        changed, others = changed_since(api, state['watermark'])
+    except Exception as exc:
+        warn(f"Cannot read aaaModLR audit log, harvesting everything: {exc}")
+        return {}, watermark
+
+    # VMM domains live outside the tenants but feed every tenant's vmm section.
+    if sections.get('vmm') and any(dn.startswith('uni/vmmp-') for dn in others):
+        debug("VMM domains changed, harvesting everything", debug_enabled)
+        return {}, watermark
+
+    reuse = {t['name']: t for t in previous.get('tenants', []) if t.get('name') not in changed}
+    debug(f"Tenants changed since {_position(state['watermark'])['created']}: {sorted(changed)}", debug_enabled)
+    if reuse and sections.get('tenants'):
+        try:
+            refresh_health(api, reuse)
+        except Exception as exc:
+            warn(f"Cannot refresh VRF health scores, harvesting everything: {exc}")
+            return {}, watermark
+    return reuse, watermark
+
+
+def refresh_health(api, reuse):
+    """
+    Update the VRF health scores of reused entries in place.  Health is
+    operational state: it changes without aaaModLR records, so it is read
+    again for the whole fabric with one fvCtx class query.
+    """
+    extra = f"?rsp-subtree=children&rsp-subtree-class={','.join(vrfs.CHILD_CLASSES['fvCtx'])}"
+    health = {}
+    for item in api.iter_class('fvCtx', extra):
+        ctx = item.get('fvCtx', {})
+        health[ctx.get('attributes', {}).get('dn')] = next(
+            (ch['healthInst']['attributes'].get('cur') for ch in ctx.get('children', []) if 'healthInst' in ch), None)
+    for entry in reuse.values():
+        for vrf in entry.get('vrfs', []):
+            vrf['health'] = health.get(vrf.get('dn'))
+
+
+def save_state(outdir, watermark, sections):
+    repdir = _reports_dir(outdir)
+    os.makedirs(repdir, exist_ok=True)
+    with open(os.path.join(repdir, STATE_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'watermark': watermark, 'sections': sections}, f, indent=2)
@@ -0,0 +1,173 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+PROM_PREFIX = 'aci_docgen'
+
+
+class Metrics:
+    """
+    Run instrumentation: APIC requests per URL (latency, bytes, MOs),
+    harvester wall/CPU time per tenant, template render time per output, and
+    phase totals.  Everything is aggregated by key, so a long ``watch`` run
+    grows only with the number of distinct URLs, tenants and pages.
+    """
+
+    def __init__(self):
+        self.requests = {}
+        self.harvesters = {}
+        self.templates = {}
+        self.phases = {}
+        # Optional profiling.Profiler; every timed block below is also a profiled stage.
+        self.profiler = None
+        self._lock = threading.Lock()
+
+    def _profiled(self, stage, item=None):
+        return self.profiler.stage(stage, item) if self.profiler else nullcontext()
+
+    def record_request(self, url, seconds, nbytes, mos, first_byte=None):
+        with self._lock:
+            m = self.requests.setdefault(url, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                                               'first_byte_seconds': 0.0, 'bytes': 0, 'mos': 0})
+            m['count'] += 1
+            m['seconds'] += seconds
+            m['max_seconds'] = max(m['max_seconds'], seconds)
+            m['first_byte_seconds'] += first_byte or 0.0
+            m['bytes'] += nbytes
+            m['mos'] += mos
+
+    @contextmanager
+    def harvester(self, name, tenant):
+        """Time one harvester on one tenant; CPU time is per thread, so it holds with --workers."""
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            with self._profiled(f"harvester:{name}", tenant):
+                yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+            with self._lock:
+                m = self.harvesters.setdefault((name, tenant), {'count': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0})
+                m['count'] += 1
+                m['wall_seconds'] += wall
+                m['cpu_seconds'] += cpu
+
+    @contextmanager
+    def template(self, name, output):
+        start = time.perf_counter()
+        try:
+            with self._profiled(f"template:{name}", output):
+                yield
+        finally:
+            self.record_template(name, output, time.perf_counter() - start)
+
+    def record_template(self, name, output, seconds):
+        """Add a render timed elsewhere (e.g. in a render worker process)."""
+        with self._lock:
+            m = self.templates.setdefault((name, output), {'count': 0, 'seconds': 0.0})
+            m['count'] += 1
+            m['seconds'] += seconds
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            with self._profiled(name):
+                yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    @staticmethod
+    def _totals(entries, key_index, fields):
+        totals = {}
+        for key, m in entries.items():
+            t = totals.setdefault(key[key_index], dict.fromkeys(fields, 0))
+            for f in fields:
+                t[f] += m[f]
+        return totals
+
+    def to_dict(self):
+        with self._lock:
+            requests = {url: dict(m) for url, m in self.requests.items()}
+            harvesters = {k: dict(m) for k, m in self.harvesters.items()}
+            templates = {k: dict(m) for k, m in self.templates.items()}
+            phases = dict(self.phases)
+        return {
+            'generated': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'phases': phases,
+            'requests': {
+                'count': sum(m['count'] for m in requests.values()),
+                'seconds': sum(m['seconds'] for m in requests.values()),
+                'bytes': sum(m['bytes'] for m in requests.values()),
+                'mos': sum(m['mos'] for m in requests.values()),
+                'by_url': requests,
+            },
+            'harvesters': {
+                'totals': self._totals(harvesters, 0, ('count', 'wall_seconds', 'cpu_seconds')),
+                'by_tenant': [{'harvester': h, 'tenant': t, **m} for (h, t), m in harvesters.items()],
+            },
+            'templates': {
+                'totals': self._totals(templates, 0, ('count', 'seconds')),
+                'by_output': [{'template': n, 'output': o, **m} for (n, o), m in templates.items()],
+            },
+        }
+
+    def write_json(self, path):
+        _write_atomic(path, json.dumps(self.to_dict(), indent=2))
+
+    def write_prometheus(self, path):
+        """
+        Write the run totals in Prometheus text format for node_exporter's
+        textfile collector (per-URL and per-tenant detail stays in the JSON).
+        """
+        data = self.to_dict()
+        lines = []
+
+        def metric(name, help_text, kind, samples):
+            lines.append(f"# HELP {PROM_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PROM_PREFIX}_{name} {kind}")
+            for labels, value in samples:
+                label_str = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{PROM_PREFIX}_{name}{{{label_str}}} {value}" if label_str
+                             else f"{PROM_PREFIX}_{name} {value}")
+
+        req = data['requests']
+        metric('last_run_timestamp_seconds', 'Time the metrics were written.', 'gauge', [({}, int(time.time()))])
+        metric('phase_seconds', 'Wall time per run phase.', 'gauge',
+               [({'phase': p}, s) for p, s in sorted(data['phases'].items())])
+        metric('apic_requests', 'APIC requests issued.', 'gauge', [({}, req['count'])])
+        metric('apic_request_seconds', 'Summed APIC request time, including body transfer.', 'gauge',
+               [({}, req['seconds'])])
+        metric('apic_response_bytes', 'APIC response body bytes.', 'gauge', [({}, req['bytes'])])
+        metric('apic_mos', 'Managed objects received from the APIC.', 'gauge', [({}, req['mos'])])
+        totals = data['harvesters']['totals']
+        metric('harvester_wall_seconds', 'Wall time per harvester, summed over tenants.', 'gauge',
+               [({'harvester': h}, m['wall_seconds']) for h, m in sorted(totals.items())])
+        metric('harvester_cpu_seconds', 'CPU time per harvester, summed over tenants.', 'gauge',
+               [({'harvester': h}, m['cpu_seconds']) for h, m in sorted(totals.items())])
+        metric('template_render_seconds', 'Render time per template, summed over outputs.', 'gauge',
+               [({'template': t}, m['seconds']) for t, m in sorted(data['templates']['totals'].items())])
+        _write_atomic(path, '\n'.join(lines) + '\n')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _write_atomic(path, text):
+    # The textfile collector may read at any moment; never expose a partial file.
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
@@ -1,51 +1,169 @@
+from collections import ChainMap, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .class_harvest import ClassQueryApi
+from .harvesters import bds, contracts, epgs, esg, l2out, l3out, service_graphs, vmm, vrfs
 from .harvesters.tenants import harvest_tenants
-from .harvesters.vrfs import harvest_vrfs_for_tenant
-from .harvesters.bds import harvest_bds_for_tenant
-from .harvesters.epgs import harvest_epgs_for_tenant
-from .harvesters.contracts import harvest_contracts_for_tenant
-from .harvesters.l3out import harvest_l3out_for_tenant
-from .harvesters.l2out import harvest_l2out_for_tenant
-from .harvesters.service_graphs import harvest_service_graphs_for_tenant
-from .harvesters.esg import harvest_esg_for_tenant
+from .utils.log import debug, error
 
 SYSTEM_TENANTS = {"mgmt", "common", "infra"}
 
-def run_harvest(api, sections, debug_enabled=False):
-    fabric = {'tenants': []}
+# Harvester modules run for each section; each declares the MO classes it reads.
+SECTION_HARVESTERS = {
+    'tenants': (vrfs, bds, epgs),
+    'contracts': (contracts,),
+    'l3out': (l3out,),
+    'l2out': (l2out,),
+    'service_graphs': (service_graphs,),
+    'vmm': (vmm,),
+    'esg': (esg,),
+}
+
+def harvester_classes(sections):
+    """
+    Merge the CLASSES/CHILD_CLASSES declared by the enabled sections' harvesters.
+    Returns (classes, {parent class: [inline child classes]}).
+    """
+    classes, child_classes = [], {}
+    for section, modules in SECTION_HARVESTERS.items():
+        if not sections.get(section):
+            continue
+        for mod in modules:
+            for cls in mod.CLASSES:
+                if cls not in classes:
+                    classes.append(cls)
+            for parent, children in getattr(mod, 'CHILD_CLASSES', {}).items():
+                merged = child_classes.setdefault(parent, [])
+                merged.extend(c for c in children if c not in merged)
+    return classes, child_classes
+
+def harvest_tenant(api, tn, sections):
+    timed = api.metrics.harvester
+    entry = {'name': tn['name']}
+    if sections.get('tenants'):
+        with timed('vrfs', tn['name']):
+            entry['vrfs'] = vrfs.harvest_vrfs_for_tenant(api, tn)
+        with timed('bds', tn['name']):
+            entry['bds'] = bds.harvest_bds_for_tenant(api, tn)
+        with timed('epgs', tn['name']):
+            entry['epgs'] = epgs.harvest_epgs_for_tenant(api, tn)
+    if sections.get('contracts'):
+        with timed('contracts', tn['name']):
+            entry['contracts'] = contracts.harvest_contracts_for_tenant(api, tn)
+    if sections.get('l3out'):
+        with timed('l3out', tn['name']):
+            entry['l3outs'] = l3out.harvest_l3out_for_tenant(api, tn)
+        vrf_map = {}
+        for lo in entry.get('l3outs', []):
+            vrf = lo.get('vrf')
+            if vrf:
+                vrf_map.setdefault(vrf, []).append(lo.get('name'))
+        for v in entry.get('vrfs', []):
+            names = vrf_map.get(v.get('name'), [])
+            v['l3outs'] = sorted(names)
+    if sections.get('l2out'):
+        with timed('l2out', tn['name']):
+            entry['l2outs'] = l2out.harvest_l2out_for_tenant(api, tn)
+    if sections.get('service_graphs'):
+        with timed('service_graphs', tn['name']):
+            entry['service_graphs'] = service_graphs.harvest_service_graphs_for_tenant(api, tn)
+    if sections.get('vmm'):
+        with timed('vmm', tn['name']):
+            entry['vmm'] = vmm.harvest_vmm_for_tenant(api, tn)
+    if sections.get('esg'):
+        with timed('esg', tn['name']):
+            entry['esgs'] = esg.harvest_esg_for_tenant(api, tn)
+    return entry
+
+def _harvest_tenant_safe(api, tn, sections):
+    try:
+        return harvest_tenant(api, tn, sections)
+    except Exception as exc:
+        error(f"Tenant {tn['name']} failed: {exc}")
+        return None
+
+def _harvest_and_release(api, tn, sections):
+    entry = _harvest_tenant_safe(api, tn, sections)
+    # Every harvester of this tenant has run; its subtree is not read again
+    api.release_subtree(tn['dn'])
+    return entry
+
+def _harvested(api, tenants, sections, workers, reuse):
+    if workers <= 1:
+        for tn in tenants:
+            yield tn['name'], reuse[tn['name']] if tn['name'] in reuse else _harvest_and_release(api, tn, sections)
+        return
+    # Tenants are independent; threads share the session's connection pool.
+    # A window of 2x workers keeps the threads busy while the caller consumes
+    # entries in tenant order.
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        window = deque()
+        for tn in tenants:
+            job = None if tn['name'] in reuse else pool.submit(_harvest_and_release, api, tn, sections)
+            window.append((tn['name'], job))
+            if len(window) >= 2 * workers:
+                name, job = window.popleft()
+                yield name, reuse[name] if job is None else job.result()
+        while window:
+            name, job = window.popleft()
+            yield name, reuse[name] if job is None else job.result()
+
+def iter_harvest(api, sections, debug_enabled=False, workers=1, mode='subtree', reuse=None, checkpoint=None):
+    """
+    Harvest tenant by tenant, yielding (tenant name, entry) in tenant order;
+    the entry is None for a tenant that failed.  Only a few tenants are
+    harvested ahead of the consumer, so a caller that renders and drops
+    each entry holds a bounded number of them.
+
+    ``reuse`` maps tenant names to entries from a previous run that are known
+    to be unchanged; those tenants are carried over instead of re-harvested.
+
+    Each completed entry is added to ``checkpoint`` (a HarvestCheckpoint)
+    before it is yielded, and failed tenants are reported to it.  The
+    tenants a resumed checkpoint already holds are carried over like ``reuse``.
+    """
+    classes, child_classes = harvester_classes(sections)
+    if mode == 'class':
+        # One fabric-wide query per MO class, split into tenants by DN.
+        api = ClassQueryApi(api, classes, child_classes, workers=workers).load()
+    else:
+        api.set_subtree_classes(classes, [c for children in child_classes.values() for c in children])
 
     tenants = harvest_tenants(api, debug_enabled=debug_enabled) if sections.get('tenants') else []
     # filter if requested
     if not sections.get('include_system_tenants', False):
         tenants = [t for t in tenants if t['name'] not in SYSTEM_TENANTS]
 
-    for tn in tenants:
-        entry = {'name': tn['name']}
-        if sections.get('tenants'):
-            entry['vrfs'] = harvest_vrfs_for_tenant(api, tn)
-            entry['bds'] = harvest_bds_for_tenant(api, tn)
-            entry['epgs'] = harvest_epgs_for_tenant(api, tn)
-        if sections.get('contracts'):
-            entry['contracts'] = harvest_contracts_for_tenant(api, tn)
-        if sections.get('l3out'):
-            entry['l3outs'] = harvest_l3out_for_tenant(api, tn)
-            vrf_map = {}
-            for lo in entry.get('l3outs', []):
-                vrf = lo.get('vrf')
-                if vrf:
-                    vrf_map.setdefault(vrf, []).append(lo.get('name'))
-            for v in entry.get('vrfs', []):
-                names = vrf_map.get(v.get('name'), [])
-                v['l3outs'] = sorted(names)
-        if sections.get('l2out'):
-            entry['l2outs'] = harvest_l2out_for_tenant(api, tn)
-        if sections.get('service_graphs'):
-            entry['service_graphs'] = harvest_service_graphs_for_tenant(api, tn)
-        if sections.get('vmm'):
-            from .harvesters.vmm import harvest_vmm_for_tenant
-            entry['vmm'] = harvest_vmm_for_tenant(api, tn)
-        if sections.get('esg'):
-            entry['esgs'] = harvest_esg_for_tenant(api, tn)
-
-        fabric['tenants'].append(entry)
+    reuse = reuse or {}
+    if checkpoint is not None and checkpoint.resumed:
+        reuse = ChainMap(checkpoint, reuse)
+    if reuse:
+        pending = sum(1 for tn in tenants if tn['name'] not in reuse)
+        debug(f"Reusing {len(tenants) - pending} unchanged tenants, harvesting {pending}", debug_enabled)
 
+    for name, entry in _harvested(api, tenants, sections, workers, reuse):
+        if checkpoint is not None:
+            if entry is None:
+                checkpoint.fail(name)
+            else:
+                checkpoint.add(entry)
+        yield name, entry
+
+    debug(f"Subtree cache: {api.cache.stats()}", debug_enabled)
+    for member in api.members:
+        debug(f"Request governor {member.url}: {member.governor.stats()}", debug_enabled)
+    api.cache.clear()
+
+def run_harvest(api, sections, debug_enabled=False, workers=1, mode='subtree', reuse=None, checkpoint=None):
+    """The whole fabric as one dict: iter_harvest() collected into ``tenants`` and ``failed_tenants``."""
+    fabric = {'tenants': []}
+    failed = []
+    for name, entry in iter_harvest(api, sections, debug_enabled=debug_enabled, workers=workers, mode=mode,
+                                    reuse=reuse, checkpoint=checkpoint):
+        if entry is None:
+            failed.append(name)
+        else:
+            fabric['tenants'].append(entry)
+    if failed:
+        fabric['failed_tenants'] = failed
     return fabric
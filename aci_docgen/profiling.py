@@ -0,0 +1,98 @@
+import cProfile
+import io
+import os
+import pstats
+import re
+import tracemalloc
+from contextlib import contextmanager
+
+DEFAULT_TOP_FUNCTIONS = 15
+DEFAULT_TOP_PEAKS = 30
+
+
+class Profiler:
+    """
+    cProfile and tracemalloc per pipeline stage (the harvest and render
+    phases, each harvester, each template).  Stages nest: while an inner
+    stage runs the outer one's profile is paused, so a phase only reports
+    work done outside its harvesters/templates.  Peak allocation is recorded
+    per stage per item (tenant or output file) and includes nested stages.
+
+    cProfile only sees the thread that enabled it, so profiled runs harvest
+    with a single worker.
+    """
+
+    def __init__(self, top_functions=DEFAULT_TOP_FUNCTIONS, top_peaks=DEFAULT_TOP_PEAKS):
+        self.top_functions = top_functions
+        self.top_peaks = top_peaks
+        self.profiles = {}
+        self.calls = {}
+        self.peaks = {}
+        self._stack = []
+        tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name, item=None):
+        if self._stack:
+            outer = self._stack[-1]
+            outer['profile'].disable()
+            outer['max'] = max(outer['max'], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        frame = {'profile': self.profiles.setdefault(name, cProfile.Profile()),
+                 'start': tracemalloc.get_traced_memory()[0], 'max': 0}
+        self._stack.append(frame)
+        frame['profile'].enable()
+        try:
+            yield
+        finally:
+            frame['profile'].disable()
+            self._stack.pop()
+            peak = max(frame['max'], tracemalloc.get_traced_memory()[1])
+            key = (name, item)
+            self.peaks[key] = max(self.peaks.get(key, 0), peak - frame['start'])
+            self.calls[name] = self.calls.get(name, 0) + 1
+            if self._stack:
+                outer = self._stack[-1]
+                outer['max'] = max(outer['max'], peak)
+                tracemalloc.reset_peak()
+                outer['profile'].enable()
+
+    def stop(self):
+        tracemalloc.stop()
+
+    def _stage_rows(self):
+        rows = []
+        for name, profile in self.profiles.items():
+            stats = pstats.Stats(profile)
+            peak = max((b for (stage, _), b in self.peaks.items() if stage == name), default=0)
+            rows.append((name, self.calls.get(name, 0), stats.total_tt, peak))
+        return sorted(rows, key=lambda r: r[2], reverse=True)
+
+    def report(self):
+        out = io.StringIO()
+        out.write("Profile by stage (profiled time excludes nested stages)\n\n")
+        out.write(f"{'stage':<40} {'calls':>6} {'time s':>9} {'peak MiB':>9}\n")
+        rows = self._stage_rows()
+        for name, calls, seconds, peak in rows:
+            out.write(f"{name:<40} {calls:>6} {seconds:>9.3f} {peak / 2**20:>9.2f}\n")
+
+        out.write(f"\nPeak allocation per stage and item (top {self.top_peaks})\n\n")
+        out.write(f"{'stage':<40} {'item':<30} {'peak MiB':>9}\n")
+        peaks = sorted(((b, s, i) for (s, i), b in self.peaks.items() if i is not None), reverse=True)
+        for b, stage, item in peaks[:self.top_peaks]:
+            out.write(f"{stage:<40} {item:<30} {b / 2**20:>9.2f}\n")
+
+        for name, _, _, _ in rows:
+            out.write(f"\n== {name}: top {self.top_functions} functions by cumulative time ==\n")
+            stats = pstats.Stats(self.profiles[name], stream=out)
+            stats.strip_dirs().sort_stats('cumulative').print_stats(self.top_functions)
+        return out.getvalue()
+
+    def write(self, repdir):
+        """Write ``profile.txt`` and one ``profile/<stage>.prof`` per stage (for snakeviz/pstats)."""
+        os.makedirs(os.path.join(repdir, 'profile'), exist_ok=True)
+        with open(os.path.join(repdir, 'profile.txt'), 'w', encoding='utf-8') as f:
+            f.write(self.report())
+        for name, profile in self.profiles.items():
+            safe = re.sub(r'[^\w.-]+', '_', name)
+            profile.dump_stats(os.path.join(repdir, 'profile', f"{safe}.prof"))
@@ -0,0 +1,50 @@
+import json
+import os
+import threading
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+# The templates ship next to the package, so rendering works from any CWD.
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'templates')
+DEFAULT_TEMPLATE_CACHE = os.path.join(os.path.expanduser('~'), '.cache', 'aci-docgen', 'jinja')
+COMPACT_MAX_CHARS = 120
+
+_environments = {}
+_lock = threading.Lock()
+
+
+def get_environment(template_dir=TEMPLATE_DIR, bytecode_cache=DEFAULT_TEMPLATE_CACHE):
+    """
+    Jinja environment shared by every renderer in the process, one per
+    (template dir, cache dir).  Compiled templates are kept in
+    ``bytecode_cache`` across runs; Jinja keys them on a checksum of the
+    template source, so an edited template is simply recompiled.  Pass
+    ``bytecode_cache=None`` to compile in memory only.
+    """
+    key = (template_dir, bytecode_cache)
+    with _lock:
+        env = _environments.get(key)
+        if env is None:
+            cache = None
+            if bytecode_cache:
+                try:
+                    os.makedirs(bytecode_cache, exist_ok=True)
+                    cache = FileSystemBytecodeCache(bytecode_cache)
+                except OSError:
+                    # Read-only home or similar: compile without a persistent cache
+                    cache = None
+            env = Environment(loader=FileSystemLoader(template_dir), trim_blocks=True, lstrip_blocks=True,
+                              bytecode_cache=cache)
+            env.filters['compact'] = compact
+            _environments[key] = env
+        return env
+
+
+def compact(value, limit=COMPACT_MAX_CHARS):
+    """One-line JSON of ``value`` (strings unquoted), cut at ``limit`` characters."""
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, sort_keys=True)
+    return text if len(text) <= limit else text[:limit - 1] + '…'
+
+
+def template_exists(name, template_dir=TEMPLATE_DIR):
+    return os.path.exists(os.path.join(template_dir, name))
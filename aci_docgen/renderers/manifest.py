@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+from ..utils.log import info
+
+MANIFEST_FILE = os.path.join('reports', 'manifest.json')
+CHANGES_FILE = os.path.join('reports', 'changed.json')
+TMP_PREFIX = '.docgen-'
+
+
+class OutputManifest:
+    """
+    sha256 of every file the renderer owns under ``outdir``, kept in
+    ``reports/manifest.json`` between runs.  write() leaves a file alone
+    when its content hash (and size on disk) match the manifest, so
+    unchanged pages keep their mtime and stay out of git and the site
+    rebuild; other files are replaced atomically (temp file + rename).
+
+    Changes accumulate until save(), which stores the hashes and lists the
+    files changed and removed since the previous save in
+    ``reports/changed.json``.  Paths are relative to ``outdir`` with
+    forward slashes.
+    """
+
+    def __init__(self, outdir):
+        self.outdir = outdir
+        self.hashes = self._load()
+        self._reset()
+
+    def _reset(self):
+        self.changed = {}
+        self.removed = []
+        self.seen = set()
+        self.unchanged = 0
+
+    def _load(self):
+        try:
+            with open(os.path.join(self.outdir, MANIFEST_FILE), encoding='utf-8') as f:
+                return json.load(f).get('files', {})
+        except (OSError, ValueError):
+            return {}
+
+    def sweep(self, before):
+        """
+        Remove the temp files of a run that was killed mid-write (e.g. a
+        --stream snapshot before --resume), last modified before ``before``
+        (a time.time()).  Called once per run by its entry point, never by
+        render workers, as a running process's temp files look the same.
+        """
+        dirs = {os.path.dirname(MANIFEST_FILE)} | {os.path.dirname(p) for p in self.hashes}
+        for d in sorted(dirs):
+            try:
+                names = os.listdir(os.path.join(self.outdir, d))
+            except OSError:
+                continue
+            for name in names:
+                path = os.path.join(self.outdir, d, name)
+                try:
+                    if name.startswith(TMP_PREFIX) and name.endswith('.tmp') and os.path.getmtime(path) < before:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+    def _unchanged(self, relpath, digest, size):
+        self.seen.add(relpath)
+        try:
+            same = self.hashes.get(relpath) == digest and os.path.getsize(os.path.join(self.outdir, relpath)) == size
+        except OSError:
+            same = False
+        if same:
+            self.unchanged += 1
+        return same
+
+    def _record(self, relpath, digest):
+        self.hashes[relpath] = digest
+        self.changed[relpath] = digest
+
+    def write(self, relpath, text):
+        """Write ``text`` to ``relpath`` unless it is unchanged; returns whether the file was written."""
+        data = text.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        if self._unchanged(relpath, digest, len(data)):
+            return False
+        write_atomic(os.path.join(self.outdir, relpath), data)
+        self._record(relpath, digest)
+        return True
+
+    @contextmanager
+    def stream(self, relpath):
+        """
+        write() for content produced piece by piece: yields a writer taking
+        text or bytes, which go to a temp file and are hashed on the way.  On exit the
+        temp file replaces ``relpath``, or is dropped if the content is unchanged.
+        """
+        path = os.path.join(self.outdir, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=TMP_PREFIX, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                writer = _HashingWriter(f)
+                yield writer
+            digest = writer.sha256.hexdigest()
+            if self._unchanged(relpath, digest, writer.size):
+                os.unlink(tmp)
+            else:
+                os.chmod(tmp, 0o644)
+                os.replace(tmp, path)
+                self._record(relpath, digest)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def remove(self, relpath):
+        path = os.path.join(self.outdir, relpath)
+        existed = self.hashes.pop(relpath, None) is not None or os.path.exists(path)
+        self.changed.pop(relpath, None)
+        if os.path.exists(path):
+            os.remove(path)
+        if existed:
+            self.removed.append(relpath)
+
+    def prune(self, prefix, keep=()):
+        """
+        Remove files under ``prefix`` from an earlier run that were not written
+        since the last save, except the relpaths in ``keep``.
+        """
+        keep = set(keep)
+        for relpath in sorted(self.hashes):
+            if relpath.startswith(prefix) and relpath not in self.seen and relpath not in keep:
+                self.remove(relpath)
+
+    def take(self):
+        """Changes since the last save/take, for merging into another manifest (render workers)."""
+        batch = {'changed': dict(self.changed), 'seen': sorted(self.seen), 'unchanged': self.unchanged}
+        self._reset()
+        return batch
+
+    def merge(self, batch):
+        self.hashes.update(batch['changed'])
+        self.changed.update(batch['changed'])
+        self.seen.update(batch['seen'])
+        self.unchanged += batch['unchanged']
+
+    def save(self):
+        changes = {'changed': sorted(self.changed), 'removed': sorted(self.removed), 'unchanged': self.unchanged}
+        write_atomic(os.path.join(self.outdir, MANIFEST_FILE),
+                     json.dumps({'files': dict(sorted(self.hashes.items()))}, indent=2).encode('utf-8'))
+        write_atomic(os.path.join(self.outdir, CHANGES_FILE), json.dumps(changes, indent=2).encode('utf-8'))
+        info(f"{len(self.changed)} file(s) changed, {len(self.removed)} removed, {self.unchanged} unchanged")
+        self._reset()
+        return changes
+
+
+class _HashingWriter:
+    def __init__(self, f):
+        self.f = f
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.sha256.update(data)
+        self.size += len(data)
+        self.f.write(data)
+        return len(data)
+
+    def flush(self):
+        self.f.flush()
+
+
+def write_atomic(path, data):
+    # Readers (git, the site build, a watch-mode consumer) never see a partial file.
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=TMP_PREFIX, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
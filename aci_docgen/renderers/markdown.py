@@ -1,39 +1,213 @@
 import os, json
-from jinja2 import Environment, FileSystemLoader
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from ..diff import HashTree, change_tracker, previous_run
+from ..metrics import Metrics
+from ..snapshot import SnapshotWriter, index_name, snapshot_name, write_snapshot
+from .environment import DEFAULT_TEMPLATE_CACHE, get_environment, template_exists
+from .manifest import OutputManifest
 from ..utils.log import info
 
+# Per-tenant keys index.md and testing.md read, kept for every tenant by render_stream()
+FABRIC_VIEW_KEYS = ('l3outs', 'l2outs', 'service_graphs')
+TESTING_EPGS = 10
+
+
+def fabric_view(entry):
+    """The part of a tenant entry the fabric-wide pages render (see templates/testing.md.j2)."""
+    view = {'name': entry['name']}
+    if 'epgs' in entry:
+        view['epgs'] = [{k: e[k] for k in ('name', 'ap') if k in e} for e in entry['epgs'][:TESTING_EPGS]]
+    if 'contracts' in entry:
+        view['contracts'] = [{'name': c['name']} for c in entry['contracts'] if 'name' in c]
+    for key in FABRIC_VIEW_KEYS:
+        if key in entry:
+            view[key] = entry[key]
+    return view
+
 class MarkdownRenderer:
-    def __init__(self, outdir):
+    def __init__(self, outdir, metrics=None, processes=1, template_cache=DEFAULT_TEMPLATE_CACHE,
+                 snapshot_format='json', snapshot_compression='none'):
         self.outdir = outdir
-        self.env = Environment(loader=FileSystemLoader('templates'), trim_blocks=True, lstrip_blocks=True)
+        # Optional Metrics: render time per template and output file
+        self.metrics = metrics
+        # Worker processes for render(); pages are the same bytes either way.
+        self.processes = processes
+        self.template_cache = template_cache
+        self.env = get_environment(bytecode_cache=template_cache)
+        # Content hashes of the pages: unchanged files are not rewritten
+        self.manifest = OutputManifest(outdir)
+        # reports/summary.json unless another snapshot format is chosen
+        self.snapshot_format = snapshot_format
+        self.snapshot_compression = snapshot_compression
+        self.snapshot = f"reports/{snapshot_name(snapshot_format, snapshot_compression)}"
+
+    def write_reports(self, data, tracker=None):
+        """
+        Write the snapshot and its hash tree, and record what changed since
+        the last call in reports/changed.json.  With a diff.ChangeTracker that
+        has seen ``data``, also write changes.md and reports/changes.json.
+        """
+        with self.manifest.stream(self.snapshot) as f:
+            writer = write_snapshot(f, data, self.snapshot_format, self.snapshot_compression)
+        if tracker is None:
+            return self._save_manifest(writer, HashTree.from_data(data))
+        return self._save_manifest(writer, tracker.tree, tracker.result())
+
+    def _tracker(self):
+        # Diff against the last run here; its snapshot is read before being replaced
+        previous, reader = previous_run(os.path.join(self.outdir, 'reports'))
+        return change_tracker(previous, reader), reader
+
+    def _save_manifest(self, snapshot, tree, changes=None):
+        index = snapshot.index()
+        if index is not None:
+            # Per-tenant byte offsets for snapshot.SnapshotReader
+            self.manifest.write(index_name(self.snapshot), json.dumps(index, ensure_ascii=False))
+        self.manifest.write('reports/hashtree.json', tree.to_json())
+        if changes is not None:
+            self.manifest.write('reports/changes.json', json.dumps(changes, indent=2, ensure_ascii=False))
+            self.manifest.write('changes.md', self._render_template('changes.md.j2', 'changes.md', diff=changes))
+        # A snapshot (or index) left over from a run with another format
+        self.manifest.prune('reports/summary.')
+        return self.manifest.save()
 
-    def write_reports(self, data):
-        repdir = os.path.join(self.outdir, 'reports')
-        os.makedirs(repdir, exist_ok=True)
-        with open(os.path.join(repdir, 'summary.json'), 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+    def _render_template(self, name, output, **context):
+        timed = self.metrics.template(name, output) if self.metrics else nullcontext()
+        with timed:
+            return self.env.get_template(name).render(**context)
+
+    def _stream_template(self, name, output, **context):
+        # The fabric-wide pages grow with the fabric; write them as Jinja generates them
+        timed = self.metrics.template(name, output) if self.metrics else nullcontext()
+        with timed, self.manifest.stream(output) as f:
+            for chunk in self.env.get_template(name).generate(**context):
+                f.write(chunk)
+
+    def render_index(self, data):
+        self._stream_template('index.md.j2', 'index.md', data=data)
+
+    def render_tenant(self, t):
+        body = self._render_template('tenant.md.j2', f"tenants/{t['name']}.md", tenant=t)
+        self.manifest.write(f"tenants/{t['name']}.md", body)
+
+    def remove_tenant(self, name):
+        self.manifest.remove(f"tenants/{name}.md")
+
+    def render_testing(self, data):
+        # testing plan (if template exists)
+        if data.get('tenants') is not None and template_exists('testing.md.j2'):
+            self._stream_template('testing.md.j2', 'testing.md', data=data)
 
     def render(self, data):
         os.makedirs(self.outdir, exist_ok=True)
         os.makedirs(os.path.join(self.outdir, 'tenants'), exist_ok=True)
 
-        # index
-        idx = self.env.get_template('index.md.j2').render(data=data)
-        with open(os.path.join(self.outdir, 'index.md'), 'w', encoding='utf-8') as f:
-            f.write(idx)
+        # More processes than cores only adds pickling and contention.
+        processes = min(self.processes, os.cpu_count() or 1)
+        if processes > 1 and len(data.get('tenants', [])) > 1:
+            self._render_parallel(data, processes)
+        else:
+            # index
+            self.render_index(data)
 
-        # per-tenant
-        ttpl = self.env.get_template('tenant.md.j2')
-        for t in data.get('tenants', []):
-            body = ttpl.render(tenant=t)
-            with open(os.path.join(self.outdir, 'tenants', f"{t['name']}.md"), 'w', encoding='utf-8') as f:
-                f.write(body)
+            # per-tenant
+            for t in data.get('tenants', []):
+                self.render_tenant(t)
 
-        # testing plan (if template exists)
-        if data.get('tenants') is not None and os.path.exists(os.path.join('templates','testing.md.j2')):
-            tplan = self.env.get_template('testing.md.j2').render(data=data)
-            with open(os.path.join(self.outdir, 'testing.md'), 'w', encoding='utf-8') as f:
-                f.write(tplan)
+            self.render_testing(data)
+
+        tracker, previous = self._tracker()
+        try:
+            for t in data.get('tenants', []):
+                tracker.add(t)
+            for name in data.get('failed_tenants', []):
+                tracker.fail(name)
+        finally:
+            if previous:
+                previous.close()
+
+        # Pages of tenants that no longer exist; a failed tenant keeps its page from the last run
+        self.manifest.prune('tenants/', keep=(f"tenants/{name}.md" for name in data.get('failed_tenants', [])))
+        changes = self.write_reports(data, tracker)
+        info(f"Wrote Markdown to {self.outdir}")
+        return changes
+
+    def render_stream(self, tenants):
+        """
+        render() for a fabric that is never held in memory: ``tenants`` yields
+        (tenant name, entry or None if it failed), e.g. pipeline.iter_harvest.
+        Each tenant's page is written, its entry appended to the snapshot and
+        diffed against the previous run before the next one is read; only its
+        fabric_view() is kept for index.md and testing.md.  The files are the
+        same as render()'s.
+        """
+        os.makedirs(os.path.join(self.outdir, 'tenants'), exist_ok=True)
+        views = []
+        failed = []
+        tracker, previous = self._tracker()
+        with self.manifest.stream(self.snapshot) as f, \
+                SnapshotWriter(f, self.snapshot_format, self.snapshot_compression) as snapshot:
+            try:
+                for name, entry in tenants:
+                    if entry is None:
+                        snapshot.fail(name)
+                        tracker.fail(name)
+                        failed.append(f"tenants/{name}.md")
+                        continue
+                    self.render_tenant(entry)
+                    snapshot.add(entry)
+                    tracker.add(entry)
+                    views.append(fabric_view(entry))
+            finally:
+                # Before the new snapshot replaces the one it maps
+                if previous:
+                    previous.close()
 
-        self.write_reports(data)
+        data = {'tenants': views}
+        self.render_index(data)
+        self.render_testing(data)
+        self.manifest.prune('tenants/', keep=failed)
+        changes = self._save_manifest(snapshot, tracker.tree, tracker.result())
         info(f"Wrote Markdown to {self.outdir}")
+        return changes
+
+    def _render_parallel(self, data, processes):
+        """
+        Render index.md, every tenant page and testing.md in worker processes.
+        Each worker runs this same renderer (own Jinja environment and a copy
+        of the manifest) and writes its pages directly, so only the page data
+        crosses process boundaries; their manifest changes are merged here.
+        """
+        tenant_jobs = [('tenant', t) for t in data.get('tenants', [])]
+        chunksize = max(1, len(tenant_jobs) // (processes * 4))
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(self.outdir, self.template_cache)) as pool:
+            # The fabric-wide pages are the largest; start them first.
+            fabric_pages = [pool.submit(_render_job, ('testing', data)), pool.submit(_render_job, ('index', data))]
+            results = list(pool.map(_render_job, tenant_jobs, chunksize=chunksize))
+            results += [f.result() for f in fabric_pages]
+        for timings, changes in results:
+            self.manifest.merge(changes)
+            if self.metrics:
+                for (name, output), m in timings.items():
+                    self.metrics.record_template(name, output, m['seconds'])
+
+
+_worker_renderer = None
+
+def _init_worker(outdir, template_cache):
+    global _worker_renderer
+    _worker_renderer = MarkdownRenderer(outdir, template_cache=template_cache)
+
+def _render_job(job):
+    """Render one page in a worker; returns its template timings and manifest changes."""
+    kind, payload = job
+    _worker_renderer.metrics = Metrics()
+    if kind == 'index':
+        _worker_renderer.render_index(payload)
+    elif kind == 'tenant':
+        _worker_renderer.render_tenant(payload)
+    else:
+        _worker_renderer.render_testing(payload)
+    return _worker_renderer.metrics.templates, _worker_renderer.manifest.take()
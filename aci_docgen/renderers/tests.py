@@ -1,10 +1,10 @@
 import os
-from jinja2 import Environment, FileSystemLoader
+from .environment import DEFAULT_TEMPLATE_CACHE, get_environment
 
 class TestsRenderer:
-    def __init__(self, outdir):
+    def __init__(self, outdir, template_cache=DEFAULT_TEMPLATE_CACHE):
         self.outdir = outdir
-        self.env = Environment(loader=FileSystemLoader('templates'), trim_blocks=True, lstrip_blocks=True)
+        self.env = get_environment(bytecode_cache=template_cache)
 
     def render(self, data):
         tdir = os.path.join(self.outdir, 'tests')
@@ -0,0 +1,57 @@
+import gzip
+import hashlib
+import os
+import tempfile
+
+READ_CHUNK_BYTES = 64 * 1024
+
+
+class ResponseStore:
+    """
+    Gzip-compressed APIC response bodies on disk, one file per query.  Keys
+    are the URL path and query string (``/api/class/fvTenant.json?...``), so
+    recordings survive an APIC address change.
+
+    ``record`` tees a response's byte chunks into the store while they are
+    being consumed; ``replay`` yields them back, so AciApi decodes recorded and
+    live responses through the same streaming path.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.root, f"{digest}.json.gz")
+
+    def __contains__(self, key):
+        return os.path.exists(self.path_for(key))
+
+    def record(self, key, chunks):
+        path = self.path_for(key)
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        complete = False
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as gz:
+                for chunk in chunks:
+                    gz.write(chunk)
+                    yield chunk
+            complete = True
+        finally:
+            # Only keep fully read responses; a partial body would replay as a broken one.
+            if complete:
+                os.replace(tmp, path)
+            else:
+                os.unlink(tmp)
+
+    def replay(self, key):
+        path = self.path_for(key)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No recorded response for {key} in {self.root}; run with --record first")
+        with gzip.open(path, 'rb') as gz:
+            while True:
+                chunk = gz.read(READ_CHUNK_BYTES)
+                if not chunk:
+                    return
+                yield chunk
@@ -0,0 +1,329 @@
+import gzip
+import hashlib
+import io
+import json
+import mmap
+import os
+
+FORMATS = ('json', 'ndjson', 'msgpack')
+COMPRESSIONS = ('none', 'gzip', 'zstd')
+EXTENSIONS = {'json': '.json', 'ndjson': '.ndjson', 'msgpack': '.msgpack'}
+SUFFIXES = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+SNAPSHOT_STEM = 'summary'
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+INDEX_SUFFIX = '.idx'
+
+
+def snapshot_name(fmt='json', compression='none'):
+    """File name of a snapshot, e.g. ``summary.json`` or ``summary.ndjson.zst``."""
+    return f"{SNAPSHOT_STEM}{EXTENSIONS[fmt]}{SUFFIXES[compression]}"
+
+
+def index_name(path):
+    """The offset index sidecar of a snapshot, e.g. ``summary.json.idx``."""
+    return f"{path}{INDEX_SUFFIX}"
+
+
+def parse_name(path):
+    """(format, compression) of a snapshot file name."""
+    name = os.path.basename(path)
+    compression = next((c for c, s in SUFFIXES.items() if s and name.endswith(s)), 'none')
+    name = name[:len(name) - len(SUFFIXES[compression])]
+    fmt = next((f for f, e in EXTENSIONS.items() if name.endswith(e)), None)
+    if fmt is None:
+        raise ValueError(f"Not a snapshot file name: {path}")
+    return fmt, compression
+
+
+def find_snapshot(repdir):
+    """The most recently written snapshot in ``repdir``, or None."""
+    candidates = [os.path.join(repdir, snapshot_name(f, c)) for f in FORMATS for c in COMPRESSIONS]
+    existing = [p for p in candidates if os.path.exists(p)]
+    return max(existing, key=os.path.getmtime) if existing else None
+
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise RuntimeError("the msgpack snapshot format needs the msgpack package (pip install msgpack)")
+    return msgpack
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("zstd snapshots need the zstandard package (pip install zstandard)")
+    return zstandard
+
+
+class SnapshotWriter:
+    """
+    Write a fabric snapshot (the structure run_harvest returns) tenant by
+    tenant to the binary file ``f``; only the current entry is encoded at a
+    time.  Formats:
+
+    - ``json``: the classic ``summary.json`` layout (indent 2), byte for byte
+    - ``ndjson``: one compact JSON tenant entry per line
+    - ``msgpack``: one msgpack map per tenant entry
+
+    In ndjson and msgpack, failed tenants follow the entries as a single
+    ``{"failed_tenants": [...]}`` record.  ``compression`` (gzip/zstd) wraps
+    the encoded stream; both are deterministic, so an unchanged fabric gives
+    an unchanged file.
+
+    Uncompressed snapshots also get an offset index (index()) for
+    SnapshotReader: the byte range and sha256 of each tenant entry, and the
+    sha256 of the bytes after the last one.
+    """
+
+    def __init__(self, f, fmt='json', compression='none'):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown snapshot format: {fmt}")
+        self.fmt = fmt
+        self.failed = []
+        self.count = 0
+        self.offset = 0
+        self.offsets = {} if compression == 'none' else None
+        # Hash of what was written since the last entry (the trailer, once closed)
+        self._tail = hashlib.sha256() if self.offsets is not None else None
+        if compression == 'gzip':
+            self._stream = gzip.GzipFile(fileobj=f, mode='wb', compresslevel=GZIP_LEVEL, mtime=0)
+        elif compression == 'zstd':
+            self._stream = _zstd().ZstdCompressor(level=ZSTD_LEVEL).stream_writer(f, closefd=False)
+        elif compression == 'none':
+            self._stream = None
+        else:
+            raise ValueError(f"Unknown snapshot compression: {compression}")
+        self._out = self._stream or f
+        if fmt == 'msgpack':
+            self._packer = _msgpack().Packer(use_bin_type=True)
+        elif fmt == 'json':
+            self._write(b'{\n  "tenants": [')
+
+    def _write(self, data):
+        self._out.write(data)
+        self.offset += len(data)
+        if self._tail is not None:
+            self._tail.update(data)
+
+    def add(self, entry):
+        if self.fmt == 'json':
+            # Same bytes as json.dump(data, indent=2, ensure_ascii=False)
+            self._write(b',\n    ' if self.count else b'\n    ')
+            data = json.dumps(entry, indent=2, ensure_ascii=False).replace('\n', '\n    ').encode('utf-8')
+        elif self.fmt == 'ndjson':
+            data = json.dumps(entry, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+        else:
+            data = self._packer.pack(entry)
+        if self.offsets is not None:
+            self.offsets[entry.get('name')] = [self.offset, len(data), hashlib.sha256(data).hexdigest()]
+        self._write(data)
+        if self._tail is not None:
+            self._tail = hashlib.sha256()
+        self.count += 1
+
+    def fail(self, name):
+        self.failed.append(name)
+
+    def close(self):
+        if self.fmt == 'json':
+            self._write(b'\n  ]' if self.count else b']')
+            if self.failed:
+                text = json.dumps(self.failed, indent=2, ensure_ascii=False).replace('\n', '\n  ')
+                self._write(f',\n  "failed_tenants": {text}'.encode('utf-8'))
+            self._write(b'\n}')
+        elif self.failed:
+            trailer = {'failed_tenants': self.failed}
+            if self.fmt == 'ndjson':
+                self._write(json.dumps(trailer, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n')
+            else:
+                self._write(self._packer.pack(trailer))
+        if self._stream is not None:
+            self._stream.close()
+
+    def index(self):
+        """
+        Sidecar content after close(): tenant name -> [offset, length, sha256],
+        with the snapshot's size and the sha256 of its trailer; None when compressed.
+        """
+        if self.offsets is None:
+            return None
+        return {'format': self.fmt, 'size': self.offset, 'tail_sha256': self._tail.hexdigest(),
+                'tenants': self.offsets}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+
+def write_snapshot(f, data, fmt='json', compression='none'):
+    """Write ``data`` in one go; returns the writer (for index())."""
+    with SnapshotWriter(f, fmt, compression) as writer:
+        for entry in data.get('tenants', []):
+            writer.add(entry)
+        for name in data.get('failed_tenants', []):
+            writer.fail(name)
+    return writer
+
+
+def _open(path):
+    _, compression = parse_name(path)
+    f = open(path, 'rb')
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=f, mode='rb')
+    if compression == 'zstd':
+        return io.BufferedReader(_zstd().ZstdDecompressor().stream_reader(f, closefd=True))
+    return f
+
+
+def _records(path):
+    fmt, _ = parse_name(path)
+    with _open(path) as f:
+        if fmt == 'json':
+            data = json.load(f)
+            yield from data.get('tenants', [])
+            if data.get('failed_tenants'):
+                yield {'failed_tenants': data['failed_tenants']}
+        elif fmt == 'ndjson':
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from _msgpack().Unpacker(f, raw=False)
+
+
+def iter_snapshot(path):
+    """
+    Yield the tenant entries of a snapshot one at a time (ndjson and msgpack
+    are decoded incrementally; json is parsed whole).
+    """
+    for record in _records(path):
+        if 'failed_tenants' not in record:
+            yield record
+
+
+def read_snapshot(path):
+    """Load a snapshot of any format back into run_harvest's structure."""
+    data = {'tenants': []}
+    for record in _records(path):
+        if 'failed_tenants' in record:
+            data['failed_tenants'] = record['failed_tenants']
+        else:
+            data['tenants'].append(record)
+    return data
+
+
+def _index_matches(index, fmt, path):
+    """Whether ``index`` may belong to the snapshot now at ``path``; entries are verified as they are read."""
+    if not index or index.get('format') != fmt or not index.get('tail_sha256'):
+        return False
+    return index.get('size') == os.path.getsize(path)
+
+
+class SnapshotReader:
+    """
+    Random access to the tenants of a snapshot.  With an offset index of
+    the same format and size next to it, the file is memory-mapped and only
+    the requested tenant entries are decoded and checked against their
+    sha256, so a lookup costs the same on any fabric size.  Without an index
+    (compressed snapshots), or once an entry does not match its hash (the
+    snapshot was rewritten since), lookups scan the snapshot instead.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fmt, _ = parse_name(path)
+        self.offsets = None
+        self._tail_sha256 = None
+        self._file = self._map = None
+        try:
+            with open(index_name(path), encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = None
+        if _index_matches(index, self.fmt, path):
+            self.offsets = index['tenants']
+            self._tail_sha256 = index['tail_sha256']
+            self._file = open(path, 'rb')
+            if index['size']:
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @property
+    def indexed(self):
+        return self.offsets is not None
+
+    def names(self):
+        if self.indexed:
+            return list(self.offsets)
+        return [entry.get('name') for entry in iter_snapshot(self.path)]
+
+    def _drop_index(self):
+        self.close()
+        self.offsets = None
+        self._file = self._map = None
+
+    def _decode(self, name):
+        """The entry of ``name`` from its byte range; None if those bytes are not the indexed entry."""
+        offset, length, digest = self.offsets[name]
+        data = self._map[offset:offset + length]
+        if hashlib.sha256(data).hexdigest() != digest:
+            return None
+        if self.fmt == 'msgpack':
+            return _msgpack().unpackb(data, raw=False)
+        return json.loads(data)
+
+    def tenant(self, name):
+        """The entry of tenant ``name``; KeyError if the snapshot has no such tenant."""
+        return self.tenants([name])[0]
+
+    def tenants(self, names):
+        """The entries of ``names``, in that order."""
+        if self.indexed:
+            missing = [n for n in names if n not in self.offsets]
+            if missing:
+                raise KeyError(missing[0])
+            entries = [self._decode(n) for n in names]
+            if None not in entries:
+                return entries
+            self._drop_index()
+        wanted = set(names)
+        found = {e['name']: e for e in iter_snapshot(self.path) if e.get('name') in wanted}
+        missing = [n for n in names if n not in found]
+        if missing:
+            raise KeyError(missing[0])
+        return [found[n] for n in names]
+
+    def failed_tenants(self):
+        """Tenants the snapshot lists as not harvested."""
+        if self.indexed:
+            # Every format writes them after the last entry; decode just that tail
+            end = max((o + n for o, n, _ in self.offsets.values()), default=0)
+            tail = self._map[end:] if self._map is not None else b''
+            if hashlib.sha256(tail).hexdigest() != self._tail_sha256:
+                self._drop_index()
+                return self.failed_tenants()
+            if self.fmt == 'msgpack':
+                return _msgpack().unpackb(tail, raw=False).get('failed_tenants', []) if tail else []
+            if self.fmt == 'json':
+                start = tail.find(b'"failed_tenants"')
+                return json.loads(b'{' + tail[start:])['failed_tenants'] if start >= 0 else []
+            return json.loads(tail)['failed_tenants'] if tail.strip() else []
+        return next((r['failed_tenants'] for r in _records(self.path) if 'failed_tenants' in r), [])
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,156 @@
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+# (table, key in a tenant entry, columns copied from each object, indexed columns).
+# Column names are the harvester keys; every row also keeps the whole object as JSON in ``data``.
+TABLES = (
+    ('vrfs', 'vrfs', ('name', 'dn', 'pcEnfPref', 'pcEnfDir', 'ipDataPlaneLearning', 'knwMcastAct',
+                      'bdEnforcedEnable', 'pcTag', 'health', 'bd_count'), ('pcEnfPref',)),
+    ('bds', 'bds', ('name', 'unicastRoute', 'arpFlood', 'unkMacUcastAct', 'limitIpLearnToSubnets', 'ipLearning',
+                    'multiDstPktAct'), ('arpFlood', 'unicastRoute')),
+    ('epgs', 'epgs', ('name', 'ap', 'domains'), ()),
+    ('contracts', 'contracts', ('name', 'scope', 'providers', 'consumers'), ()),
+    ('l3outs', 'l3outs', ('name', 'dn', 'vrf', 'protocols', 'external_subnets'), ('vrf',)),
+    ('l2outs', 'l2outs', ('name', 'bd', 'domains'), ('bd',)),
+    ('esgs', 'esgs', ('name', 'pcTag', 'pcEnfPref', 'prov_contracts', 'cons_contracts'), ()),
+)
+# (table, parent entry key, child key, (column, parent key) pairs, columns, indexed columns)
+CHILD_TABLES = (
+    ('subnets', 'bds', 'subnets', (('bd', 'name'),), ('ip', 'scope'), ('ip',)),
+    ('static_paths', 'epgs', 'static_paths', (('ap', 'ap'), ('epg', 'name')),
+     ('kind', 'leafs', 'iface_or_pc', 'vlan', 'raw_tdn'), ('iface_or_pc', 'vlan')),
+)
+
+
+def _schema():
+    # Attribute columns have no declared type, so strings and numbers keep the harvested type.
+    sql = [
+        "CREATE TABLE IF NOT EXISTS snapshots (id INTEGER PRIMARY KEY, created TEXT NOT NULL, source TEXT, "
+        "mode TEXT, sections TEXT, tenants INTEGER NOT NULL DEFAULT 0, failed_tenants TEXT)",
+        "CREATE TABLE IF NOT EXISTS tenants (snapshot_id INTEGER NOT NULL REFERENCES snapshots(id) ON DELETE CASCADE, "
+        "name TEXT NOT NULL, PRIMARY KEY (snapshot_id, name))",
+        "CREATE INDEX IF NOT EXISTS tenants_name ON tenants (name, snapshot_id)",
+    ]
+    specs = [(t, ('tenant',) + cols + ('data',), idx) for t, _, cols, idx in TABLES]
+    specs += [(t, ('tenant',) + tuple(c for c, _ in parent) + cols, idx) for t, _, _, parent, cols, idx in CHILD_TABLES]
+    for table, columns, indexed in specs:
+        cols = ', '.join(f'"{c}"' for c in columns)
+        sql.append(f"CREATE TABLE IF NOT EXISTS {table} (snapshot_id INTEGER NOT NULL "
+                   f"REFERENCES snapshots(id) ON DELETE CASCADE, {cols})")
+        sql.append(f"CREATE INDEX IF NOT EXISTS {table}_snapshot ON {table} (snapshot_id, tenant)")
+        if 'name' in columns:
+            sql.append(f"CREATE INDEX IF NOT EXISTS {table}_name ON {table} (tenant, name, snapshot_id)")
+        for col in indexed:
+            sql.append(f'CREATE INDEX IF NOT EXISTS {table}_{col} ON {table} ("{col}", snapshot_id)')
+    return ';\n'.join(sql) + ';'
+
+
+def _value(v):
+    return json.dumps(v, ensure_ascii=False) if isinstance(v, (list, dict)) else v
+
+
+def _insert_sql(table, n):
+    return f"INSERT INTO {table} VALUES ({', '.join('?' * n)})"
+
+
+class _Recording:
+    """Rows of one snapshot; each tenant is inserted with one executemany per table."""
+
+    def __init__(self, conn, snapshot_id):
+        self.conn = conn
+        self.id = snapshot_id
+        self.count = 0
+        self.failed = []
+
+    def add(self, entry):
+        tenant = entry.get('name')
+        self.conn.execute("INSERT INTO tenants VALUES (?, ?)", (self.id, tenant))
+        for table, key, columns, _ in TABLES:
+            rows = [(self.id, tenant, *(_value(o.get(c)) for c in columns), json.dumps(o, ensure_ascii=False))
+                    for o in entry.get(key) or []]
+            if rows:
+                self.conn.executemany(_insert_sql(table, len(rows[0])), rows)
+        for table, key, child, parent, columns, _ in CHILD_TABLES:
+            rows = [(self.id, tenant, *(_value(o.get(k)) for _, k in parent), *(_value(c.get(col)) for col in columns))
+                    for o in entry.get(key) or [] for c in o.get(child) or []]
+            if rows:
+                self.conn.executemany(_insert_sql(table, len(rows[0])), rows)
+        self.count += 1
+
+    def fail(self, name):
+        self.failed.append(name)
+
+
+class SnapshotDb:
+    """
+    Harvest history in SQLite: every run is a row in ``snapshots`` and its
+    tenants, VRFs, BDs (with ``subnets``), EPGs (with ``static_paths``),
+    contracts, L3Outs, L2Outs and ESGs are rows keyed by ``snapshot_id``
+    and ``tenant``.  Columns are the keys of run_harvest's entries; list
+    values are stored as JSON, and each object's full entry is kept in
+    ``data``.  A snapshot is written in a single transaction.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        # Readers (the query command) are not blocked while a run writes
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.executescript(_schema())
+
+    @contextmanager
+    def recording(self, source=None, mode=None, sections=None):
+        """Yields a recorder (add(entry), fail(name)) for one snapshot; committed on exit, rolled back on error."""
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO snapshots (created, source, mode, sections) VALUES (?, ?, ?, ?)",
+                (time.strftime('%Y-%m-%dT%H:%M:%S%z'), source, mode, json.dumps(sections) if sections else None))
+            recording = _Recording(self.conn, cur.lastrowid)
+            yield recording
+            self.conn.execute("UPDATE snapshots SET tenants = ?, failed_tenants = ? WHERE id = ?",
+                              (recording.count, json.dumps(recording.failed) if recording.failed else None,
+                               recording.id))
+
+    def write(self, data, **meta):
+        """Store run_harvest's result as a new snapshot; returns its id."""
+        with self.recording(**meta) as recording:
+            for entry in data.get('tenants', []):
+                recording.add(entry)
+            for name in data.get('failed_tenants', []):
+                recording.fail(name)
+        return recording.id
+
+    def record(self, tenants, **meta):
+        """Pass (name, entry) pairs from pipeline.iter_harvest through, storing them as a new snapshot."""
+        with self.recording(**meta) as recording:
+            for name, entry in tenants:
+                if entry is None:
+                    recording.fail(name)
+                else:
+                    recording.add(entry)
+                yield name, entry
+
+    def snapshots(self):
+        return self.query("SELECT id, created, source, mode, tenants, failed_tenants FROM snapshots ORDER BY id")
+
+    def query(self, sql, params=()):
+        """Run ``sql``; returns (column names, rows)."""
+        cur = self.conn.execute(sql, params)
+        return [d[0] for d in cur.description or ()], cur.fetchall()
+
+    def close(self):
+        self.conn.close()
+
+
+def format_table(columns, rows):
+    """Query results as aligned text columns."""
+    cells = [[str(c) for c in columns]] + [['' if v is None else str(v) for v in row] for row in rows]
+    widths = [max(len(r[i]) for r in cells) for i in range(len(columns))]
+    lines = ['  '.join(v.ljust(w) for v, w in zip(r, widths)).rstrip() for r in cells]
+    lines.insert(1, '  '.join('-' * w for w in widths))
+    return '\n'.join(lines)
@@ -0,0 +1,216 @@
+import json
+import random
+
+from ..utils.index import parent_dn
+
+# Objects per tenant unless overridden; roughly a mid-sized production tenant.
+DEFAULT_SHAPE = {
+    'vrfs': 2,
+    'bds_per_vrf': 4,
+    'subnets_per_bd': 1,
+    'aps': 2,
+    'epgs_per_ap': 5,
+    'static_paths_per_epg': 8,
+    'contracts': 4,
+    'l3outs': 1,
+    'l2outs': 1,
+    'service_graphs': 1,
+    'esgs': 1,
+}
+
+VMM_DOMAINS = ('DVS1', 'DVS2')
+LEAF_PAIRS = ((101, 102), (103, 104), (105, 106), (107, 108))
+
+
+class SyntheticFabric:
+    """
+    Deterministic, APIC-shaped policy model for benchmarks and offline runs.
+
+    ``mos`` is a list of (class, attributes) pairs in creation order (every
+    parent before its children), covering every class the harvesters read:
+    tenants with VRFs, BDs, subnets, EPGs with domain and static path
+    bindings, contracts, L3Outs, L2Outs, service graphs and ESGs, plus the
+    VMM domains the EPGs bind to.  ``shape`` overrides DEFAULT_SHAPE per
+    tenant; the same ``seed`` always yields the same fabric.
+    """
+
+    def __init__(self, tenants=10, seed=0, **shape):
+        unknown = set(shape) - set(DEFAULT_SHAPE)
+        if unknown:
+            raise ValueError(f"unknown fabric shape keys: {', '.join(sorted(unknown))}")
+        self.shape = dict(DEFAULT_SHAPE, **shape)
+        self.rng = random.Random(seed)
+        self.mos = []
+        self._domains()
+        for i in range(tenants):
+            self._tenant(f"TN{i:04d}")
+
+    def _mo(self, cls, dn, **attrs):
+        a = {'dn': dn, 'modTs': '2024-01-01T00:00:00.000+00:00', 'status': ''}
+        a.update(attrs)
+        self.mos.append((cls, a))
+        return dn
+
+    def _domains(self):
+        self._mo('fvTenant', 'uni/tn-common', name='common', descr='')
+        self._mo('vmmProvP', 'uni/vmmp-VMware', vendor='VMware')
+        for name in VMM_DOMAINS:
+            dom = self._mo('vmmDomP', f"uni/vmmp-VMware/dom-{name}", name=name, mode='default', enfPref='hw')
+            self._mo('vmmCtrlrP', f"{dom}/ctrlr-VC-{name}", name=f"VC-{name}", hostOrIp=f"10.0.0.{len(name)}",
+                     rootContName='DC1')
+            self._mo('infraRsVlanNs', f"{dom}/rsvlanNs", tDn=f"uni/infra/vlanns-[{name}-POOL]-dynamic")
+
+    def _tenant(self, name):
+        s, rng = self.shape, self.rng
+        tn = self._mo('fvTenant', f"uni/tn-{name}", name=name, descr=f"Synthetic tenant {name}")
+        contracts = [f"C{c}" for c in range(s['contracts'])]
+
+        bds = []
+        for v in range(s['vrfs']):
+            ctx = self._mo('fvCtx', f"{tn}/ctx-VRF{v}", name=f"VRF{v}", pcEnfPref=rng.choice(('enforced', 'unenforced')),
+                           pcEnfDir='ingress', knwMcastAct='permit', ipDataPlaneLearning='enabled',
+                           bdEnforcedEnable='no', pcTag=str(16384 + v))
+            self._mo('healthInst', f"{ctx}/health", cur=str(rng.randint(80, 100)), maxSev='cleared')
+            self._mo('vzAny', f"{ctx}/any", matchT='AtleastOne')
+            if contracts:
+                self._mo('vzRsAnyToProv', f"{ctx}/any/rsanyToProv-{contracts[0]}", tDn=f"{tn}/brc-{contracts[0]}",
+                         tnVzBrCPName=contracts[0])
+                self._mo('vzRsAnyToCons', f"{ctx}/any/rsanyToCons-{contracts[-1]}", tDn=f"{tn}/brc-{contracts[-1]}",
+                         tnVzBrCPName=contracts[-1])
+            for b in range(s['bds_per_vrf']):
+                bd = f"{tn}/BD-BD{v}-{b}"
+                bds.append(bd)
+                self._mo('fvRtCtx', f"{ctx}/rtctx-[{bd}]", tDn=bd, tCl='fvBD')
+
+        for n, bd in enumerate(bds):
+            self._mo('fvBD', bd, name=bd.rsplit('/BD-', 1)[1], unicastRoute=rng.choice(('yes', 'yes', 'no')),
+                     arpFlood=rng.choice(('yes', 'no')), unkMacUcastAct=rng.choice(('proxy', 'flood')),
+                     limitIpLearnToSubnets='yes', ipLearning='yes', multiDstPktAct='bd-flood')
+            for k in range(s['subnets_per_bd']):
+                ip = f"10.{n % 256}.{k}.1/24"
+                self._mo('fvSubnet', f"{bd}/subnet-[{ip}]", ip=ip, scope=rng.choice(('private', 'public', 'public,shared')))
+            self._mo('faultInst', f"{bd}/fault-F0467", code='F0467', severity='warning')
+
+        epgs = []
+        for a in range(s['aps']):
+            ap = self._mo('fvAp', f"{tn}/ap-AP{a}", name=f"AP{a}")
+            for e in range(s['epgs_per_ap']):
+                epg = self._mo('fvAEPg', f"{ap}/epg-EPG{e}", name=f"EPG{e}", pcEnfPref='unenforced',
+                               prefGrMemb='exclude')
+                epgs.append(epg)
+                if bds:
+                    self._mo('fvRsBd', f"{epg}/rsbd", tnFvBDName=bds[(a + e) % len(bds)].rsplit('/BD-', 1)[1])
+                self._mo('fvRsDomAtt', f"{epg}/rsdomAtt-[uni/phys-PHYS]", tDn='uni/phys-PHYS')
+                dom = VMM_DOMAINS[e % len(VMM_DOMAINS)]
+                self._mo('fvRsDomAtt', f"{epg}/rsdomAtt-[uni/vmmp-VMware/dom-{dom}]",
+                         tDn=f"uni/vmmp-VMware/dom-{dom}", resImedcy='immediate')
+                for p in range(s['static_paths_per_epg']):
+                    vlan = 100 + (a * s['epgs_per_ap'] + e) % 3000
+                    leafs = LEAF_PAIRS[p % len(LEAF_PAIRS)]
+                    if p % 2:
+                        path = f"topology/pod-1/protpaths-{leafs[0]}-{leafs[1]}/pathep-[VPC-{p}]"
+                    else:
+                        path = f"topology/pod-1/paths-{leafs[0]}/pathep-[eth1/{p + 1}]"
+                    self._mo('fvRsPathAtt', f"{epg}/rspathAtt-[{path}]", tDn=path, encap=f"vlan-{vlan}",
+                             mode=rng.choice(('regular', 'native', 'untagged')), instrImedcy='lazy')
+                if contracts:
+                    prov, cons = contracts[e % len(contracts)], contracts[(e + 1) % len(contracts)]
+                    self._mo('fvRsProv', f"{epg}/rsprov-{prov}", tDn=f"{tn}/brc-{prov}", tnVzBrCPName=prov)
+                    self._mo('fvRsCons', f"{epg}/rscons-{cons}", tDn=f"{tn}/brc-{cons}", tnVzBrCPName=cons)
+
+        graphs = [f"SG{g}" for g in range(s['service_graphs'])]
+        for c, contract in enumerate(contracts):
+            brc = self._mo('vzBrCP', f"{tn}/brc-{contract}", name=contract, scope=rng.choice(('context', 'tenant')),
+                           prio='unspecified')
+            subj = self._mo('vzSubj', f"{brc}/subj-S{c}", name=f"S{c}", revFltPorts='yes',
+                            prio=rng.choice(('unspecified', 'level3')), consMatchT='AtleastOne',
+                            provMatchT='AtleastOne')
+            self._mo('vzRsSubjFiltAtt', f"{subj}/rssubjFiltAtt-F{c}", tDn=f"{tn}/flt-F{c}", tnVzFilterName=f"F{c}")
+            if graphs:
+                graph = graphs[c % len(graphs)]
+                self._mo('vzRsSubjGraphAtt', f"{subj}/rsSubjGraphAtt", tDn=f"{tn}/AbsGraph-{graph}",
+                         tnVnsAbsGraphName=graph)
+
+        vrf0 = 'VRF0' if s['vrfs'] else ''
+        for o in range(s['l3outs']):
+            out = self._mo('l3extOut', f"{tn}/out-L3OUT{o}", name=f"L3OUT{o}", enforceRtctrl='export')
+            if vrf0:
+                self._mo('l3extRsEctx', f"{out}/rsectx", tDn=f"{tn}/ctx-{vrf0}", tnFvCtxName=vrf0)
+            if o % 2:
+                self._mo('ospfExtP', f"{out}/ospfExtP", areaId='0.0.0.1', areaType='regular')
+            else:
+                self._mo('bgpExtP', f"{out}/bgpExtP")
+            node = self._mo('l3extLNodeP', f"{out}/lnodep-N", name='N')
+            ifp = self._mo('l3extLIfP', f"{node}/lifp-I", name='I')
+            path = f"topology/pod-1/paths-{101 + o % 2}/pathep-[eth1/{48 - o}]"
+            att = self._mo('l3extRsPathL3OutAtt', f"{ifp}/rspathL3OutAtt-[{path}]", tDn=path, ifInstT='ext-svi',
+                           encap=f"vlan-{3500 + o}", addr=f"192.0.2.{2 * o + 1}/31")
+            if not o % 2:
+                self._mo('bgpPeerP', f"{att}/peerP-[192.0.2.{2 * o}]", addr=f"192.0.2.{2 * o}")
+            inst = self._mo('l3extInstP', f"{out}/instP-EXT", name='EXT', prefGrMemb='exclude')
+            self._mo('l3extSubnet', f"{inst}/extsubnet-[0.0.0.0/0]", ip='0.0.0.0/0', scope='import-security')
+            if contracts:
+                self._mo('fvRsProv', f"{inst}/rsprov-{contracts[0]}", tDn=f"{tn}/brc-{contracts[0]}",
+                         tnVzBrCPName=contracts[0])
+
+        for o in range(s['l2outs']):
+            l2 = self._mo('l2extOut', f"{tn}/l2out-L2OUT{o}", name=f"L2OUT{o}")
+            if bds:
+                self._mo('l2extRsEBd', f"{l2}/rsEBd", tDn=bds[0], tnFvBDName=bds[0].rsplit('/BD-', 1)[1],
+                         encap=f"vlan-{3000 + o}")
+            self._mo('l2extRsL2DomAtt', f"{l2}/rsl2DomAtt", tDn='uni/l2dom-L2DOM')
+            node = self._mo('l2extLNodeP', f"{l2}/lnodep-N", name='N')
+            ifp = self._mo('l2extLIfP', f"{node}/lifp-I", name='I')
+            path = f"topology/pod-1/paths-101/pathep-[eth1/{40 + o}]"
+            self._mo('l2extRsPathL2OutAtt', f"{ifp}/rspathL2OutAtt-[{path}]", tDn=path)
+            inst = self._mo('l2extInstP', f"{l2}/instP-I", name='I')
+            if contracts:
+                self._mo('fvRsCons', f"{inst}/rscons-{contracts[-1]}", tDn=f"{tn}/brc-{contracts[-1]}",
+                         tnVzBrCPName=contracts[-1])
+
+        for graph in graphs:
+            g = self._mo('vnsAbsGraph', f"{tn}/AbsGraph-{graph}", name=graph, type='legacy')
+            self._mo('vnsAbsNode', f"{g}/AbsNode-FW", name='FW', funcType='GoTo', routingMode='Redirect')
+            self._mo('vnsAbsFuncConn', f"{g}/AbsNode-FW/AbsFConn-consumer", name='consumer', connType='none')
+            self._mo('vnsAbsFuncConn', f"{g}/AbsNode-FW/AbsFConn-provider", name='provider', connType='none')
+            self._mo('vnsAbsConnection', f"{g}/AbsConnection-C1", name='C1', connDir='provider', adjType='L3',
+                     connType='external')
+        if graphs:
+            self._mo('vnsSvcCont', f"{tn}/svcCont")
+            self._mo('vnsRedirectPol', f"{tn}/svcCont/svcRedirectPol-PBR", name='PBR', hashingAlgorithm='sip-dip-prototype')
+
+        for x in range(s['esgs']):
+            ap = f"{tn}/ap-AP0" if s['aps'] else tn
+            esg = self._mo('fvESg', f"{ap}/esg-ESG{x}", name=f"ESG{x}", pcTag=str(49153 + x),
+                           pcEnfPref='enforced')
+            if contracts:
+                self._mo('fvRsProv', f"{esg}/rsprov-{contracts[0]}", tDn=f"{tn}/brc-{contracts[0]}",
+                         tnVzBrCPName=contracts[0])
+            if epgs:
+                self._mo('fvEPgSelector', f"{esg}/epgselector-[{epgs[x % len(epgs)]}]",
+                         matchEpgDn=epgs[x % len(epgs)])
+            self._mo('fvTagSelector', f"{esg}/tagselector-env", matchKey='env', key='env', operator='equals',
+                     value=rng.choice(('prod', 'dev')))
+            self._mo('fvEPSelector', f"{esg}/epselector-ip{x}", matchClass='fvIp',
+                     matchExpression=f"ip=='172.16.{x}.0/24'")
+
+    def tenant_dns(self):
+        return [a['dn'] for cls, a in self.mos if cls == 'fvTenant']
+
+    def to_imdata(self):
+        """The whole model as ``rsp-subtree=full`` imdata: one nested tree per top-level MO."""
+        nodes, roots = {}, []
+        for cls, a in self.mos:
+            node = {cls: {'attributes': dict(a)}}
+            nodes[a['dn']] = node
+            parent = nodes.get(parent_dn(a['dn']))
+            if parent is None:
+                roots.append(node)
+            else:
+                parent[next(iter(parent))].setdefault('children', []).append(node)
+        return roots
+
+    def write_json(self, path):
+        imdata = self.to_imdata()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'totalCount': str(len(imdata)), 'imdata': imdata}, f)
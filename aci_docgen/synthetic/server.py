@@ -0,0 +1,399 @@
+import base64
+import bisect
+import gzip
+import hashlib
+import json
+import re
+import socket
+import struct
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from ..utils.index import parent_dn
+
+TOKEN = 'synthetic-apic-token'
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+FILTER_OPS = {
+    'eq': lambda v, x: v == x,
+    'ne': lambda v, x: v != x,
+    'gt': lambda v, x: v > x,
+    'lt': lambda v, x: v < x,
+    'ge': lambda v, x: v >= x,
+    'le': lambda v, x: v <= x,
+    'wcard': lambda v, x: re.search(x, v) is not None,
+}
+
+
+def _split_args(text):
+    """Split ``a,b(c,d),"e,f"`` on top-level commas."""
+    args, depth, quoted, current = [], 0, False, ''
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == '(':
+            depth += 1
+        elif not quoted and ch == ')':
+            depth -= 1
+        if ch == ',' and depth == 0 and not quoted:
+            args.append(current.strip())
+            current = ''
+        else:
+            current += ch
+    args.append(current.strip())
+    return args
+
+
+def parse_filter(expr):
+    """Compile an APIC ``query-target-filter`` (eq/ne/gt/lt/ge/le/wcard, and/or/not) to a predicate on attributes."""
+    m = re.fullmatch(r'\s*(\w+)\((.*)\)\s*', expr)
+    if not m:
+        raise ValueError(f"bad filter: {expr}")
+    op, args = m.group(1), _split_args(m.group(2))
+    if op in ('and', 'or'):
+        preds = [parse_filter(a) for a in args]
+        combine = all if op == 'and' else any
+        return lambda a: combine(p(a) for p in preds)
+    if op == 'not':
+        pred = parse_filter(args[0])
+        return lambda a: not pred(a)
+    if op not in FILTER_OPS or len(args) != 2:
+        raise ValueError(f"bad filter: {expr}")
+    prop, value = args[0].split('.', 1)[1], args[1].strip('"')
+    test = FILTER_OPS[op]
+    return lambda a: test(a.get(prop, ''), value)
+
+
+class FakeApic:
+    """
+    Local HTTP stand-in for an APIC, serving a list of (class, attributes)
+    MOs (e.g. SyntheticFabric.mos) through the REST endpoints AciApi uses:
+    aaaLogin/aaaRefresh, ``/api/node/mo/<dn>.json`` and
+    ``/api/class/<class>.json`` with query-target, target-subtree-class,
+    rsp-subtree, rsp-subtree-class, query-target-filter, order-by and
+    page-size/page, plus subscription ids and gzip responses.
+
+    Subscriptions behave as on an APIC: ``/socket<token>`` is the event
+    websocket, notify() changes an MO and pushes the event to it for the
+    subscriptions covering its class that were made while a websocket was
+    open, ``/api/subscriptionRefresh.json``
+    keeps them alive (``refreshes`` counts per id) and disconnect() closes
+    the websockets, which ends their subscriptions.
+
+    Results come back in creation order unless ``order-by`` is given.
+    Classes in ``unknown_classes`` are rejected with a 400 when a query
+    names or filters on them, as an APIC does for classes its version lacks.
+    """
+
+    def __init__(self, mos, host='127.0.0.1', port=0, unknown_classes=()):
+        self.mos = list(mos)
+        self.unknown_classes = set(unknown_classes)
+        self._reindex()
+        self.requests = 0
+        self.logins = 0
+        self._subscriptions = 0
+        self.subscriptions = {}
+        # Subscriptions made while no event websocket was open; they get no events
+        self.detached = set()
+        self.refreshes = {}
+        self._sockets = set()
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _reindex(self):
+        self._dns = sorted(a['dn'] for _, a in self.mos)
+        self._pos = {a['dn']: i for i, (_, a) in enumerate(self.mos)}
+        self._by_class = {}
+        self._children = {}
+        for i, (cls, a) in enumerate(self.mos):
+            self._by_class.setdefault(cls, []).append(i)
+            self._children.setdefault(parent_dn(a['dn']), []).append(i)
+
+    def notify(self, cls, attrs, status='modified'):
+        """
+        Apply a change to the model (``attrs`` holds the DN and the changed
+        attributes) and push it as a subscription event.  Returns the number
+        of websockets it was sent to.
+        """
+        with self._lock:
+            dn = attrs['dn']
+            if status == 'deleted':
+                self.mos = [(c, a) for c, a in self.mos if a['dn'] != dn and not a['dn'].startswith(dn + '/')]
+            elif dn in self._pos:
+                self.mos[self._pos[dn]][1].update(attrs)
+            else:
+                self.mos.append((cls, dict(attrs)))
+            self._reindex()
+            ids = [sid for sid, classes in self.subscriptions.items() if cls in classes and sid not in self.detached]
+            sockets = list(self._sockets)
+        if not ids:
+            return 0
+        message = json.dumps({'subscriptionId': ids, 'imdata': [{cls: {'attributes': dict(attrs, status=status)}}]})
+        sent = 0
+        for ws in sockets:
+            try:
+                ws.send_text(message)
+                sent += 1
+            except OSError:
+                pass
+        return sent
+
+    def disconnect(self):
+        """Close every event websocket; their subscriptions end with them."""
+        with self._lock:
+            sockets = list(self._sockets)
+            self.subscriptions.clear()
+            self.detached.clear()
+        for ws in sockets:
+            ws.close()
+
+    @property
+    def connected(self):
+        with self._lock:
+            return len(self._sockets)
+
+    def _subtree(self, dn):
+        """Positions of every MO strictly below ``dn``."""
+        prefix = dn + '/'
+        lo = bisect.bisect_left(self._dns, prefix)
+        hi = bisect.bisect_left(self._dns, prefix + '\U0010ffff')
+        return [self._pos[d] for d in self._dns[lo:hi]]
+
+    def _render(self, i, mode, child_classes=None):
+        cls, a = self.mos[i]
+        body = {'attributes': dict(a)}
+        if mode in ('children', 'full'):
+            kids = [self._render(k, 'full' if mode == 'full' else None)
+                    for k in self._children.get(a['dn'], ())
+                    if not child_classes or self.mos[k][0] in child_classes]
+            if kids:
+                body['children'] = kids
+        return {cls: body}
+
+    def query(self, path, params):
+        """Answer one GET; returns (HTTP status, JSON body)."""
+        if path.startswith('/api/node/mo/') and path.endswith('.json'):
+            dn = path[len('/api/node/mo/'):-len('.json')]
+            if dn not in self._pos:
+                return 200, {'totalCount': '0', 'imdata': []}
+            target = params.get('query-target', 'self')
+            if target == 'subtree':
+                selected = [self._pos[dn]] + self._subtree(dn)
+            elif target == 'children':
+                selected = list(self._children.get(dn, ()))
+            else:
+                selected = [self._pos[dn]]
+            if 'target-subtree-class' in params and target != 'self':
+                wanted = set(params['target-subtree-class'].split(','))
+                if wanted & self.unknown_classes:
+                    return 400, {'totalCount': '0', 'imdata': [{'error': {'attributes': {
+                        'code': '400', 'text': f"Invalid class {sorted(wanted & self.unknown_classes)[0]}"}}}]}
+                selected = [i for i in selected if self.mos[i][0] in wanted]
+        elif path.startswith('/api/class/') and path.endswith('.json'):
+            classes = path[len('/api/class/'):-len('.json')].split(',')
+            if set(classes) & self.unknown_classes:
+                return 400, {'totalCount': '0', 'imdata': [{'error': {'attributes': {
+                    'code': '400', 'text': f"Invalid class {sorted(set(classes) & self.unknown_classes)[0]}"}}}]}
+            selected = [i for cls in classes for i in self._by_class.get(cls, ())]
+        else:
+            return 400, {'totalCount': '0', 'imdata': [{'error': {'attributes': {'code': '400', 'text': f"unsupported: {path}"}}}]}
+        selected.sort()
+
+        if 'query-target-filter' in params:
+            try:
+                pred = parse_filter(params['query-target-filter'])
+            except ValueError as exc:
+                return 400, {'totalCount': '0', 'imdata': [{'error': {'attributes': {'code': '400', 'text': str(exc)}}}]}
+            selected = [i for i in selected if pred(self.mos[i][1])]
+        if 'order-by' in params:
+            key = params['order-by'].split(',')[0]
+            prop = key.split('.', 1)[1].split('|')[0]
+            selected.sort(key=lambda i: self.mos[i][1].get(prop, ''), reverse=key.endswith('|desc'))
+
+        total = len(selected)
+        if 'page-size' in params:
+            size, page = int(params['page-size']), int(params.get('page', 0))
+            selected = selected[page * size:(page + 1) * size]
+        child_classes = set(params['rsp-subtree-class'].split(',')) if 'rsp-subtree-class' in params else None
+        mode = params.get('rsp-subtree')
+        body = {'totalCount': str(total), 'imdata': [self._render(i, mode, child_classes) for i in selected]}
+        if params.get('subscription') == 'yes':
+            with self._lock:
+                self._subscriptions += 1
+                body['subscriptionId'] = str(self._subscriptions)
+                # Events cover the queried classes and the children returned inline with them
+                covered = set(child_classes or ())
+                if path.startswith('/api/class/'):
+                    covered |= set(classes)
+                else:
+                    covered |= {self.mos[i][0] for i in selected}
+                self.subscriptions[body['subscriptionId']] = covered
+                if not self._sockets:
+                    self.detached.add(body['subscriptionId'])
+        return 200, body
+
+    def refresh(self, subscription_id):
+        with self._lock:
+            if subscription_id not in self.subscriptions:
+                return 400, {'totalCount': '0', 'imdata': [{'error': {'attributes': {
+                    'code': '400', 'text': f"Unknown subscription {subscription_id}"}}}]}
+            self.refreshes[subscription_id] = self.refreshes.get(subscription_id, 0) + 1
+        return 200, {'totalCount': '0', 'imdata': []}
+
+    def _handler(self):
+        apic = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; without this each keep-alive response waits on delayed ACK
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, obj, cookie=False):
+                payload = json.dumps(obj).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                if 'gzip' in self.headers.get('Accept-Encoding', ''):
+                    payload = gzip.compress(payload, compresslevel=1)
+                    self.send_header('Content-Encoding', 'gzip')
+                if cookie:
+                    self.send_header('Set-Cookie', f"APIC-cookie={TOKEN}; Path=/")
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _login_body(self):
+                return {'totalCount': '1', 'imdata': [{'aaaLogin': {'attributes': {
+                    'token': TOKEN, 'refreshTimeoutSeconds': '600'}}}]}
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if urlsplit(self.path).path != '/api/aaaLogin.json':
+                    return self._send(400, {'totalCount': '0', 'imdata': []})
+                with apic._lock:
+                    apic.logins += 1
+                self._send(200, self._login_body(), cookie=True)
+
+            def do_GET(self):
+                with apic._lock:
+                    apic.requests += 1
+                if urlsplit(self.path).path.startswith('/socket'):
+                    return self._websocket()
+                if f"APIC-cookie={TOKEN}" not in self.headers.get('Cookie', ''):
+                    return self._send(403, {'totalCount': '0', 'imdata': [{'error': {'attributes': {
+                        'code': '403', 'text': 'Token was invalid'}}}]})
+                parts = urlsplit(self.path)
+                path = unquote(parts.path)
+                # APIC takes '+' literally (timestamps such as +00:00), not as an encoded space
+                params = {k: v[0] for k, v in parse_qs(parts.query.replace('+', '%2B')).items()}
+                if path == '/api/aaaRefresh.json':
+                    return self._send(200, self._login_body(), cookie=True)
+                if path == '/api/subscriptionRefresh.json':
+                    return self._send(*apic.refresh(params.get('id')))
+                self._send(*apic.query(path, params))
+
+            def _websocket(self):
+                if urlsplit(self.path).path != f"/socket{TOKEN}" or 'Sec-WebSocket-Key' not in self.headers:
+                    return self._send(403, {'totalCount': '0', 'imdata': []})
+                accept = base64.b64encode(hashlib.sha1(
+                    (self.headers['Sec-WebSocket-Key'] + WS_GUID).encode('ascii')).digest()).decode('ascii')
+                self.send_response(101, 'Switching Protocols')
+                self.send_header('Upgrade', 'websocket')
+                self.send_header('Connection', 'Upgrade')
+                self.send_header('Sec-WebSocket-Accept', accept)
+                self.end_headers()
+                self.wfile.flush()
+                self.close_connection = True
+                ws = _WebSocket(self.connection, self.rfile, self.wfile)
+                with apic._lock:
+                    apic._sockets.add(ws)
+                try:
+                    ws.serve()
+                finally:
+                    with apic._lock:
+                        apic._sockets.discard(ws)
+
+        return Handler
+
+
+class _WebSocket:
+    """Server side of one RFC 6455 connection: pushes text frames, answers pings and close."""
+
+    def __init__(self, conn, rfile, wfile):
+        self.conn = conn
+        self.rfile = rfile
+        self.wfile = wfile
+        self._send_lock = threading.Lock()
+
+    def _frame(self, opcode, payload=b''):
+        n = len(payload)
+        if n < 126:
+            header = struct.pack('!BB', 0x80 | opcode, n)
+        elif n < 1 << 16:
+            header = struct.pack('!BBH', 0x80 | opcode, 126, n)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 127, n)
+        with self._send_lock:
+            self.wfile.write(header + payload)
+            self.wfile.flush()
+
+    def send_text(self, text):
+        self._frame(0x1, text.encode('utf-8'))
+
+    def close(self):
+        try:
+            self._frame(0x8, struct.pack('!H', 1001))
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _read(self, n):
+        data = self.rfile.read(n)
+        if len(data) < n:
+            raise EOFError
+        return data
+
+    def serve(self):
+        """Read client frames until the connection closes."""
+        try:
+            while True:
+                b1, b2 = self._read(2)
+                n = b2 & 0x7f
+                if n == 126:
+                    n, = struct.unpack('!H', self._read(2))
+                elif n == 127:
+                    n, = struct.unpack('!Q', self._read(8))
+                mask = self._read(4) if b2 & 0x80 else b'\0\0\0\0'
+                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(self._read(n)))
+                opcode = b1 & 0x0f
+                if opcode == 0x8:
+                    self._frame(0x8, payload[:2])
+                    return
+                if opcode == 0x9:
+                    self._frame(0xA, payload)
+        except (EOFError, OSError):
+            return
@@ -0,0 +1,104 @@
+import json
+import os
+import tempfile
+import time
+
+import requests
+from urllib3.util.retry import Retry
+
+DEFAULT_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 0.5
+# 429/503 are also the APIC nginx throttle; urllib3 honours their Retry-After.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# APIC sessions expire after refreshTimeoutSeconds (600 by default) of inactivity.
+DEFAULT_TOKEN_LIFETIME = 600
+# Refresh once this fraction of the token lifetime has passed.
+REFRESH_AT = 0.5
+DEFAULT_TOKEN_CACHE = os.path.join(os.path.expanduser('~'), '.cache', 'aci-docgen', 'tokens.json')
+
+
+def make_session(insecure=False, pool_size=10, retries=DEFAULT_RETRIES):
+    """
+    requests.Session for APIC traffic: one keep-alive pool sized for the
+    workers sharing it, gzip-compressed responses, and exponential-backoff
+    retries on 429/5xx answers and dropped connections.
+    """
+    s = requests.Session()
+    s.verify = not insecure
+    retry = Retry(total=retries, connect=retries, read=retries, status=retries,
+                  backoff_factor=RETRY_BACKOFF_SECONDS, status_forcelist=RETRY_STATUSES,
+                  allowed_methods=frozenset({'GET', 'POST'}), raise_on_status=False)
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                                            max_retries=retry)
+    s.mount('https://', adapter)
+    s.mount('http://', adapter)
+    s.headers['Accept-Encoding'] = 'gzip, deflate'
+    return s
+
+
+class SessionToken:
+    """An APIC session token and when it has to be refreshed."""
+
+    def __init__(self, token, lifetime=DEFAULT_TOKEN_LIFETIME, issued=None):
+        self.token = token
+        self.lifetime = lifetime
+        self.issued = time.time() if issued is None else issued
+
+    @classmethod
+    def from_response(cls, data):
+        """Build from an aaaLogin/aaaRefresh response; None if it holds no token."""
+        for item in data.get('imdata', []):
+            a = item.get('aaaLogin', {}).get('attributes', {})
+            if a.get('token'):
+                return cls(a['token'], int(a.get('refreshTimeoutSeconds') or DEFAULT_TOKEN_LIFETIME))
+        return None
+
+    def expired(self):
+        return time.time() >= self.issued + self.lifetime
+
+    def needs_refresh(self):
+        return time.time() >= self.issued + self.lifetime * REFRESH_AT
+
+
+class TokenCache:
+    """
+    Session tokens kept on disk between runs, keyed by APIC and user, so a
+    CLI run can reuse a live session instead of logging in again.
+    """
+
+    def __init__(self, path=DEFAULT_TOKEN_CACHE):
+        self.path = path
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, apic, user):
+        entry = self._load().get(f"{user}@{apic}")
+        if not entry:
+            return None
+        token = SessionToken(entry['token'], entry['lifetime'], entry['issued'])
+        return None if token.expired() else token
+
+    def put(self, apic, user, token):
+        entries = {k: v for k, v in self._load().items()
+                   if not SessionToken(v['token'], v['lifetime'], v['issued']).expired()}
+        if token is None:
+            entries.pop(f"{user}@{apic}", None)
+        else:
+            entries[f"{user}@{apic}"] = {'token': token.token, 'lifetime': token.lifetime, 'issued': token.issued}
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        # Session tokens are credentials: owner-only file, replaced atomically.
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entries, f)
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
@@ -0,0 +1,128 @@
+from heapq import merge
+
+
+def parent_dn(dn):
+    """
+    Return the parent DN, ignoring slashes inside bracketed RN values:
+      uni/tn-T/BD-B/subnet-[10.0.0.1/24]                      -> uni/tn-T/BD-B
+      uni/tn-T/ap-A/epg-E/rspathAtt-[topology/.../pathep-[eth1/1]] -> uni/tn-T/ap-A/epg-E
+    """
+    if not dn:
+        return ''
+    if '[' not in dn:
+        return dn.rsplit('/', 1)[0] if '/' in dn else ''
+
+    depth = 0
+    for i in range(len(dn) - 1, -1, -1):
+        ch = dn[i]
+        if ch == ']':
+            depth += 1
+        elif ch == '[':
+            depth -= 1
+        elif ch == '/' and depth == 0:
+            return dn[:i]
+    return ''
+
+
+def _dn(item):
+    return item[next(iter(item))].get('attributes', {}).get('dn', '')
+
+
+class MoIndex:
+    """
+    Lookup tables over an APIC ``imdata`` list, built in a single pass.
+
+    Items are kept in their original ``{class: {'attributes': ..., 'children': ...}}``
+    form so harvesters can keep using ``simple_attr``/``collect_children`` on them.
+    Lookups return MOs in DN order whatever order they were fetched in (subtree
+    payload, class queries or pages ordered by DN), so harvests match across modes;
+    ``imdata`` keeps the payload order.
+    """
+
+    def __init__(self, imdata=()):
+        self.imdata = []
+        self._by_class = {}
+        self._by_dn = {}
+        self._children = {}
+        # Lists appended to since they were last sorted by DN
+        self._unsorted_classes = set()
+        self._unsorted_children = set()
+        for item in imdata:
+            self.add(item)
+
+    @classmethod
+    def from_payload(cls, payload):
+        return cls((payload or {}).get('imdata', []))
+
+    def add(self, item):
+        if not item:
+            return
+        cls = next(iter(item))
+        dn = item[cls].get('attributes', {}).get('dn', '')
+        self._by_class.setdefault(cls, []).append(item)
+        self._unsorted_classes.add(cls)
+        self.imdata.append(item)
+        if dn:
+            self._by_dn[dn] = item
+            parent = parent_dn(dn)
+            self._children.setdefault(parent, []).append(item)
+            self._unsorted_children.add(parent)
+
+    def upsert(self, item):
+        """Add ``item``, or merge its attributes into the MO already indexed at its DN."""
+        cls = next(iter(item))
+        dn = item[cls].get('attributes', {}).get('dn', '')
+        existing = self._by_dn.get(dn)
+        if existing is None or cls not in existing:
+            self.add(item)
+            return
+        existing[cls].setdefault('attributes', {}).update(item[cls].get('attributes', {}))
+        if 'children' in item[cls]:
+            existing[cls]['children'] = item[cls]['children']
+
+    def remove(self, dn):
+        """Drop the MO at ``dn`` and everything indexed below it."""
+        item = self._by_dn.get(dn)
+        for child in list(self._children.get(dn, [])):
+            self.remove(_dn(child))
+        if item is None:
+            return
+        cls = next(iter(item))
+        items = self._by_class[cls]
+        items[:] = [x for x in items if x is not item]
+        self.imdata.remove(item)
+        del self._by_dn[dn]
+        siblings = self._children.get(parent_dn(dn), [])
+        siblings[:] = [x for x in siblings if x is not item]
+
+    def __len__(self):
+        return len(self.imdata)
+
+    def classes(self):
+        return list(self._by_class)
+
+    def by_class(self, cls):
+        items = self._by_class.get(cls, [])
+        if cls in self._unsorted_classes:
+            items.sort(key=_dn)
+            self._unsorted_classes.discard(cls)
+        return items
+
+    def select(self, *classes):
+        """Return items of any of ``classes``, in DN order."""
+        present = [c for c in classes if c in self._by_class]
+        if len(present) <= 1:
+            return list(self.by_class(present[0])) if present else []
+        return list(merge(*(self.by_class(c) for c in present), key=_dn))
+
+    def by_dn(self, dn):
+        return self._by_dn.get(dn)
+
+    def children(self, dn, cls=None):
+        items = self._children.get(dn, [])
+        if dn in self._unsorted_children:
+            items.sort(key=_dn)
+            self._unsorted_children.discard(dn)
+        if cls is None:
+            return list(items)
+        return [item for item in items if cls in item]
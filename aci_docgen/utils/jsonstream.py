@@ -0,0 +1,114 @@
+import codecs
+import json
+
+_decoder = json.JSONDecoder()
+_WS = ' \t\r\n'
+
+
+class ImdataStream:
+    """
+    Incrementally decode an APIC JSON response body, yielding ``imdata``
+    elements one at a time from an iterable of byte chunks, so only the
+    element being decoded (plus one chunk) is held in memory.
+
+    ``total_count`` is filled in from ``totalCount`` once it has been read
+    (APIC sends it ahead of ``imdata``); other top-level values, such as a
+    ``subscriptionId``, are collected in ``meta``.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        self.total_count = None
+        self.meta = {}
+
+    def _more(self, at_least=1):
+        """
+        Pull chunks until at least ``at_least`` more characters are buffered;
+        they are joined in one go.  False once the input is exhausted.
+        """
+        if self._eof:
+            return False
+        pieces, added = [self._buf[self._pos:]], 0
+        for chunk in self._chunks:
+            text = self._utf8.decode(chunk) if chunk else ''
+            if text:
+                pieces.append(text)
+                added += len(text)
+                if added >= at_least:
+                    break
+        else:
+            pieces.append(self._utf8.decode(b'', final=True))
+            self._eof = True
+        self._buf = ''.join(pieces)
+        self._pos = 0
+        return added > 0
+
+    def _skip_ws(self):
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WS:
+                self._pos += 1
+            if self._pos < len(self._buf) or not self._more():
+                return
+
+    def _expect(self, chars):
+        self._skip_ws()
+        if self._pos >= len(self._buf) or self._buf[self._pos] not in chars:
+            found = self._buf[self._pos:self._pos + 20] or 'end of response'
+            raise ValueError(f"Malformed APIC response: expected {chars!r}, got {found!r}")
+        ch = self._buf[self._pos]
+        self._pos += 1
+        return ch
+
+    def _value(self):
+        """Decode the next complete JSON value, pulling chunks until it parses."""
+        self._skip_ws()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # Retry once the pending text has doubled: a large MO (a whole
+                # tenant under rsp-subtree=full) is re-parsed O(log n) times, not once per chunk
+                if not self._more(len(self._buf) - self._pos):
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk.
+            if end == len(self._buf) and not self._eof and isinstance(value, (int, float)):
+                if self._more():
+                    continue
+            self._pos = end
+            return value
+
+    def __iter__(self):
+        self._expect('{')
+        self._skip_ws()
+        if self._buf[self._pos:self._pos + 1] == '}':
+            return
+        while True:
+            key = self._value()
+            self._expect(':')
+            if key == 'imdata':
+                self._expect('[')
+                self._skip_ws()
+                if self._buf[self._pos:self._pos + 1] == ']':
+                    self._pos += 1
+                else:
+                    while True:
+                        yield self._value()
+                        if self._expect(',]') == ']':
+                            break
+            else:
+                value = self._value()
+                self.meta[key] = value
+                if key == 'totalCount':
+                    self.total_count = int(value or 0)
+            if self._expect(',}') == '}':
+                return
+
+
+def iter_imdata(chunks):
+    """Shorthand for ``iter(ImdataStream(chunks))``."""
+    return iter(ImdataStream(chunks))
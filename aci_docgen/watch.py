@@ -0,0 +1,275 @@
+import itertools
+import json
+import threading
+import time
+
+from .class_harvest import ClassQueryApi, tenant_dn_of
+from .pipeline import SYSTEM_TENANTS, harvest_tenant, harvester_classes
+from .utils.index import parent_dn
+from .utils.log import debug, error, info, warn
+
+# APIC drops subscriptions that are not refreshed within about a minute.
+SUBSCRIPTION_REFRESH_SECONDS = 30
+SESSION_REFRESH_SECONDS = 300
+RECONNECT_ATTEMPTS = 5
+RECONNECT_MAX_DELAY = 30
+
+
+class WebsocketEvents:
+    """
+    Subscription events pushed by the APIC (or a local stand-in) over a
+    websocket.  ``url`` may be a callable returning the URL, so that
+    reconnect() uses the current session token.
+    """
+
+    def __init__(self, url, verify=True):
+        try:
+            import websocket
+        except ImportError:
+            raise RuntimeError("watch mode needs the websocket-client package (pip install websocket-client)")
+        import ssl
+        self._websocket = websocket
+        self._timeout_error = websocket.WebSocketTimeoutException
+        self._closed_error = websocket.WebSocketConnectionClosedException
+        self._url = url
+        self._sslopt = {} if verify else {'cert_reqs': ssl.CERT_NONE, 'check_hostname': False}
+        self.ws = self._connect()
+
+    def _connect(self):
+        url = self._url() if callable(self._url) else self._url
+        return self._websocket.create_connection(url, sslopt=self._sslopt)
+
+    def reconnect(self):
+        self.ws.close()
+        self.ws = self._connect()
+
+    def next_message(self, timeout):
+        """Return the next event message, None on timeout; raise EOFError once closed."""
+        self.ws.settimeout(timeout)
+        try:
+            raw = self.ws.recv()
+        except self._timeout_error:
+            return None
+        except (self._closed_error, OSError):
+            raise EOFError
+        if not raw:
+            raise EOFError
+        return json.loads(raw)
+
+    def close(self):
+        self.ws.close()
+
+
+class RecordedEvents:
+    """Replays event messages from a file holding one JSON message per line."""
+
+    def __init__(self, path):
+        self._f = open(path, encoding='utf-8')
+
+    def next_message(self, timeout):
+        for line in self._f:
+            if line.strip():
+                return json.loads(line)
+        raise EOFError
+
+    def close(self):
+        self._f.close()
+
+
+class FabricWatcher:
+    """
+    Keeps the harvested model in memory and applies APIC subscription events
+    to it.  The initial state comes from subscribed fabric-wide class queries
+    (one per class the enabled harvesters read, as in ``--mode class``); each
+    created/modified/deleted MO is applied to its tenant's MoIndex, and after
+    ``debounce`` seconds of quiet the affected tenants are re-harvested from
+    memory and only their pages are re-rendered.
+    """
+
+    def __init__(self, api, sections, renderer, debounce=1.0, workers=1, debug_enabled=False):
+        self.api = api
+        self.sections = sections
+        self.renderer = renderer
+        self.debounce = debounce
+        self.workers = workers
+        self.debug_enabled = debug_enabled
+        self.model = None
+        self.tenants = {}
+        self.entries = {}
+        self.child_classes = set()
+        self.subscription_ids = []
+        self._stop = threading.Event()
+        self._events = None
+
+    def _include(self, name):
+        return self.sections.get('include_system_tenants', False) or name not in SYSTEM_TENANTS
+
+    def start(self):
+        self.tenants, self.entries = {}, {}
+        classes, child_classes = harvester_classes(self.sections)
+        self.child_classes = {c for children in child_classes.values() for c in children}
+        self.model = ClassQueryApi(self.api, classes, child_classes, workers=self.workers, subscribe=True).load()
+        self.subscription_ids = list(self.model.subscription_ids)
+
+        tenant_mos, subscription_id = self.api.subscribe_class('fvTenant')
+        if subscription_id:
+            self.subscription_ids.append(subscription_id)
+        for item in tenant_mos:
+            a = item.get('fvTenant', {}).get('attributes', {})
+            if a.get('dn') and self._include(a.get('name')):
+                self.tenants[a['dn']] = {'name': a.get('name'), 'dn': a['dn']}
+
+        for tenant_dn in self.tenants:
+            self._harvest(tenant_dn)
+        self.renderer.render(self.fabric())
+        info(f"Watching {len(self.tenants)} tenants on {len(self.subscription_ids)} subscriptions")
+
+    def fabric(self):
+        return {'tenants': [self.entries[dn] for dn in self.tenants if dn in self.entries]}
+
+    def _harvest(self, tenant_dn):
+        tn = self.tenants[tenant_dn]
+        try:
+            self.entries[tenant_dn] = harvest_tenant(self.model, tn, self.sections)
+        except Exception as exc:
+            error(f"Tenant {tn['name']} failed: {exc}")
+
+    def apply(self, message):
+        """
+        Apply one event message to the model.  Returns (tenant DNs touched,
+        whether the tenant list changed).
+        """
+        touched, tenants_changed = set(), False
+        for item in message.get('imdata', []):
+            cls = next(iter(item))
+            attrs = dict(item[cls].get('attributes', {}))
+            status = attrs.pop('status', 'modified') or 'modified'
+            dn = attrs.get('dn', '')
+            tenant_dn = tenant_dn_of(dn)
+            if not tenant_dn:
+                continue
+
+            if cls == 'fvTenant':
+                if status == 'deleted':
+                    if self.tenants.pop(dn, None):
+                        self.entries.pop(dn, None)
+                        self.model.drop_tenant(dn)
+                        self.renderer.remove_tenant(dn[len('uni/tn-'):])
+                        tenants_changed = True
+                elif dn not in self.tenants and self._include(attrs.get('name') or dn[len('uni/tn-'):]):
+                    self.tenants[dn] = {'name': attrs.get('name') or dn[len('uni/tn-'):], 'dn': dn}
+                    touched.add(dn)
+                    tenants_changed = True
+                continue
+
+            if tenant_dn not in self.tenants:
+                continue
+            index = self.model.tenant_index(tenant_dn)
+            if cls in self.child_classes:
+                # Read inline from the parent MO's children (e.g. healthInst under fvCtx)
+                parent = index.by_dn(parent_dn(dn))
+                if parent is None:
+                    continue
+                body = parent[next(iter(parent))]
+                children = [c for c in body.get('children', []) if c.get(cls, {}).get('attributes', {}).get('dn') != dn]
+                if status != 'deleted':
+                    old = next((c for c in body.get('children', []) if c.get(cls, {}).get('attributes', {}).get('dn') == dn), None)
+                    merged = dict(old[cls]['attributes']) if old else {}
+                    merged.update(attrs)
+                    children.append({cls: {'attributes': merged}})
+                body['children'] = children
+            elif status == 'deleted':
+                index.remove(dn)
+            else:
+                index.upsert({cls: {'attributes': attrs}})
+            touched.add(tenant_dn)
+        return touched, tenants_changed
+
+    def flush(self, touched, tenants_changed):
+        for tenant_dn in sorted(touched):
+            if tenant_dn in self.tenants:
+                self._harvest(tenant_dn)
+                if tenant_dn in self.entries:
+                    self.renderer.render_tenant(self.entries[tenant_dn])
+        data = self.fabric()
+        if tenants_changed:
+            self.renderer.render_index(data)
+        self.renderer.render_testing(data)
+        self.renderer.write_reports(data)
+        names = [self.tenants[d]['name'] for d in sorted(touched) if d in self.tenants]
+        info(f"Updated {', '.join(names) if names else 'tenant list'}")
+
+    def _keepalive(self):
+        last_session = time.monotonic()
+        while not self._stop.wait(SUBSCRIPTION_REFRESH_SECONDS):
+            try:
+                for subscription_id in self.subscription_ids:
+                    self.api.refresh_subscription(subscription_id)
+                if time.monotonic() - last_session >= SESSION_REFRESH_SECONDS:
+                    self.api.refresh_session()
+                    last_session = time.monotonic()
+            except Exception as exc:
+                warn(f"Subscription refresh failed: {exc}")
+
+    def _reconnect(self, events):
+        """
+        After the event websocket dropped: reconnect it, then subscribe and
+        load the fabric again, since the APIC ends subscriptions with their
+        socket.  Returns False if the source cannot reconnect (or stop() was called).
+        """
+        reconnect = getattr(events, 'reconnect', None)
+        if reconnect is None or self._stop.is_set():
+            return False
+        for attempt in itertools.count(1):
+            warn("Event websocket closed, reconnecting")
+            try:
+                reconnect()
+                break
+            except Exception as exc:
+                if attempt >= RECONNECT_ATTEMPTS:
+                    error(f"Cannot reconnect the event websocket: {exc}")
+                    return False
+                if self._stop.wait(min(2 ** attempt, RECONNECT_MAX_DELAY)):
+                    return False
+        self.start()
+        return True
+
+    def stop(self):
+        """End run() from another thread."""
+        self._stop.set()
+        if self._events is not None:
+            self._events.close()
+
+    def run(self, events, keepalive=True):
+        """Apply events until the source closes for good, stop() is called (or KeyboardInterrupt)."""
+        self._events = events
+        if keepalive:
+            threading.Thread(target=self._keepalive, daemon=True).start()
+        touched, tenants_changed = set(), False
+        deadline = None
+        try:
+            while True:
+                timeout = max(0.0, deadline - time.monotonic()) if deadline else None
+                try:
+                    message = events.next_message(timeout)
+                except EOFError:
+                    if not self._reconnect(events):
+                        break
+                    # start() re-rendered everything from the reloaded fabric
+                    touched, tenants_changed, deadline = set(), False, None
+                    continue
+                if message is not None:
+                    debug(f"Event: {json.dumps(message)[:200]}", self.debug_enabled)
+                    t, c = self.apply(message)
+                    touched |= t
+                    tenants_changed |= c
+                    if (t or c) and deadline is None:
+                        deadline = time.monotonic() + self.debounce
+                if deadline and time.monotonic() >= deadline:
+                    self.flush(touched, tenants_changed)
+                    touched, tenants_changed, deadline = set(), False, None
+        finally:
+            self._stop.set()
+            events.close()
+        if touched or tenants_changed:
+            self.flush(touched, tenants_changed)
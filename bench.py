@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Harvest/render benchmark against a synthetic fabric.  For each scale the
+fabric is generated and served by a local FakeApic in this process, and a
+fresh child process harvests and renders it, so peak RSS covers only the
+tool itself.
+"""
+import argparse, json, os, subprocess, sys, tempfile, time
+import yaml
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def peak_rss_mib():
+    # ru_maxrss survives exec, so in the child it would include the parent's
+    # fake APIC; VmHWM belongs to this process image only.
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_child(args):
+    from aci_docgen.aci_api import AciApi
+    from aci_docgen.pipeline import iter_harvest, run_harvest
+    from aci_docgen.renderers.markdown import MarkdownRenderer
+
+    with open(args.sections) as f:
+        sections = yaml.safe_load(f) or {}
+    api = AciApi(args.apic, 'admin', 'bench', pool_size=max(10, args.workers), page_size=args.page_size)
+    with tempfile.TemporaryDirectory() as out:
+        if args.stream:
+            # Harvest and render interleave: render time is the templates' share
+            renderer = MarkdownRenderer(out, metrics=api.metrics)
+            start = time.perf_counter()
+            renderer.render_stream(iter_harvest(api, sections, workers=args.workers, mode=args.mode))
+            render_s = sum(m['seconds'] for m in api.metrics.templates.values())
+            harvest_s = time.perf_counter() - start - render_s
+        else:
+            start = time.perf_counter()
+            data = run_harvest(api, sections, workers=args.workers, mode=args.mode)
+            harvest_s = time.perf_counter() - start
+            start = time.perf_counter()
+            MarkdownRenderer(out).render(data)
+            render_s = time.perf_counter() - start
+        out_bytes = sum(os.path.getsize(os.path.join(d, n)) for d, _, files in os.walk(out) for n in files)
+    requests = api.metrics.to_dict()['requests']
+    print(json.dumps({
+        'harvest_s': round(harvest_s, 3),
+        'render_s': round(render_s, 3),
+        'peak_rss_mib': round(peak_rss_mib(), 1),
+        'requests': requests['count'],
+        'response_mib': round(requests['bytes'] / 2**20, 2),
+        'mos': requests['mos'],
+        'output_mib': round(out_bytes / 2**20, 2),
+    }))
+
+
+def main():
+    p = argparse.ArgumentParser(description='ACI DocGen Pro benchmark (synthetic fabric, fake APIC)')
+    p.add_argument('--scales', default='10,100,1000', help='comma-separated tenant counts')
+    p.add_argument('--workers', type=int, default=1)
+    p.add_argument('--mode', choices=['subtree', 'class'], default='subtree')
+    p.add_argument('--page-size', type=int, default=0)
+    p.add_argument('--stream', action='store_true', help='harvest and render one tenant at a time')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--sections', default=os.path.join(HERE, 'sections.yml'))
+    p.add_argument('--json', help='also write the results to this file')
+    p.add_argument('--serve', type=int, metavar='TENANTS',
+                   help='only serve a synthetic fabric of this many tenants on --port until interrupted')
+    p.add_argument('--port', type=int, default=8443)
+    p.add_argument('--dump', metavar='TENANTS:PATH',
+                   help='only write a synthetic fabric as APIC rsp-subtree=full JSON, e.g. 100:fabric.json')
+    p.add_argument('--child-apic', dest='apic', help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.apic:
+        # Child process: harvest and render one fabric
+        run_child(args)
+        return
+
+    from aci_docgen.synthetic.fabric import SyntheticFabric
+    from aci_docgen.synthetic.server import FakeApic
+
+    if args.dump:
+        tenants, path = args.dump.split(':', 1)
+        SyntheticFabric(int(tenants), seed=args.seed).write_json(path)
+        return
+    if args.serve is not None:
+        apic = FakeApic(SyntheticFabric(args.serve, seed=args.seed).mos, port=args.port)
+        print(f"Fake APIC with {args.serve} tenants on {apic.url} (any user/password); Ctrl-C to stop")
+        try:
+            apic.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    results = []
+    print(f"{'tenants':>8} {'MOs':>9} {'harvest s':>10} {'render s':>9} {'peak MiB':>9} {'requests':>9} {'resp MiB':>9}")
+    for scale in [int(s) for s in args.scales.split(',')]:
+        fabric = SyntheticFabric(scale, seed=args.seed)
+        with FakeApic(fabric.mos) as apic:
+            cmd = [sys.executable, os.path.abspath(__file__), '--child-apic', apic.url,
+                   '--workers', str(args.workers), '--mode', args.mode, '--page-size', str(args.page_size),
+                   '--sections', args.sections] + (['--stream'] if args.stream else [])
+            proc = subprocess.run(cmd, cwd=HERE, capture_output=True, text=True)
+        if proc.returncode != 0:
+            sys.stderr.write(proc.stderr)
+            sys.exit(f"benchmark at {scale} tenants failed")
+        result = dict(json.loads(proc.stdout.strip().splitlines()[-1]), tenants=scale, fabric_mos=len(fabric.mos))
+        results.append(result)
+        print(f"{scale:>8} {len(fabric.mos):>9} {result['harvest_s']:>10.2f} {result['render_s']:>9.2f} "
+              f"{result['peak_rss_mib']:>9.1f} {result['requests']:>9} {result['response_mib']:>9.1f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'workers': args.workers, 'mode': args.mode, 'page_size': args.page_size, 'stream': args.stream,
+                       'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
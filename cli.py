@@ -1,30 +1,199 @@
 #!/usr/bin/env python3
-import argparse, os, yaml
+import argparse, json, os, sqlite3, time, yaml
 from aci_docgen.aci_api import AciApi
-from aci_docgen.pipeline import run_harvest
+from aci_docgen.checkpoint import HarvestCheckpoint, checkpoint_path
+from aci_docgen.diff import diff_reports
+from aci_docgen.incremental import plan_incremental, save_state
+from aci_docgen.pipeline import iter_harvest, run_harvest
+from aci_docgen.profiling import Profiler
+from aci_docgen.response_store import ResponseStore
+from aci_docgen.snapshot import COMPRESSIONS, FORMATS
+from aci_docgen.sqlite_store import SnapshotDb, format_table
+from aci_docgen.transport import DEFAULT_RETRIES, DEFAULT_TOKEN_CACHE, TokenCache
+from aci_docgen.renderers.environment import DEFAULT_TEMPLATE_CACHE, get_environment
 from aci_docgen.renderers.markdown import MarkdownRenderer
 from aci_docgen.utils.log import info, debug
+from aci_docgen.watch import FabricWatcher, RecordedEvents, WebsocketEvents
 
 def main():
     p = argparse.ArgumentParser(description='ACI DocGen Pro')
-    p.add_argument('--apic', required=True)
-    p.add_argument('--user', required=True)
-    p.add_argument('--password', required=True)
+    p.add_argument('command', nargs='?', choices=['harvest', 'watch', 'query', 'diff'], default='harvest',
+                   help="'harvest' documents the fabric once; 'watch' keeps the docs updated from APIC events; "
+                        "'query' runs SQL on the --sqlite snapshot history; 'diff' compares --out with --since")
+    p.add_argument('--apic', help='APIC URL; comma-separate several cluster members to spread queries over them')
+    p.add_argument('--user')
+    p.add_argument('--password')
     p.add_argument('--out', default='out')
     p.add_argument('--insecure', action='store_true')
     p.add_argument('--debug', action='store_true')
     p.add_argument('--sections', default='sections.yml')
+    p.add_argument('--cache-mb', type=int, default=512,
+                   help='memory budget for cached APIC responses during a run')
+    p.add_argument('--workers', type=int, default=1,
+                   help='number of tenants harvested in parallel')
+    p.add_argument('--pool-size', type=int, default=0,
+                   help='HTTP keep-alive connections to the APIC (default: max(10, --workers))')
+    p.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                   help='retries with exponential backoff on APIC 5xx answers and dropped connections')
+    p.add_argument('--max-rps', type=float, default=0,
+                   help='hard ceiling on APIC requests per second (default: no ceiling)')
+    p.add_argument('--token-cache', default=DEFAULT_TOKEN_CACHE,
+                   help='file keeping APIC session tokens between runs')
+    p.add_argument('--no-token-cache', action='store_true', help='always log in instead of reusing a cached session')
+    p.add_argument('--mode', choices=['subtree', 'class'], default='subtree',
+                   help="'subtree' fetches each tenant's subtree; 'class' issues one fabric-wide query per MO class")
+    p.add_argument('--page-size', type=int, default=0,
+                   help='fetch APIC queries in pages of this many MOs (0 = single response)')
+    store_opts = p.add_mutually_exclusive_group()
+    store_opts.add_argument('--record', action='store_true',
+                            help='save every APIC response to the response cache while harvesting')
+    store_opts.add_argument('--replay', action='store_true',
+                            help='harvest from the response cache only, without contacting the APIC')
+    p.add_argument('--incremental', action='store_true',
+                   help='only re-harvest tenants with aaaModLR audit records since the last run in --out')
+    p.add_argument('--resume', action='store_true',
+                   help='continue an interrupted harvest in --out from its checkpoint, skipping the tenants it has')
+    p.add_argument('--render-processes', type=int, default=1,
+                   help='render tenant pages, index.md and testing.md in this many processes')
+    p.add_argument('--stream', action='store_true',
+                   help='harvest, render and write one tenant at a time instead of holding the whole fabric')
+    p.add_argument('--template-cache', default=DEFAULT_TEMPLATE_CACHE,
+                   help='directory keeping compiled Jinja templates between runs')
+    p.add_argument('--no-template-cache', action='store_true', help='compile templates in memory on every run')
+    p.add_argument('--snapshot-format', choices=FORMATS, default='json',
+                   help="reports/summary.* encoding: 'json' (indented), 'ndjson' (one tenant per line) or 'msgpack'")
+    p.add_argument('--snapshot-compression', choices=COMPRESSIONS, default='none',
+                   help='compress the snapshot (summary.*.gz / summary.*.zst)')
+    p.add_argument('--sqlite', help='harvest: also store the run as a snapshot in this SQLite database; '
+                                    'query: the database (default: <out>/reports/snapshots.db)')
+    p.add_argument('--sql', help='query: SQL to run (default: list the snapshots)')
+    p.add_argument('--since', help='diff: an earlier output directory to compare --out with')
+    p.add_argument('--diff-json', help='diff: also write the machine-readable diff to this file')
+    p.add_argument('--profile', action='store_true',
+                   help='profile CPU (cProfile) and memory (tracemalloc) per stage into reports/profile.txt')
+    p.add_argument('--metrics-prom', help='also write run metrics to this Prometheus textfile (e.g. for node_exporter)')
+    p.add_argument('--response-cache', help='response cache directory (default: <out>/.apic-cache)')
+    p.add_argument('--debounce', type=float, default=1.0,
+                   help='watch: seconds to collect events before re-rendering the affected tenants')
+    p.add_argument('--events-url', help='watch: event websocket URL (default: the APIC /socket<token>)')
+    p.add_argument('--events-file', help='watch: apply recorded event messages (one JSON per line) instead')
     args = p.parse_args()
+    if args.command == 'query':
+        path = args.sqlite or os.path.join(args.out, 'reports', 'snapshots.db')
+        if not os.path.exists(path):
+            p.error(f"no snapshot database at {path}")
+        db = SnapshotDb(path)
+        try:
+            columns, rows = db.query(args.sql) if args.sql else db.snapshots()
+        except sqlite3.Error as exc:
+            p.error(f"query failed: {exc}")
+        finally:
+            db.close()
+        print(format_table(columns, rows))
+        return
+    if args.command == 'diff':
+        if not args.since:
+            p.error('diff needs --since <earlier output directory>')
+        try:
+            changes = diff_reports(os.path.join(args.since, 'reports'), os.path.join(args.out, 'reports'))
+        except (OSError, ValueError, RuntimeError) as exc:
+            p.error(str(exc))
+        if args.diff_json:
+            with open(args.diff_json, 'w', encoding='utf-8') as f:
+                json.dump(changes, f, indent=2, ensure_ascii=False)
+        print(get_environment().get_template('changes.md.j2').render(diff=changes, since=args.since))
+        return
+    started = time.time()
+    if not args.replay and not (args.apic and args.user and args.password):
+        p.error('--apic, --user and --password are required unless --replay is used')
 
     with open(args.sections) as f:
         sections = yaml.safe_load(f) or {}
 
-    api = AciApi(args.apic, args.user, args.password, insecure=args.insecure, debug_enabled=args.debug)
-    data = run_harvest(api, sections, debug_enabled=args.debug)
+    store, store_mode = None, None
+    if args.record or args.replay:
+        store = ResponseStore(args.response_cache or os.path.join(args.out, '.apic-cache'))
+        store_mode = 'replay' if args.replay else 'record'
 
+    if args.profile and (args.workers > 1 or args.render_processes > 1):
+        # cProfile only follows the thread that enabled it
+        info('--profile harvests and renders with a single worker')
+        args.workers = args.render_processes = 1
+    if args.stream and args.render_processes > 1:
+        info('--stream renders each tenant as it is harvested, in this process')
+        args.render_processes = 1
+
+    api = AciApi(args.apic.split(',') if args.apic else 'replay', args.user, args.password, insecure=args.insecure, debug_enabled=args.debug,
+                 cache_bytes=args.cache_mb * 1024 * 1024, pool_size=args.pool_size or max(10, args.workers),
+                 page_size=args.page_size, store=store, store_mode=store_mode, retries=args.retries,
+                 token_cache=None if args.no_token_cache else TokenCache(args.token_cache), max_rps=args.max_rps)
+    template_cache = None if args.no_template_cache else args.template_cache
+    if args.command == 'watch':
+        os.makedirs(args.out, exist_ok=True)
+        renderer = MarkdownRenderer(args.out, template_cache=template_cache, snapshot_format=args.snapshot_format,
+                                    snapshot_compression=args.snapshot_compression)
+        watcher = FabricWatcher(api, sections, renderer, debounce=args.debounce, workers=args.workers,
+                                debug_enabled=args.debug)
+        if args.events_file:
+            events = RecordedEvents(args.events_file)
+        else:
+            # Before subscribing: the APIC only pushes events of subscriptions made while its websocket is open
+            events = WebsocketEvents(args.events_url or api.events_url, verify=not args.insecure)
+        try:
+            watcher.start()
+            watcher.run(events, keepalive=not args.replay)
+        except KeyboardInterrupt:
+            pass
+        info(f"Stopped watching; documentation in: {args.out}")
+        return
+
+    if args.profile:
+        api.metrics.profiler = Profiler()
+
+    reuse, watermark = {}, None
+    if args.incremental:
+        reuse, watermark = plan_incremental(api, args.out, sections, debug_enabled=args.debug)
     os.makedirs(args.out, exist_ok=True)
-    md = MarkdownRenderer(args.out)
-    md.render(data)
+    checkpoint = HarvestCheckpoint(checkpoint_path(args.out), sections, watermark=watermark, resume=args.resume)
+    if checkpoint.resumed and checkpoint.watermark:
+        # Checkpointed tenants were harvested as of the interrupted run's audit position
+        watermark = checkpoint.watermark
+    md = MarkdownRenderer(args.out, metrics=api.metrics, processes=args.render_processes, template_cache=template_cache,
+                          snapshot_format=args.snapshot_format, snapshot_compression=args.snapshot_compression)
+    # Temp files of an earlier run killed mid-write (only those untouched since this run started)
+    md.manifest.sweep(started)
+    db = SnapshotDb(args.sqlite) if args.sqlite else None
+    snapshot_meta = {'source': args.apic or 'replay', 'mode': args.mode, 'sections': sections}
+    if args.stream:
+        tenants = iter_harvest(api, sections, debug_enabled=args.debug, workers=args.workers, mode=args.mode,
+                               reuse=reuse, checkpoint=checkpoint)
+        if db:
+            tenants = db.record(tenants, **snapshot_meta)
+        # Harvest and render interleave; one phase covers both
+        with api.metrics.phase('stream'):
+            md.render_stream(tenants)
+    else:
+        with api.metrics.phase('harvest'):
+            data = run_harvest(api, sections, debug_enabled=args.debug, workers=args.workers, mode=args.mode,
+                               reuse=reuse, checkpoint=checkpoint)
+        with api.metrics.phase('render'):
+            md.render(data)
+        if db:
+            with api.metrics.phase('sqlite'):
+                db.write(data, **snapshot_meta)
+    if db:
+        db.close()
+        info(f"Snapshot stored in: {args.sqlite}")
+    checkpoint.finish()
+    api.metrics.write_json(os.path.join(args.out, 'reports', 'metrics.json'))
+    if args.metrics_prom:
+        api.metrics.write_prometheus(args.metrics_prom)
+    if args.profile:
+        api.metrics.profiler.stop()
+        api.metrics.profiler.write(os.path.join(args.out, 'reports'))
+        info(f"Profile written to: {os.path.join(args.out, 'reports', 'profile.txt')}")
+    if args.incremental:
+        save_state(args.out, watermark, sections)
 
     info(f"Documentation written to: {args.out}")
 
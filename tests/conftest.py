@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aci_docgen.aci_api import AciApi  # noqa: E402
+from aci_docgen.synthetic.fabric import SyntheticFabric  # noqa: E402
+from aci_docgen.synthetic.server import FakeApic  # noqa: E402
+
+SECTIONS = {'tenants': True, 'contracts': True, 'l3out': True, 'l2out': True, 'service_graphs': True,
+            'vmm': True, 'esg': True}
+
+
+@pytest.fixture
+def sections():
+    return dict(SECTIONS)
+
+
+@pytest.fixture
+def fabric():
+    return SyntheticFabric(tenants=4, aps=1, epgs_per_ap=2, static_paths_per_epg=2)
+
+
+@pytest.fixture
+def wide_fabric():
+    # More than ten siblings per class, so DN order (BD0-10 < BD0-2) differs from creation order
+    return SyntheticFabric(tenants=3, aps=1, bds_per_vrf=12, epgs_per_ap=12, contracts=12, static_paths_per_epg=1)
+
+
+@pytest.fixture
+def apic(fabric):
+    with FakeApic(fabric.mos) as server:
+        yield server
+
+
+@pytest.fixture
+def api(apic):
+    return AciApi(apic.url, 'admin', 'secret', retries=0)
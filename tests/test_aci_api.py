@@ -0,0 +1,31 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from aci_docgen.aci_api import AciApi
+from aci_docgen.pipeline import run_harvest
+from aci_docgen.synthetic.server import FakeApic
+
+
+def test_fetch_locks_are_dropped(api, fabric):
+    dns = fabric.tenant_dns()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        indexes = list(pool.map(api.subtree_index, dns * 3))
+    assert all(len(index) for index in indexes)
+    assert api._fetch_locks == {}
+    for dn in dns:
+        api.release_subtree(dn)
+    assert api.cache.stats()['entries'] == 0
+
+
+def test_paged_queries_match_unpaged(wide_fabric, sections):
+    # Created last but first in DN order
+    late = ('fvTenant', {'dn': 'uni/tn-A', 'name': 'A', 'modTs': '2024-01-01T00:00:00.000+00:00', 'status': ''})
+    with FakeApic(wide_fabric.mos + [late]) as apic:
+        unpaged = AciApi(apic.url, 'admin', 'secret', retries=0)
+        expected = run_harvest(unpaged, sections)
+        fvbds = list(unpaged.iter_class('fvBD'))
+        before = apic.requests
+        paged = AciApi(apic.url, 'admin', 'secret', retries=0, page_size=5)
+        assert list(paged.iter_class('fvBD')) == sorted(fvbds, key=lambda mo: mo['fvBD']['attributes']['dn'])
+        assert apic.requests - before >= len(fvbds) // 5
+        assert run_harvest(paged, sections) == expected
+    assert expected['tenants'][0]['name'] == 'A'
@@ -0,0 +1,43 @@
+from aci_docgen.cache import ResponseCache
+from aci_docgen.pipeline import harvest_tenant, harvester_classes
+
+
+def test_lru_eviction_by_size():
+    cache = ResponseCache(max_bytes=10)
+    cache.put('a', 'A', 4)
+    cache.put('b', 'B', 4)
+    assert cache.get('a') == 'A'
+    cache.put('c', 'C', 4)
+    assert cache.get('b') is None
+    assert cache.get('a') == 'A' and cache.get('c') == 'C'
+    assert cache.stats() == {'entries': 2, 'bytes': 8, 'hits': 3, 'misses': 1, 'evictions': 1}
+
+
+def test_oversized_entry_is_kept_alone():
+    cache = ResponseCache(max_bytes=10)
+    cache.put('a', 'A', 4)
+    cache.put('big', 'BIG', 50)
+    assert cache.get('big') == 'BIG'
+    assert cache.get('a') is None
+    assert cache.bytes == 50
+
+
+def test_put_replaces_and_discard_releases():
+    cache = ResponseCache(max_bytes=100)
+    cache.put('a', 'A', 4)
+    cache.put('a', 'A2', 6)
+    assert cache.get('a') == 'A2'
+    assert cache.bytes == 6
+    cache.discard('a')
+    cache.discard('missing')
+    assert cache.stats()['entries'] == 0 and cache.bytes == 0
+
+
+def test_harvesters_share_one_subtree_fetch(api, apic, sections):
+    api.set_subtree_classes(*harvester_classes(sections))
+    tn = {'name': 'TN0000', 'dn': 'uni/tn-TN0000'}
+    first = harvest_tenant(api, tn, sections)
+    before = apic.requests
+    assert harvest_tenant(api, tn, sections) == first
+    assert apic.requests == before
+    assert api.cache.stats()['hits'] > 0
@@ -0,0 +1,98 @@
+import os
+import time
+
+import pytest
+
+from aci_docgen.checkpoint import HarvestCheckpoint, checkpoint_path
+from aci_docgen.pipeline import iter_harvest, run_harvest
+from aci_docgen.renderers.manifest import TMP_PREFIX, OutputManifest
+
+
+class Interrupted(Exception):
+    pass
+
+
+def _interrupted_run(api, sections, path, after):
+    checkpoint = HarvestCheckpoint(path, sections)
+    with pytest.raises(Interrupted):
+        for n, _ in enumerate(iter_harvest(api, sections, checkpoint=checkpoint), 1):
+            if n == after:
+                raise Interrupted
+    checkpoint.close()
+
+
+def test_resume_matches_uninterrupted_run(api, apic, sections, tmp_path):
+    expected = run_harvest(api, sections)
+    path = checkpoint_path(str(tmp_path))
+    _interrupted_run(api, sections, path, after=2)
+
+    checkpoint = HarvestCheckpoint(path, sections, resume=True)
+    assert checkpoint.resumed and sorted(checkpoint) == ['TN0000', 'TN0001']
+    before = apic.requests
+    data = run_harvest(api, sections, checkpoint=checkpoint)
+    checkpoint.finish()
+    assert data == expected
+    assert not os.path.exists(path)
+    resumed = apic.requests - before
+    before = apic.requests
+    run_harvest(api, sections)
+    assert resumed < apic.requests - before
+
+
+def test_torn_last_line_is_dropped(sections, tmp_path):
+    path = str(tmp_path / 'ck.ndjson')
+    checkpoint = HarvestCheckpoint(path, sections, watermark='W')
+    checkpoint.add({'name': 'A', 'bds': [1, 2]})
+    checkpoint.close()
+    with open(path, 'ab') as f:
+        f.write(b'{"name":"B","bds":[')
+    checkpoint = HarvestCheckpoint(path, sections, resume=True)
+    assert dict(checkpoint) == {'A': {'name': 'A', 'bds': [1, 2]}}
+    assert checkpoint.watermark == 'W'
+    checkpoint.add({'name': 'B'})
+    checkpoint.add({'name': 'A', 'bds': []})
+    checkpoint.close()
+    assert dict(HarvestCheckpoint(path, sections, resume=True)) == {'A': {'name': 'A', 'bds': [1, 2]}, 'B': {'name': 'B'}}
+
+
+def test_other_sections_or_no_resume_start_over(sections, tmp_path):
+    path = str(tmp_path / 'ck.ndjson')
+    checkpoint = HarvestCheckpoint(path, sections)
+    checkpoint.add({'name': 'A'})
+    checkpoint.close()
+    other = dict(sections, esg=False)
+    checkpoint = HarvestCheckpoint(path, other, resume=True)
+    assert not checkpoint.resumed and len(checkpoint) == 0
+    checkpoint.close()
+    checkpoint = HarvestCheckpoint(path, other)
+    assert len(checkpoint) == 0
+    checkpoint.close()
+    assert not HarvestCheckpoint(str(tmp_path / 'missing.ndjson'), sections, resume=True).resumed
+
+
+def test_failed_tenants_keep_the_checkpoint(sections, tmp_path):
+    path = str(tmp_path / 'ck.ndjson')
+    checkpoint = HarvestCheckpoint(path, sections)
+    checkpoint.add({'name': 'A'})
+    checkpoint.fail('B')
+    checkpoint.finish()
+    checkpoint = HarvestCheckpoint(path, sections, resume=True)
+    assert list(checkpoint) == ['A'] and 'B' not in checkpoint
+    checkpoint.finish()
+    assert not os.path.exists(path)
+
+
+def test_sweep_removes_only_stale_temp_files(tmp_path):
+    reports = tmp_path / 'reports'
+    reports.mkdir()
+    stale, fresh, other = (reports / f"{TMP_PREFIX}stale.tmp", reports / f"{TMP_PREFIX}fresh.tmp",
+                           reports / 'tmpother.tmp')
+    for p in (stale, fresh, other):
+        p.write_text('x')
+    os.utime(stale, (time.time() - 3600, time.time() - 3600))
+    os.utime(other, (time.time() - 3600, time.time() - 3600))
+    manifest = OutputManifest(str(tmp_path))
+    assert stale.exists()
+    manifest.sweep(time.time() - 60)
+    assert not stale.exists()
+    assert fresh.exists() and other.exists()
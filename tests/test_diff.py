@@ -0,0 +1,92 @@
+import copy
+import json
+import shutil
+
+import pytest
+
+from aci_docgen.diff import ChangeTracker, HashTree, diff_reports, diff_tenant, object_key, tenant_node
+from aci_docgen.pipeline import run_harvest
+from aci_docgen.renderers.markdown import MarkdownRenderer
+
+
+@pytest.fixture
+def data(api, sections):
+    return run_harvest(api, sections)
+
+
+def _changed(data):
+    new = copy.deepcopy(data)
+    tn1 = next(t for t in new['tenants'] if t['name'] == 'TN0001')
+    tn1['bds'][0]['arpFlood'] = 'changed'
+    tn1['bds'][0]['subnets'].append({'ip': '192.0.2.1/24', 'scope': 'private'})
+    tn1['epgs'].pop()
+    new['tenants'] = [t for t in new['tenants'] if t['name'] not in ('TN0002', 'TN0003')]
+    new['failed_tenants'] = ['TN0003']
+    return new
+
+
+def test_tree_hashes_follow_content(data):
+    tree = HashTree.from_data(data)
+    assert HashTree.from_data(copy.deepcopy(data)).root == tree.root
+    changed = _changed(data)
+    other = HashTree.from_data(changed)
+    assert other.root != tree.root
+    assert other.tenants['TN0000'] == tree.tenants['TN0000']
+    assert other.tenants['TN0001']['sections']['vrfs'] == tree.tenants['TN0001']['sections']['vrfs']
+
+
+def test_object_keys():
+    assert object_key('epgs', {'ap': 'AP', 'name': 'E'}, 0) == 'AP/E'
+    assert object_key('bds', {'name': 'B'}, 0) == 'B'
+    assert object_key('bds', {'dn': 'uni/tn-T/BD-B'}, 0) == 'uni/tn-T/BD-B'
+    assert object_key('bds', 'text', 3) == '#3'
+
+
+def test_diff_tenant_fields(data):
+    old = next(t for t in data['tenants'] if t['name'] == 'TN0001')
+    new = next(t for t in _changed(data)['tenants'] if t['name'] == 'TN0001')
+    changes = diff_tenant(tenant_node(old), tenant_node(new), old, new)
+    bd = old['bds'][0]['name']
+    assert set(changes) == {'bds', 'epgs'}
+    fields = changes['bds']['modified'][bd]
+    assert fields['arpFlood'] == {'old': old['bds'][0]['arpFlood'], 'new': 'changed'}
+    assert fields['subnets'] == {'added': [{'ip': '192.0.2.1/24', 'scope': 'private'}], 'removed': []}
+    removed = old['epgs'][-1]
+    assert changes['epgs'] == {'added': [], 'removed': [f"{removed['ap']}/{removed['name']}"], 'modified': {}}
+
+
+def test_first_run_has_nothing_to_compare(data):
+    tracker = ChangeTracker()
+    for entry in data['tenants']:
+        tracker.add(entry)
+    assert tracker.result()['previous'] is None
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_render_and_diff_command_agree(data, tmp_path, stream):
+    out = tmp_path / 'out'
+    MarkdownRenderer(str(out), template_cache=None).render(data)
+    shutil.copytree(out, tmp_path / 'yesterday')
+
+    new = _changed(data)
+    renderer = MarkdownRenderer(str(out), template_cache=None)
+    if stream:
+        tenants = [(t['name'], t) for t in new['tenants']] + [(n, None) for n in new['failed_tenants']]
+        renderer.render_stream(iter(tenants))
+    else:
+        renderer.render(new)
+    live = json.loads((out / 'reports' / 'changes.json').read_text(encoding='utf-8'))
+    tenants = live['tenants']
+    assert tenants['removed'] == ['TN0002']
+    assert tenants['failed'] == ['TN0003']
+    assert tenants['added'] == []
+    assert set(tenants['changed']) == {'TN0001'}
+    assert 'TN0003' in (out / 'changes.md').read_text(encoding='utf-8')
+
+    offline = diff_reports(str(tmp_path / 'yesterday' / 'reports'), str(out / 'reports'))
+    assert offline == live
+
+
+def test_diff_reports_needs_snapshots(tmp_path):
+    with pytest.raises(ValueError):
+        diff_reports(str(tmp_path), str(tmp_path))
@@ -0,0 +1,36 @@
+import os
+
+from aci_docgen.renderers.environment import compact, get_environment
+
+DIFF = {'previous': 'a', 'current': 'b', 'tenants': {'added': ['TN1'], 'removed': [], 'failed': [], 'changed': {}}}
+
+
+def test_one_environment_per_cache_dir(tmp_path):
+    cache = str(tmp_path / 'jinja')
+    env = get_environment(bytecode_cache=cache)
+    assert get_environment(bytecode_cache=cache) is env
+    assert get_environment(bytecode_cache=None) is not env
+    assert env.filters['compact'] is compact
+
+
+def test_bytecode_cache_persists_compiled_templates(tmp_path):
+    cache = str(tmp_path / 'jinja')
+    env = get_environment(bytecode_cache=cache)
+    text = env.get_template('changes.md.j2').render(diff=DIFF)
+    assert '[TN1](tenants/TN1.md)' in text
+    assert len(os.listdir(cache)) == 1
+    assert get_environment(bytecode_cache=None).get_template('changes.md.j2').render(diff=DIFF) == text
+
+
+def test_unwritable_cache_dir_compiles_in_memory(tmp_path):
+    (tmp_path / 'file').write_text('')
+    env = get_environment(bytecode_cache=str(tmp_path / 'file' / 'jinja'))
+    assert env.bytecode_cache is None
+    assert env.get_template('changes.md.j2')
+
+
+def test_compact():
+    assert compact('plain text') == 'plain text'
+    assert compact({'b': 1, 'a': 'é'}) == '{"a": "é", "b": 1}'
+    assert compact(list(range(100)), limit=10) == '[0, 1, 2,…'
+    assert len(compact('x' * 500)) == 120
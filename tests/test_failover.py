@@ -0,0 +1,67 @@
+import socket
+import time
+
+import pytest
+
+from aci_docgen.aci_api import AciApi
+from aci_docgen.pipeline import run_harvest
+from aci_docgen.synthetic.server import FakeApic
+from aci_docgen.watch import WebsocketEvents
+
+
+def dead_url():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+
+def test_queries_are_spread_over_members(fabric, sections):
+    with FakeApic(fabric.mos) as a, FakeApic(fabric.mos) as b:
+        expected = run_harvest(AciApi(a.url, 'admin', 'secret', retries=0), sections)
+        before = a.requests
+        data = run_harvest(AciApi([a.url, b.url], 'admin', 'secret', retries=0), sections)
+        assert data == expected
+        assert a.requests - before > 1 and b.requests > 1
+
+
+def test_member_down_at_startup_is_skipped(apic, sections):
+    expected = run_harvest(AciApi(apic.url, 'admin', 'secret', retries=0), sections)
+    api = AciApi([dead_url(), apic.url], 'admin', 'secret', retries=0)
+    assert not api.members[0].available()
+    assert run_harvest(api, sections) == expected
+
+
+def test_member_lost_mid_run_fails_over(fabric, sections):
+    with FakeApic(fabric.mos) as a, FakeApic(fabric.mos) as b:
+        expected = run_harvest(AciApi(a.url, 'admin', 'secret', retries=0), sections)
+        api = AciApi([a.url, b.url], 'admin', 'secret', retries=0)
+        b.stop()
+        # Keep-alive connections outlive the listener; drop them as a real outage would
+        api.members[1].s.close()
+        assert run_harvest(api, sections) == expected
+        assert not api.members[1].available()
+
+
+def test_subscriptions_use_a_live_member(apic):
+    api = AciApi([dead_url(), apic.url], 'admin', 'secret', retries=0)
+    assert api.pinned_member() is api.members[1]
+    assert api.events_url() == f"ws://{apic.url.split('://', 1)[1]}/socket{api.members[1].token}"
+    mos, subscription_id = api.subscribe_class('fvTenant')
+    assert mos and subscription_id in apic.subscriptions
+    api.refresh_subscription(subscription_id)
+    assert apic.refreshes[subscription_id] == 1
+
+
+def test_watch_events_use_a_live_member(apic):
+    pytest.importorskip('websocket')
+    api = AciApi([dead_url(), apic.url], 'admin', 'secret', retries=0)
+    events = WebsocketEvents(api.events_url)
+    try:
+        deadline = time.monotonic() + 10
+        while apic.connected != 1 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        api.subscribe_class('fvBD')
+        assert apic.notify('fvBD', {'dn': 'uni/tn-TN0001/BD-BD0-0', 'arpFlood': 'pinned'}) == 1
+        assert events.next_message(10)['imdata'][0]['fvBD']['attributes']['arpFlood'] == 'pinned'
+    finally:
+        events.close()
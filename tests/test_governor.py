@@ -0,0 +1,84 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from aci_docgen.governor import RateGovernor, is_throttled
+
+
+def response(status, history=()):
+    retries = SimpleNamespace(history=[SimpleNamespace(status=s) for s in history])
+    return SimpleNamespace(status_code=status, raw=SimpleNamespace(retries=retries))
+
+
+def test_is_throttled_sees_retried_attempts():
+    assert is_throttled(response(429))
+    assert is_throttled(response(200, history=(503,)))
+    assert not is_throttled(response(200, history=(500,)))
+    assert not is_throttled(SimpleNamespace(status_code=200, raw=None))
+
+
+def test_additive_increase_up_to_max():
+    governor = RateGovernor(max_inflight=8)
+    assert governor.limit == 4
+    for _ in range(100):
+        governor.acquire()
+        governor.release(0.01)
+    assert governor.stats()['limit'] == 8
+    assert governor.stats()['requests'] == 100
+
+
+def test_throttle_halves_once_per_round_trip():
+    governor = RateGovernor(max_inflight=16)
+    governor.limit = 16.0
+    for _ in range(4):
+        governor.acquire()
+    for _ in range(4):
+        governor.release(10.0, throttled=True)
+    assert governor.limit == 8
+    assert governor.stats()['throttled'] == 4
+
+
+def test_latency_rise_trims_the_limit():
+    governor = RateGovernor(max_inflight=10, latency_tolerance=2.0)
+    governor.acquire()
+    governor.release(0.001)
+    limit = governor.limit
+    governor.acquire()
+    governor.release(1.0)
+    assert governor.limit == limit * 0.9
+
+
+def test_acquire_blocks_at_the_limit():
+    governor = RateGovernor(max_inflight=2)
+    assert governor.limit == 1
+    governor.acquire()
+    started = threading.Event()
+
+    def second():
+        governor.acquire()
+        started.set()
+
+    thread = threading.Thread(target=second)
+    thread.start()
+    assert not started.wait(0.1)
+    governor.release(0.01)
+    assert started.wait(5)
+    thread.join()
+
+
+def test_max_rps_paces_request_starts():
+    governor = RateGovernor(max_inflight=10, max_rps=50)
+    start = time.monotonic()
+    for _ in range(6):
+        governor.acquire()
+        governor.release()
+    assert time.monotonic() - start >= 5 / 50 * 0.9
+
+
+def test_api_releases_every_slot(api, fabric):
+    api.class_query('fvTenant')
+    for dn in fabric.tenant_dns():
+        api.subtree_index(dn)
+    governor = api.members[0].governor
+    assert governor.in_flight == 0
+    assert governor.requests == 1 + len(fabric.tenant_dns())
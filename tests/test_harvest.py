@@ -0,0 +1,98 @@
+from aci_docgen import pipeline
+from aci_docgen.aci_api import AciApi
+from aci_docgen.pipeline import harvest_tenant, harvester_classes, run_harvest
+from aci_docgen.synthetic.fabric import SyntheticFabric
+from aci_docgen.synthetic.server import FakeApic
+
+
+def test_esg_selectors(api, sections):
+    api.set_subtree_classes(*harvester_classes(sections)[:1])
+    tn = {'name': 'TN0000', 'dn': 'uni/tn-TN0000'}
+    esg, = harvest_tenant(api, tn, sections)['esgs']
+    assert esg['name'] == 'ESG0'
+    assert esg['ip_selectors'] == ['172.16.0.0/24']
+    assert esg['epg_selectors'] == ['TN0000/AP0/EPG0']
+    assert esg['prov_contracts'] == ['C0']
+
+
+def test_rejected_class_filter_falls_back_to_whole_subtree(fabric, sections):
+    expected = None
+    with FakeApic(fabric.mos) as apic:
+        expected = run_harvest(AciApi(apic.url, 'admin', 'secret', retries=0), sections)
+    with FakeApic(fabric.mos, unknown_classes={'fvAEPSelector'}) as apic:
+        data = run_harvest(AciApi(apic.url, 'admin', 'secret', retries=0), sections)
+    assert 'failed_tenants' not in data
+    assert data == expected
+
+
+def test_esg_ip_selector_variants(fabric, sections):
+    esg = 'uni/tn-TN0000/ap-AP0/esg-ESG0'
+    extra = [('fvESgIpSelector', {'dn': f"{esg}/ipselector-a", 'ip': '10.1.0.0/24'}),
+             ('fvVendorSubnetSelector', {'dn': f"{esg}/subnetselector-b", 'subnet': '10.2.0.0/24'})]
+    with FakeApic(fabric.mos + extra) as apic:
+        api = AciApi(apic.url, 'admin', 'secret', retries=0)
+        for mode in ('subtree', 'class'):
+            api.cache.clear()
+            data = run_harvest(api, sections, mode=mode)
+            # Declared variants pass the class filter, others are not fetched
+            assert data['tenants'][0]['esgs'][0]['ip_selectors'] == ['10.1.0.0/24', '172.16.0.0/24']
+    with FakeApic(fabric.mos + extra, unknown_classes={'fvSubnetSelector'}) as apic:
+        api = AciApi(apic.url, 'admin', 'secret', retries=0)
+        # Whole subtrees are fetched, so every variant is found
+        data = run_harvest(api, sections)
+        assert data['tenants'][0]['esgs'][0]['ip_selectors'] == ['10.1.0.0/24', '10.2.0.0/24', '172.16.0.0/24']
+        # Class mode skips the class the APIC rejects
+        api.cache.clear()
+        data = run_harvest(api, sections, mode='class')
+        assert 'failed_tenants' not in data
+        assert data['tenants'][0]['esgs'][0]['ip_selectors'] == ['10.1.0.0/24', '172.16.0.0/24']
+
+
+def test_class_mode_matches_subtree_mode(wide_fabric, sections):
+    with FakeApic(wide_fabric.mos) as apic:
+        api = AciApi(apic.url, 'admin', 'secret', retries=0)
+        expected = run_harvest(api, sections)
+        for workers in (1, 3):
+            api.cache.clear()
+            before = apic.requests
+            assert run_harvest(api, sections, mode='class', workers=workers) == expected
+            class_requests = apic.requests - before
+    # One query per class, plus the tenant list and the subtrees outside tenants (VMM)
+    assert class_requests <= len(harvester_classes(sections)[0]) + 3
+
+
+def test_class_mode_requests_do_not_grow_with_tenants(sections):
+    counts = []
+    for tenants in (2, 6):
+        fabric = SyntheticFabric(tenants=tenants, aps=1, epgs_per_ap=1)
+        with FakeApic(fabric.mos) as apic:
+            run_harvest(AciApi(apic.url, 'admin', 'secret', retries=0), sections, mode='class')
+            counts.append(apic.requests)
+    assert counts[0] == counts[1]
+
+
+def test_concurrent_harvest_matches_serial(api, sections, monkeypatch):
+    expected = run_harvest(api, sections)
+    assert run_harvest(api, sections, workers=4) == expected
+
+    def flaky(api, tn, sections):
+        if tn['name'] == 'TN0002':
+            raise RuntimeError('subtree query failed')
+        return harvest_tenant(api, tn, sections)
+    monkeypatch.setattr(pipeline, 'harvest_tenant', flaky)
+    data = run_harvest(api, sections, workers=4)
+    assert data['failed_tenants'] == ['TN0002']
+    assert data['tenants'] == [t for t in expected['tenants'] if t['name'] != 'TN0002']
+
+
+def test_l2out_instps_belong_to_their_own_l2out(fabric, sections):
+    # One L2Out name is a prefix of the other's
+    extra = [('l2extOut', {'dn': 'uni/tn-TN0000/l2out-L2', 'name': 'L2'}),
+             ('l2extInstP', {'dn': 'uni/tn-TN0000/l2out-L2/instP-A', 'name': 'A'}),
+             ('l2extOut', {'dn': 'uni/tn-TN0000/l2out-L2-B', 'name': 'L2-B'}),
+             ('l2extInstP', {'dn': 'uni/tn-TN0000/l2out-L2-B/instP-B', 'name': 'B'})]
+    with FakeApic(fabric.mos + extra) as apic:
+        data = run_harvest(AciApi(apic.url, 'admin', 'secret', retries=0), sections)
+    l2outs = {lo['name']: [i['name'] for i in lo['instps']] for lo in data['tenants'][0]['l2outs']}
+    assert l2outs['L2'] == ['A']
+    assert l2outs['L2-B'] == ['B']
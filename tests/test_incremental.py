@@ -0,0 +1,102 @@
+import json
+import os
+
+import pytest
+
+from aci_docgen import pipeline
+from aci_docgen.aci_api import AciApi
+from aci_docgen.incremental import STATE_FILE, plan_incremental, save_state
+from aci_docgen.pipeline import run_harvest
+from aci_docgen.snapshot import write_snapshot
+from aci_docgen.synthetic.fabric import SyntheticFabric
+from aci_docgen.synthetic.server import FakeApic
+
+
+CREATED = '2024-01-01T00:00:00.000+00:00'
+
+
+def _audit_record(record_id, created, affected):
+    return ('aaaModLR', {'dn': f"subj-[{affected}]/mod-{record_id}", 'id': record_id, 'created': created,
+                         'affected': affected})
+
+
+@pytest.fixture
+def audited():
+    fabric = SyntheticFabric(tenants=3, aps=1, epgs_per_ap=1, static_paths_per_epg=1)
+    fabric.mos.append(_audit_record('1', CREATED, 'uni/tn-TN0000/BD-BD0-0'))
+    with FakeApic(fabric.mos) as apic:
+        yield apic
+
+
+def _previous_run(api, outdir, sections):
+    _, watermark = plan_incremental(api, outdir, sections)
+    data = run_harvest(api, sections)
+    os.makedirs(os.path.join(outdir, 'reports'))
+    with open(os.path.join(outdir, 'reports', 'summary.json'), 'wb') as f:
+        write_snapshot(f, data)
+    save_state(outdir, watermark, sections)
+    return data
+
+
+def _health(apic, vrf_dn):
+    return next(a for cls, a in apic.mos if cls == 'healthInst' and a['dn'] == f"{vrf_dn}/health")
+
+
+def test_reused_tenants_get_current_health(audited, sections, tmp_path):
+    api = AciApi(audited.url, 'admin', 'secret', retries=0)
+    data = _previous_run(api, str(tmp_path), sections)
+    vrf = data['tenants'][1]['vrfs'][0]
+    _health(audited, vrf['dn'])['cur'] = '42'
+
+    reuse, watermark = plan_incremental(api, str(tmp_path), sections)
+    assert watermark == {'created': CREATED, 'ids': ['1']}
+    assert set(reuse) == {'TN0000', 'TN0001', 'TN0002'}
+    assert reuse['TN0001']['vrfs'][0]['health'] == '42'
+    assert reuse['TN0000']['vrfs'][0]['health'] == data['tenants'][0]['vrfs'][0]['health']
+
+
+def test_missing_watermark_harvests_everything(audited, sections, tmp_path, capsys):
+    api = AciApi(audited.url, 'admin', 'secret', retries=0)
+    _previous_run(api, str(tmp_path), sections)
+    with open(tmp_path / 'reports' / STATE_FILE, 'w') as f:
+        json.dump({'watermark': None, 'sections': sections}, f)
+    reuse, _ = plan_incremental(api, str(tmp_path), sections, debug_enabled=True)
+    assert reuse == {}
+    assert 'no audit watermark' in capsys.readouterr().out
+
+
+def _harvested_tenants(api, sections, reuse, monkeypatch):
+    harvested = []
+    harvest = pipeline._harvest_and_release
+    monkeypatch.setattr(pipeline, '_harvest_and_release',
+                        lambda api, tn, sections: harvested.append(tn['name']) or harvest(api, tn, sections))
+    return run_harvest(api, sections, reuse=reuse), harvested
+
+
+def test_only_changed_tenants_are_harvested_again(audited, sections, tmp_path, monkeypatch):
+    api = AciApi(audited.url, 'admin', 'secret', retries=0)
+    _previous_run(api, str(tmp_path), sections)
+    audited.notify('fvBD', {'dn': 'uni/tn-TN0001/BD-BD0-0', 'arpFlood': 'changed'})
+    audited.notify(*_audit_record('2', '2024-01-02T00:00:00.000+00:00', 'uni/tn-TN0001/BD-BD0-0'), status='created')
+
+    reuse, watermark = plan_incremental(api, str(tmp_path), sections)
+    assert set(reuse) == {'TN0000', 'TN0002'}
+    assert watermark == {'created': '2024-01-02T00:00:00.000+00:00', 'ids': ['2']}
+    data, harvested = _harvested_tenants(api, sections, reuse, monkeypatch)
+    assert harvested == ['TN0001']
+    assert data['tenants'][1]['bds'][0]['arpFlood'] == 'changed'
+    assert data == run_harvest(api, sections)
+
+
+def test_change_logged_at_the_watermark_time_is_seen(audited, sections, tmp_path):
+    api = AciApi(audited.url, 'admin', 'secret', retries=0)
+    _previous_run(api, str(tmp_path), sections)
+    # Logged within the same timestamp as the newest record, after the last run read it
+    audited.notify(*_audit_record('2', CREATED, 'uni/tn-TN0002/BD-BD0-0'), status='created')
+    reuse, watermark = plan_incremental(api, str(tmp_path), sections)
+    assert set(reuse) == {'TN0000', 'TN0001'}
+    assert watermark == {'created': CREATED, 'ids': ['1', '2']}
+
+    save_state(str(tmp_path), CREATED, sections)
+    reuse, _ = plan_incremental(api, str(tmp_path), sections)
+    assert set(reuse) == {'TN0001'}
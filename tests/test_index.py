@@ -0,0 +1,71 @@
+from aci_docgen.utils.index import MoIndex, parent_dn
+
+
+def mo(cls, dn, **attrs):
+    return {cls: {'attributes': dict(dn=dn, **attrs)}}
+
+
+def sample():
+    return MoIndex([
+        mo('fvTenant', 'uni/tn-T'),
+        mo('fvBD', 'uni/tn-T/BD-B'),
+        mo('fvSubnet', 'uni/tn-T/BD-B/subnet-[10.0.0.1/24]', ip='10.0.0.1/24'),
+        mo('fvCtx', 'uni/tn-T/ctx-V'),
+        mo('fvBD', 'uni/tn-T/BD-C'),
+    ])
+
+
+def test_parent_dn_ignores_bracketed_slashes():
+    assert parent_dn('uni/tn-T/BD-B/subnet-[10.0.0.1/24]') == 'uni/tn-T/BD-B'
+    assert parent_dn('uni/tn-T/ap-A/epg-E/rspathAtt-[topology/pod-1/paths-101/pathep-[eth1/1]]') \
+        == 'uni/tn-T/ap-A/epg-E'
+    assert parent_dn('uni/tn-T') == 'uni'
+    assert parent_dn('uni') == ''
+    assert parent_dn('') == ''
+
+
+def test_lookups():
+    index = sample()
+    assert len(index) == 5
+    assert index.classes() == ['fvTenant', 'fvBD', 'fvSubnet', 'fvCtx']
+    assert [x['fvBD']['attributes']['dn'] for x in index.by_class('fvBD')] == ['uni/tn-T/BD-B', 'uni/tn-T/BD-C']
+    assert index.by_class('fvAEPg') == []
+    assert index.by_dn('uni/tn-T/ctx-V') == mo('fvCtx', 'uni/tn-T/ctx-V')
+    assert index.by_dn('uni/tn-T/ctx-X') is None
+    assert len(index.children('uni/tn-T')) == 3
+    assert len(index.children('uni/tn-T', 'fvBD')) == 2
+    assert index.children('uni/tn-T/BD-B') == [index.by_dn('uni/tn-T/BD-B/subnet-[10.0.0.1/24]')]
+
+
+def test_lookups_are_in_dn_order():
+    index = MoIndex(reversed(sample().imdata))
+    assert [x['fvBD']['attributes']['dn'] for x in index.by_class('fvBD')] == ['uni/tn-T/BD-B', 'uni/tn-T/BD-C']
+    assert [next(iter(x)) for x in index.children('uni/tn-T')] == ['fvBD', 'fvBD', 'fvCtx']
+    assert [next(iter(x)) for x in index.select('fvCtx', 'fvBD')] == ['fvBD', 'fvBD', 'fvCtx']
+    assert index.imdata[0] == mo('fvBD', 'uni/tn-T/BD-C')
+    index.add(mo('fvBD', 'uni/tn-T/BD-A'))
+    assert index.by_class('fvBD')[0] == mo('fvBD', 'uni/tn-T/BD-A')
+    assert index.children('uni/tn-T')[0] == mo('fvBD', 'uni/tn-T/BD-A')
+    assert index.select('fvAEPg') == []
+    assert index.select('fvAEPg', 'fvCtx') == index.by_class('fvCtx')
+
+
+def test_upsert_merges_attributes():
+    index = sample()
+    index.upsert(mo('fvBD', 'uni/tn-T/BD-B', descr='changed'))
+    assert len(index) == 5
+    assert index.by_dn('uni/tn-T/BD-B')['fvBD']['attributes']['descr'] == 'changed'
+    index.upsert(mo('fvBD', 'uni/tn-T/BD-D'))
+    assert len(index) == 6 and index.children('uni/tn-T', 'fvBD')[-1] is index.by_dn('uni/tn-T/BD-D')
+
+
+def test_remove_drops_the_subtree():
+    index = sample()
+    index.remove('uni/tn-T/BD-B')
+    assert len(index) == 3
+    assert index.by_dn('uni/tn-T/BD-B/subnet-[10.0.0.1/24]') is None
+    assert index.by_class('fvSubnet') == []
+    assert [x['fvBD']['attributes']['dn'] for x in index.children('uni/tn-T', 'fvBD')] == ['uni/tn-T/BD-C']
+    assert [next(iter(x)) for x in index.select('fvBD', 'fvCtx')] == ['fvBD', 'fvCtx']
+    index.remove('uni/tn-T/BD-missing')
+    assert len(index) == 3
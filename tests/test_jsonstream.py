@@ -0,0 +1,47 @@
+import json
+import time
+
+import pytest
+
+from aci_docgen.utils.jsonstream import ImdataStream, iter_imdata
+
+BODY = {'totalCount': '3', 'imdata': [
+    {'fvTenant': {'attributes': {'dn': 'uni/tn-Ä', 'descr': 'naïve – “quoted”'}}},
+    {'fvCtx': {'attributes': {'dn': 'uni/tn-Ä/ctx-V', 'pcTag': 16386}}},
+    {'count': 12345.5},
+], 'subscriptionId': '72057594037927937'}
+
+
+def _chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64, 1 << 16])
+def test_any_chunking(size):
+    data = json.dumps(BODY, ensure_ascii=False).encode('utf-8')
+    stream = ImdataStream(_chunks(data, size))
+    assert list(stream) == BODY['imdata']
+    assert stream.total_count == 3
+    assert stream.meta['subscriptionId'] == BODY['subscriptionId']
+
+
+def test_empty_and_malformed():
+    assert list(iter_imdata([b'{"totalCount":"0","imdata":[]}'])) == []
+    assert list(iter_imdata([b' {} '])) == []
+    with pytest.raises(ValueError):
+        list(iter_imdata([b'{"imdata":[{"a":1}', b'}']))
+
+
+def test_large_mo_is_linear():
+    # One tenant MO of several MB (rsp-subtree=full) used to be re-parsed for every 64 KiB chunk
+    children = [{'fvBD': {'attributes': {'dn': f'uni/tn-T/BD-{i}', 'name': f'BD{i}', 'descr': 'x' * 40}}}
+                for i in range(60000)]
+    mo = {'fvTenant': {'attributes': {'dn': 'uni/tn-T'}, 'children': children}}
+    data = json.dumps({'totalCount': '1', 'imdata': [mo]}).encode('utf-8')
+    assert len(data) > 5_000_000
+    start = time.perf_counter()
+    json.loads(data)
+    baseline = time.perf_counter() - start
+    start = time.perf_counter()
+    assert list(iter_imdata(_chunks(data, 1 << 16))) == [mo]
+    assert time.perf_counter() - start < 10 * baseline + 1
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from aci_docgen.pipeline import run_harvest
+from aci_docgen.renderers.manifest import OutputManifest
+from aci_docgen.renderers.markdown import MarkdownRenderer
+
+
+@pytest.fixture
+def data(api, sections):
+    return run_harvest(api, sections)
+
+
+def _mtimes(root):
+    return {os.path.relpath(os.path.join(d, f), root): os.stat(os.path.join(d, f)).st_mtime_ns
+            for d, _, files in os.walk(root) for f in files}
+
+
+def test_unchanged_pages_are_not_rewritten(data, tmp_path):
+    MarkdownRenderer(str(tmp_path), template_cache=None).render(data)
+    # The second run's changes.md reports "no changes" rather than a first snapshot
+    MarkdownRenderer(str(tmp_path), template_cache=None).render(data)
+    mtimes = _mtimes(tmp_path)
+    changes = MarkdownRenderer(str(tmp_path), template_cache=None).render(data)
+    assert changes['changed'] == [] and changes['removed'] == []
+    assert changes['unchanged'] > len(data['tenants'])
+    mtimes_after = _mtimes(tmp_path)
+    for bookkeeping in ('manifest.json', 'changed.json'):
+        path = os.path.join('reports', bookkeeping)
+        del mtimes[path], mtimes_after[path]
+    assert mtimes_after == mtimes
+
+    data['tenants'] = [t for t in data['tenants'] if t['name'] != 'TN0001']
+    changes = MarkdownRenderer(str(tmp_path), template_cache=None).render(data)
+    assert 'tenants/TN0001.md' in changes['removed']
+    assert 'index.md' in changes['changed']
+    assert not (tmp_path / 'tenants' / 'TN0001.md').exists()
+
+
+def test_rewritten_when_content_or_file_changes(tmp_path):
+    manifest = OutputManifest(str(tmp_path))
+    assert manifest.write('a/page.md', 'one')
+    manifest.save()
+
+    manifest = OutputManifest(str(tmp_path))
+    assert not manifest.write('a/page.md', 'one')
+    (tmp_path / 'a' / 'page.md').write_text('edited by hand')
+    assert manifest.write('a/page.md', 'one')
+    assert manifest.write('a/page.md', 'two')
+    assert (tmp_path / 'a' / 'page.md').read_text() == 'two'
+    with manifest.stream('a/streamed.md') as f:
+        f.write('text ')
+        f.write(b'and bytes')
+    assert manifest.save() == {'changed': ['a/page.md', 'a/streamed.md'], 'removed': [], 'unchanged': 1}
+    assert [name for name in os.listdir(tmp_path / 'a') if name.endswith('.tmp')] == []
+
+
+def test_failed_stream_keeps_the_old_file(tmp_path):
+    manifest = OutputManifest(str(tmp_path))
+    manifest.write('page.md', 'old')
+    with pytest.raises(RuntimeError):
+        with manifest.stream('page.md') as f:
+            f.write('partial')
+            raise RuntimeError('render failed')
+    assert (tmp_path / 'page.md').read_text() == 'old'
+    assert os.listdir(tmp_path) == ['page.md']
@@ -0,0 +1,43 @@
+import json
+
+from aci_docgen.metrics import Metrics
+from aci_docgen.pipeline import run_harvest
+from aci_docgen.renderers.markdown import MarkdownRenderer
+
+
+def test_run_metrics(api, apic, sections, tmp_path):
+    before = apic.requests
+    with api.metrics.phase('harvest'):
+        data = run_harvest(api, sections)
+    with api.metrics.phase('render'):
+        MarkdownRenderer(str(tmp_path / 'out'), metrics=api.metrics, template_cache=None).render(data)
+
+    api.metrics.write_json(str(tmp_path / 'metrics.json'))
+    with open(tmp_path / 'metrics.json', encoding='utf-8') as f:
+        metrics = json.load(f)
+    assert set(metrics['phases']) == {'harvest', 'render'}
+    assert metrics['requests']['count'] == apic.requests - before
+    assert metrics['requests']['mos'] > 0 and metrics['requests']['bytes'] > 0
+    totals = metrics['harvesters']['totals']
+    assert {'vrfs', 'bds', 'epgs', 'contracts', 'esg'} <= set(totals)
+    assert totals['vrfs']['count'] == len(data['tenants'])
+    assert len(metrics['templates']['by_output']) == sum(t['count'] for t in metrics['templates']['totals'].values())
+
+
+def test_prometheus_textfile(tmp_path):
+    metrics = Metrics()
+    metrics.record_request('https://apic/api/class/fvTenant.json', 0.5, 1000, 10, first_byte=0.1)
+    metrics.record_request('https://apic/api/class/fvTenant.json', 1.5, 3000, 30)
+    with metrics.harvester('vrfs', 'TN0'):
+        pass
+    metrics.record_template('tenant.md.j2', 'tenants/TN0.md', 0.25)
+    metrics.write_prometheus(str(tmp_path / 'aci.prom'))
+    lines = (tmp_path / 'aci.prom').read_text().splitlines()
+    samples = dict(line.rsplit(' ', 1) for line in lines if not line.startswith('#'))
+    assert samples['aci_docgen_apic_requests'] == '2'
+    assert samples['aci_docgen_apic_request_seconds'] == '2.0'
+    assert samples['aci_docgen_apic_response_bytes'] == '4000'
+    assert samples['aci_docgen_template_render_seconds{template="tenant.md.j2"}'] == '0.25'
+    assert 'aci_docgen_harvester_wall_seconds{harvester="vrfs"}' in samples
+    assert '# TYPE aci_docgen_apic_mos gauge' in lines
+    assert [p.name for p in tmp_path.iterdir()] == ['aci.prom']
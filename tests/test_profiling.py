@@ -0,0 +1,44 @@
+import os
+import pstats
+
+import pytest
+
+from aci_docgen.pipeline import run_harvest
+from aci_docgen.profiling import Profiler
+
+
+@pytest.fixture
+def profiler():
+    profiler = Profiler()
+    yield profiler
+    profiler.stop()
+
+
+def test_nested_stages_are_excluded_from_the_outer_one(profiler):
+    def busy(n):
+        return sum(i * i for i in range(n))
+
+    with profiler.stage('outer'):
+        with profiler.stage('inner', 'TN0'):
+            blob = bytearray(4 * 2**20)
+            busy(20000)
+        del blob
+    assert profiler.calls == {'inner': 1, 'outer': 1}
+    assert profiler.peaks[('inner', 'TN0')] >= 4 * 2**20
+    assert profiler.peaks[('outer', None)] >= 4 * 2**20
+    functions = {name: {func for _, _, func in pstats.Stats(profile).stats}
+                 for name, profile in profiler.profiles.items()}
+    assert 'busy' in functions['inner'] and 'busy' not in functions['outer']
+
+
+def test_profiled_harvest_report(api, sections, profiler, tmp_path):
+    api.metrics.profiler = profiler
+    with api.metrics.phase('harvest'):
+        data = run_harvest(api, sections)
+    assert profiler.calls['harvester:vrfs'] == len(data['tenants'])
+    profiler.write(str(tmp_path))
+    report = (tmp_path / 'profile.txt').read_text()
+    assert 'harvester:vrfs' in report and 'TN0000' in report
+    assert 'harvest.prof' in os.listdir(tmp_path / 'profile')
+    assert 'harvester_vrfs.prof' in os.listdir(tmp_path / 'profile')
+
@@ -0,0 +1,51 @@
+import filecmp
+import os
+
+import pytest
+
+from aci_docgen.pipeline import run_harvest
+from aci_docgen.renderers import markdown
+from aci_docgen.renderers.markdown import MarkdownRenderer
+
+
+@pytest.fixture
+def data(api, sections):
+    return run_harvest(api, sections)
+
+
+def _files(root):
+    return sorted(os.path.relpath(os.path.join(d, f), root) for d, _, files in os.walk(root) for f in files)
+
+
+def test_process_pool_matches_serial(data, tmp_path, monkeypatch):
+    MarkdownRenderer(str(tmp_path / 'serial'), template_cache=None).render(data)
+
+    monkeypatch.setattr(markdown.os, 'cpu_count', lambda: 4)
+    calls = []
+    parallel = MarkdownRenderer._render_parallel
+    monkeypatch.setattr(MarkdownRenderer, '_render_parallel',
+                        lambda self, d, n: calls.append(n) or parallel(self, d, n))
+    MarkdownRenderer(str(tmp_path / 'parallel'), processes=3, template_cache=None).render(data)
+    assert calls == [3]
+
+    serial, pooled = _files(tmp_path / 'serial'), _files(tmp_path / 'parallel')
+    assert serial == pooled
+    _, mismatch, errors = filecmp.cmpfiles(tmp_path / 'serial', tmp_path / 'parallel', serial, shallow=False)
+    assert mismatch == errors == []
+
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_failed_tenant_keeps_its_page(data, tmp_path, stream):
+    MarkdownRenderer(str(tmp_path), template_cache=None).render(data)
+    page = (tmp_path / 'tenants' / 'TN0001.md').read_text(encoding='utf-8')
+
+    # Next run: TN0001 fails, TN0002 is gone
+    tenants = [t for t in data['tenants'] if t['name'] not in ('TN0001', 'TN0002')]
+    renderer = MarkdownRenderer(str(tmp_path), template_cache=None)
+    if stream:
+        renderer.render_stream(iter([(t['name'], t) for t in tenants] + [('TN0001', None)]))
+    else:
+        renderer.render(dict(data, tenants=tenants, failed_tenants=['TN0001']))
+    assert (tmp_path / 'tenants' / 'TN0001.md').read_text(encoding='utf-8') == page
+    assert not (tmp_path / 'tenants' / 'TN0002.md').exists()
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from aci_docgen.aci_api import AciApi
+from aci_docgen.pipeline import run_harvest
+from aci_docgen.response_store import ResponseStore
+
+
+def test_replay_reproduces_the_recorded_harvest(tmp_path, apic, sections):
+    store = ResponseStore(str(tmp_path))
+    live = AciApi(apic.url, 'admin', 'secret', retries=0, page_size=5, store=store, store_mode='record')
+    expected = run_harvest(live, sections)
+    apic.stop()
+    offline = AciApi('replay', None, None, retries=0, page_size=5, store=store, store_mode='replay')
+    assert run_harvest(offline, sections) == expected
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+
+def test_partial_response_is_not_kept(tmp_path):
+    store = ResponseStore(str(tmp_path))
+    chunks = store.record('/api/class/fvTenant.json', iter([b'{"imdata"', b':[]}']))
+    next(chunks)
+    chunks.close()
+    assert '/api/class/fvTenant.json' not in store
+    assert os.listdir(tmp_path) == []
+    with pytest.raises(FileNotFoundError):
+        list(store.replay('/api/class/fvTenant.json'))
+    assert list(store.record('/api/class/fvTenant.json', iter([b'{"imdata"', b':[]}']))) == [b'{"imdata"', b':[]}']
+    assert b''.join(store.replay('/api/class/fvTenant.json')) == b'{"imdata":[]}'
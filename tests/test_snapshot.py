@@ -0,0 +1,166 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+
+import pytest
+
+from aci_docgen import snapshot
+from aci_docgen.snapshot import (COMPRESSIONS, FORMATS, SnapshotReader, find_snapshot, index_name, iter_snapshot,
+                                 parse_name, read_snapshot, snapshot_name, write_snapshot)
+
+DATA = {
+    'tenants': [
+        {'name': 'A', 'vrfs': [{'name': 'V1', 'health': '100'}], 'bds': []},
+        {'name': 'Bé', 'vrfs': [], 'bds': [{'name': 'B1', 'subnets': [{'ip': '10.0.0.1/24'}]}]},
+        {'name': 'C', 'epgs': [{'ap': 'AP', 'name': 'E', 'static_paths': list(range(50))}]},
+    ],
+    'failed_tenants': ['D'],
+}
+
+
+def _available(fmt, compression):
+    if fmt == 'msgpack':
+        pytest.importorskip('msgpack')
+    if compression == 'zstd':
+        pytest.importorskip('zstandard')
+
+
+def _write(directory, data, fmt='json', compression='none'):
+    path = os.path.join(directory, snapshot_name(fmt, compression))
+    with open(path, 'wb') as f:
+        writer = write_snapshot(f, data, fmt, compression)
+    return path, writer
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+@pytest.mark.parametrize('fmt', FORMATS)
+def test_roundtrip(tmp_path, fmt, compression):
+    _available(fmt, compression)
+    path, _ = _write(tmp_path, DATA, fmt, compression)
+    assert parse_name(path) == (fmt, compression)
+    assert find_snapshot(str(tmp_path)) == path
+    assert read_snapshot(path) == DATA
+    assert list(iter_snapshot(path)) == DATA['tenants']
+    with open(path, 'rb') as f:
+        first = f.read()
+    _write(tmp_path, DATA, fmt, compression)
+    with open(path, 'rb') as f:
+        assert f.read() == first
+
+
+def test_json_matches_json_dump(tmp_path):
+    path, _ = _write(tmp_path, DATA)
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == json.dumps(DATA, indent=2, ensure_ascii=False)
+    empty = io.BytesIO()
+    write_snapshot(empty, {'tenants': []})
+    assert empty.getvalue().decode() == json.dumps({'tenants': []}, indent=2)
+
+
+def test_unknown_names(tmp_path):
+    with pytest.raises(ValueError):
+        parse_name('summary.txt')
+    with pytest.raises(ValueError):
+        write_snapshot(io.BytesIO(), DATA, fmt='xml')
+    assert find_snapshot(str(tmp_path)) is None
+
+
+def _write_indexed(directory, data, fmt='json'):
+    path, writer = _write(directory, data, fmt)
+    with open(index_name(path), 'w', encoding='utf-8') as f:
+        json.dump(writer.index(), f)
+    return path
+
+
+@pytest.mark.parametrize('fmt', FORMATS)
+def test_indexed_reader(tmp_path, fmt):
+    _available(fmt, 'none')
+    path = _write_indexed(tmp_path, DATA, fmt)
+    with SnapshotReader(path) as snap:
+        assert snap.indexed
+        assert snap.names() == ['A', 'Bé', 'C']
+        assert snap.tenant('Bé') == DATA['tenants'][1]
+        assert snap.tenants(['C', 'A']) == [DATA['tenants'][2], DATA['tenants'][0]]
+        with pytest.raises(KeyError):
+            snap.tenant('D')
+
+
+def test_index_of_a_rewritten_snapshot_is_ignored(tmp_path):
+    path = _write_indexed(tmp_path, DATA)
+    # Same size, other content: the size alone would pass
+    renamed = json.loads(json.dumps(DATA).replace('"V1"', '"V2"'))
+    index = open(index_name(path), encoding='utf-8').read()
+    _write(tmp_path, renamed)
+    assert open(index_name(path), encoding='utf-8').read() == index
+    with SnapshotReader(path) as snap:
+        assert snap.tenant('A')['vrfs'][0]['name'] == 'V2'
+        assert not snap.indexed
+
+
+def test_index_next_to_another_snapshot_is_ignored(tmp_path):
+    path = _write_indexed(tmp_path, DATA)
+    other = tmp_path / 'other'
+    other.mkdir()
+    target = _write_indexed(other, {'tenants': DATA['tenants'][::-1]})
+    shutil.copy(index_name(path), index_name(target))
+    with SnapshotReader(target) as snap:
+        assert snap.tenant('A') == DATA['tenants'][0]
+        assert not snap.indexed
+        assert snap.failed_tenants() == []
+
+
+def test_rewritten_trailer_is_not_trusted(tmp_path):
+    path = _write_indexed(tmp_path, DATA)
+    _write(tmp_path, dict(DATA, failed_tenants=['E']))
+    with SnapshotReader(path) as snap:
+        assert snap.failed_tenants() == ['E']
+        assert not snap.indexed
+
+
+def test_lookup_hashes_only_its_entry(tmp_path, monkeypatch):
+    data = {'tenants': [{'name': f"T{i}", 'bds': [{'name': f"B{j}"} for j in range(200)]} for i in range(200)]}
+    path = _write_indexed(tmp_path, data)
+    hashed = []
+    sha256 = hashlib.sha256
+
+    class Counting:
+        def __init__(self, data=b''):
+            self.digest = sha256()
+            self.update(data)
+
+        def update(self, data):
+            hashed.append(len(data))
+            self.digest.update(data)
+
+        def hexdigest(self):
+            return self.digest.hexdigest()
+    monkeypatch.setattr(snapshot.hashlib, 'sha256', Counting)
+    with SnapshotReader(path) as snap:
+        assert snap.tenant('T7') == data['tenants'][7]
+    assert sum(hashed) < os.path.getsize(path) / 100
+
+def test_copied_snapshot_keeps_its_index(tmp_path):
+    path = _write_indexed(tmp_path, DATA)
+    copy = tmp_path / 'copy'
+    copy.mkdir()
+    shutil.copy(path, copy)
+    shutil.copy(index_name(path), copy)
+    target = str(copy / os.path.basename(path))
+    os.utime(target, ns=(0, 1))
+    with SnapshotReader(target) as snap:
+        assert snap.indexed
+        assert snap.tenant('C') == DATA['tenants'][2]
+
+
+@pytest.mark.parametrize('indexed', [True, False])
+@pytest.mark.parametrize('fmt', FORMATS)
+def test_failed_tenants(tmp_path, fmt, indexed):
+    _available(fmt, 'none')
+    for data, failed in ((DATA, ['D']), ({'tenants': DATA['tenants']}, []), ({'tenants': [], 'failed_tenants': ['X']}, ['X'])):
+        path = _write_indexed(tmp_path, data, fmt) if indexed else _write(tmp_path, data, fmt)[0]
+        with SnapshotReader(path) as snap:
+            assert snap.failed_tenants() == failed
+        if indexed:
+            os.remove(index_name(path))
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from aci_docgen.pipeline import iter_harvest, run_harvest
+from aci_docgen.sqlite_store import SnapshotDb, format_table
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = SnapshotDb(str(tmp_path / 'history' / 'aci.db'))
+    yield db
+    db.close()
+
+
+def _rows(db, snapshot_id):
+    """Every row of a snapshot, without its id, per table."""
+    tables = ('tenants', 'vrfs', 'bds', 'subnets', 'epgs', 'static_paths', 'contracts', 'l3outs', 'l2outs', 'esgs')
+    return {t: sorted(r[1:] for r in db.query(f"SELECT * FROM {t} WHERE snapshot_id = ?", (snapshot_id,))[1])
+            for t in tables}
+
+
+def test_write_and_record_store_the_same_rows(api, sections, db):
+    data = run_harvest(api, sections)
+    data['failed_tenants'] = ['TN9999']
+    written = db.write(data, source='https://apic', mode='subtree', sections=sections)
+
+    tenants = db.record(iter_harvest(api, sections), source='https://apic', mode='subtree')
+    assert [name for name, _ in tenants] == [t['name'] for t in data['tenants']]
+    recorded = db.snapshots()[1][-1][0]
+
+    rows = _rows(db, written)
+    assert all(rows.values())
+    assert rows == _rows(db, recorded)
+    columns, rows = db.snapshots()
+    assert columns == ['id', 'created', 'source', 'mode', 'tenants', 'failed_tenants']
+    assert [(r[0], r[4], r[5]) for r in rows] == [(written, 4, '["TN9999"]'), (recorded, 4, None)]
+
+
+def test_columns_keep_types_and_json(api, sections, db):
+    data = run_harvest(api, sections)
+    snapshot_id = db.write(data)
+    _, rows = db.query("SELECT tenant, name, domains, data FROM epgs WHERE snapshot_id = ? ORDER BY tenant, name",
+                       (snapshot_id,))
+    entry = data['tenants'][0]['epgs'][0]
+    assert rows[0][:2] == ('TN0000', entry['name'])
+    assert json.loads(rows[0][2]) == entry['domains']
+    assert json.loads(rows[0][3]) == entry
+    _, subnets = db.query("SELECT count(*) FROM subnets WHERE snapshot_id = ?", (snapshot_id,))
+    assert subnets[0][0] == sum(len(bd.get('subnets') or []) for t in data['tenants'] for bd in t['bds'])
+
+
+def test_failed_recording_is_rolled_back(db):
+    with pytest.raises(RuntimeError):
+        with db.recording() as recording:
+            recording.add({'name': 'TN0', 'vrfs': [{'name': 'V'}]})
+            raise RuntimeError('harvest failed')
+    assert db.snapshots()[1] == []
+    assert db.query("SELECT count(*) FROM vrfs")[1] == [(0,)]
+
+
+def test_deleting_a_snapshot_cascades(db):
+    snapshot_id = db.write({'tenants': [{'name': 'TN0', 'bds': [{'name': 'B', 'subnets': [{'ip': '10.0.0.1/24'}]}]}]})
+    with db.conn:
+        db.conn.execute("DELETE FROM snapshots WHERE id = ?", (snapshot_id,))
+    assert db.query("SELECT count(*) FROM subnets")[1] == [(0,)]
+
+
+def test_format_table():
+    assert format_table(['id', 'name'], [(1, 'TN0000'), (12, None)]) == (
+        "id  name\n"
+        "--  ------\n"
+        "1   TN0000\n"
+        "12")
@@ -0,0 +1,44 @@
+import filecmp
+import os
+
+import pytest
+
+from aci_docgen import pipeline
+from aci_docgen.aci_api import AciApi
+from aci_docgen.pipeline import iter_harvest, run_harvest
+from aci_docgen.renderers.markdown import MarkdownRenderer
+from aci_docgen.synthetic.fabric import SyntheticFabric
+from aci_docgen.synthetic.server import FakeApic
+
+
+def _files(root):
+    return sorted(os.path.relpath(os.path.join(d, f), root) for d, _, files in os.walk(root) for f in files)
+
+
+@pytest.mark.parametrize('snapshot_format', ['json', 'ndjson'])
+def test_stream_matches_render(api, sections, tmp_path, snapshot_format):
+    MarkdownRenderer(str(tmp_path / 'render'), template_cache=None,
+                     snapshot_format=snapshot_format).render(run_harvest(api, sections))
+    MarkdownRenderer(str(tmp_path / 'stream'), template_cache=None,
+                     snapshot_format=snapshot_format).render_stream(iter_harvest(api, sections, workers=2))
+
+    rendered, streamed = _files(tmp_path / 'render'), _files(tmp_path / 'stream')
+    assert rendered == streamed
+    _, mismatch, errors = filecmp.cmpfiles(tmp_path / 'render', tmp_path / 'stream', rendered, shallow=False)
+    assert mismatch == errors == []
+
+
+def test_harvest_stays_a_bounded_window_ahead(sections, monkeypatch):
+    harvested = []
+    harvest = pipeline._harvest_and_release
+    monkeypatch.setattr(pipeline, '_harvest_and_release',
+                        lambda api, tn, sections: harvested.append(tn['name']) or harvest(api, tn, sections))
+    fabric = SyntheticFabric(tenants=10, aps=1, epgs_per_ap=1)
+    workers = 2
+    with FakeApic(fabric.mos) as apic:
+        tenants = iter_harvest(AciApi(apic.url, 'admin', 'secret', retries=0), sections, workers=workers)
+        name, entry = next(tenants)
+        assert name == entry['name'] == 'TN0000'
+        assert len(harvested) <= 2 * workers
+        assert [name for name, _ in tenants] == [f"TN{i:04d}" for i in range(1, 10)]
+    assert sorted(harvested) == [f"TN{i:04d}" for i in range(10)]
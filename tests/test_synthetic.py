@@ -0,0 +1,75 @@
+import json
+
+import pytest
+import requests
+
+from aci_docgen.synthetic.fabric import SyntheticFabric
+from aci_docgen.synthetic.server import FakeApic, parse_filter
+from aci_docgen.utils.index import parent_dn
+
+
+def test_fabric_is_deterministic():
+    assert SyntheticFabric(tenants=3, seed=7).mos == SyntheticFabric(tenants=3, seed=7).mos
+    assert SyntheticFabric(tenants=3, seed=7).mos != SyntheticFabric(tenants=3, seed=8).mos
+    with pytest.raises(ValueError):
+        SyntheticFabric(tenants=1, leaves=4)
+
+
+def test_fabric_parents_come_first(fabric):
+    seen = set()
+    for _, a in fabric.mos:
+        parent = parent_dn(a['dn'])
+        assert parent == 'uni' or parent in seen
+        seen.add(a['dn'])
+    assert fabric.tenant_dns() == ['uni/tn-common'] + [f"uni/tn-TN{i:04d}" for i in range(4)]
+
+
+def test_fabric_json_nests_every_mo(fabric, tmp_path):
+    fabric.write_json(str(tmp_path / 'fabric.json'))
+    with open(tmp_path / 'fabric.json', encoding='utf-8') as f:
+        imdata = json.load(f)['imdata']
+
+    def count(items):
+        return sum(1 + count(body.get('children', [])) for item in items for body in item.values())
+    assert count(imdata) == len(fabric.mos)
+    assert all(parent_dn(next(iter(item.values()))['attributes']['dn']) == 'uni' for item in imdata)
+
+
+def test_parse_filter():
+    attrs = {'name': 'web-01', 'vlan': '120', 'descr': 'a,b'}
+    assert parse_filter('eq(fvAEPg.name,"web-01")')(attrs)
+    assert parse_filter('and(wcard(fvAEPg.name,"^web"),gt(fvAEPg.vlan,"100"))')(attrs)
+    assert not parse_filter('or(ne(fvAEPg.name,"web-01"),lt(fvAEPg.vlan,"100"))')(attrs)
+    assert parse_filter('not(eq(fvAEPg.descr,"a,b,c"))')(attrs)
+    assert parse_filter('eq(fvAEPg.descr,"a,b")')(attrs)
+    for bad in ('name', 'eq(fvAEPg.name)', 'near(fvAEPg.name,"x")'):
+        with pytest.raises(ValueError):
+            parse_filter(bad)
+
+
+def get(apic, path, **params):
+    r = requests.get(f"{apic.url}{path}", params=params, cookies={'APIC-cookie': 'synthetic-apic-token'})
+    return r.status_code, r.json()
+
+
+def dns(body):
+    return [next(iter(item.values()))['attributes']['dn'] for item in body['imdata']]
+
+
+def test_fake_apic_queries(apic):
+    status, body = get(apic, '/api/node/mo/uni/tn-TN0000.json', **{
+        'query-target': 'subtree', 'target-subtree-class': 'fvBD', 'order-by': 'fvBD.dn|desc',
+        'page-size': '3', 'page': '1'})
+    assert status == 200
+    assert int(body['totalCount']) == 8
+    assert dns(body) == sorted(dns(get(apic, '/api/class/fvBD.json', **{
+        'query-target-filter': 'wcard(fvBD.dn,"^uni/tn-TN0000/")'})[1]), reverse=True)[3:6]
+
+    _, body = get(apic, '/api/node/mo/uni/tn-TN0000/ctx-VRF0.json', **{
+        'rsp-subtree': 'children', 'rsp-subtree-class': 'healthInst'})
+    ctx, = body['imdata']
+    assert {next(iter(c)) for c in ctx['fvCtx']['children']} == {'healthInst'}
+
+    assert get(apic, '/api/node/mo/uni/tn-missing.json') == (200, {'totalCount': '0', 'imdata': []})
+    assert get(apic, '/api/class/fvBD.json', **{'query-target-filter': 'bad'})[0] == 400
+    assert requests.get(f"{apic.url}/api/class/fvBD.json").status_code == 403
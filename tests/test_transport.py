@@ -0,0 +1,61 @@
+import os
+import stat
+import time
+
+from aci_docgen.aci_api import AciApi
+from aci_docgen.transport import SessionToken, TokenCache
+
+
+def test_session_token_from_login_response():
+    token = SessionToken.from_response({'imdata': [{'aaaLogin': {'attributes': {
+        'token': 'abc', 'refreshTimeoutSeconds': '300'}}}]})
+    assert (token.token, token.lifetime) == ('abc', 300)
+    assert not token.needs_refresh() and not token.expired()
+    assert SessionToken.from_response({'imdata': []}) is None
+    old = SessionToken('abc', 300, issued=time.time() - 200)
+    assert old.needs_refresh() and not old.expired()
+
+
+def test_token_cache_is_private_and_drops_expired(tmp_path):
+    cache = TokenCache(str(tmp_path / 'tokens.json'))
+    cache.put('https://apic', 'admin', SessionToken('old', 60, issued=time.time() - 120))
+    assert cache.get('https://apic', 'admin') is None
+    cache.put('https://apic2', 'admin', SessionToken('live'))
+    assert cache.get('https://apic2', 'admin').token == 'live'
+    assert 'admin@https://apic' not in cache._load()
+    assert stat.S_IMODE(os.stat(cache.path).st_mode) == 0o600
+    cache.put('https://apic2', 'admin', None)
+    assert cache.get('https://apic2', 'admin') is None
+
+
+def test_cached_token_skips_login(tmp_path, apic):
+    cache = TokenCache(str(tmp_path / 'tokens.json'))
+    AciApi(apic.url, 'admin', 'secret', retries=0, token_cache=cache)
+    api = AciApi(apic.url, 'admin', 'secret', retries=0, token_cache=cache)
+    assert apic.logins == 1
+    assert len(api.class_query('fvTenant')['imdata']) == 5
+
+
+def test_stale_cached_token_logs_in_again(tmp_path, apic):
+    cache = TokenCache(str(tmp_path / 'tokens.json'))
+    cache.put(apic.url, 'admin', SessionToken('revoked'))
+    api = AciApi(apic.url, 'admin', 'secret', retries=0, token_cache=cache)
+    assert apic.logins == 1
+    assert cache.get(apic.url, 'admin').token == api.token != 'revoked'
+
+
+def test_rejected_session_logs_in_once(api, apic):
+    api.members[0].s.cookies.clear()
+    api.members[0].s.cookies.set('APIC-cookie', 'expired')
+    assert len(api.class_query('fvTenant')['imdata']) == 5
+    assert apic.logins == 2
+
+
+def test_token_refreshed_before_it_expires(api, apic):
+    member = api.members[0]
+    member.session_token.issued -= member.session_token.lifetime * 0.75
+    before = apic.requests
+    api.class_query('fvTenant')
+    assert apic.requests == before + 2
+    assert not member.session_token.needs_refresh()
+    assert apic.logins == 1
@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+
+import pytest
+
+from aci_docgen import watch
+from aci_docgen.aci_api import AciApi
+from aci_docgen.renderers.markdown import MarkdownRenderer
+from aci_docgen.snapshot import read_snapshot
+from aci_docgen.watch import FabricWatcher, RecordedEvents, WebsocketEvents
+
+
+def _wait(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def _bd(watcher, tenant, name):
+    entry = watcher.entries.get(f"uni/tn-{tenant}", {})
+    return next((bd for bd in entry.get('bds', []) if bd['name'] == name), {})
+
+
+@pytest.fixture
+def watching(apic, sections, tmp_path, monkeypatch):
+    pytest.importorskip('websocket')
+    monkeypatch.setattr(watch, 'SUBSCRIPTION_REFRESH_SECONDS', 0.05)
+    api = AciApi(apic.url, 'admin', 'secret', retries=0)
+    renderer = MarkdownRenderer(str(tmp_path), template_cache=None)
+    watcher = FabricWatcher(api, sections, renderer, debounce=0.05)
+    # Subscriptions only get events while the websocket is open: connect, then subscribe
+    events = WebsocketEvents(api.events_url)
+    assert _wait(lambda: apic.connected == 1)
+    watcher.start()
+    done = []
+    thread = threading.Thread(target=lambda: done.append(watcher.run(events)), daemon=True)
+    thread.start()
+    yield watcher
+    watcher.stop()
+    thread.join(10)
+    assert done, 'watcher did not stop'
+
+
+def test_events_over_websocket(apic, watching, tmp_path):
+    assert _bd(watching, 'TN0001', 'BD0-0')['arpFlood'] in ('yes', 'no')
+    assert apic.notify('fvBD', {'dn': 'uni/tn-TN0001/BD-BD0-0', 'arpFlood': 'maybe'}) == 1
+    assert _wait(lambda: _bd(watching, 'TN0001', 'BD0-0')['arpFlood'] == 'maybe')
+    assert _wait(lambda: 'maybe' in (tmp_path / 'tenants' / 'TN0001.md').read_text(encoding='utf-8'))
+
+    apic.notify('fvBD', {'dn': 'uni/tn-TN0002/BD-BD9', 'name': 'BD9', 'arpFlood': 'no'}, status='created')
+    assert _wait(lambda: _bd(watching, 'TN0002', 'BD9'))
+    apic.notify('fvBD', {'dn': 'uni/tn-TN0002/BD-BD9'}, status='deleted')
+    assert _wait(lambda: not _bd(watching, 'TN0002', 'BD9'))
+
+
+def test_subscriptions_are_refreshed(apic, watching):
+    assert watching.subscription_ids
+    assert _wait(lambda: all(apic.refreshes.get(sid, 0) >= 2 for sid in watching.subscription_ids))
+
+
+def test_reconnect_resubscribes(apic, watching):
+    old = list(watching.subscription_ids)
+    apic.disconnect()
+    assert _wait(lambda: watching.subscription_ids and watching.subscription_ids != old and apic.connected == 1)
+    assert not set(old) & set(apic.subscriptions)
+    apic.notify('fvBD', {'dn': 'uni/tn-TN0003/BD-BD0-0', 'arpFlood': 'after-reconnect'})
+    assert _wait(lambda: _bd(watching, 'TN0003', 'BD0-0').get('arpFlood') == 'after-reconnect')
+
+
+def test_subscriptions_need_an_open_websocket(api, apic):
+    _, subscription_id = api.subscribe_class('fvBD')
+    assert subscription_id in apic.detached
+    assert apic.notify('fvBD', {'dn': 'uni/tn-TN0001/BD-BD0-0', 'arpFlood': 'lost'}) == 0
+
+
+def test_recorded_events_are_replayed(api, sections, tmp_path):
+    out = tmp_path / 'out'
+    watcher = FabricWatcher(api, sections, MarkdownRenderer(str(out), template_cache=None), debounce=60)
+    watcher.start()
+    assert (out / 'tenants' / 'TN0003.md').exists()
+    messages = [
+        ('fvBD', {'dn': 'uni/tn-TN0001/BD-BD0-0', 'arpFlood': 'replayed', 'status': 'modified'}),
+        ('fvBD', {'dn': 'uni/tn-TN0002/BD-BD9', 'name': 'BD9', 'arpFlood': 'no', 'status': 'created'}),
+        ('fvBD', {'dn': 'uni/tn-TN0001/BD-BD0-1', 'status': 'deleted'}),
+        ('fvTenant', {'dn': 'uni/tn-TN0003', 'status': 'deleted'}),
+    ]
+    recording = tmp_path / 'events.ndjson'
+    recording.write_text('\n'.join(json.dumps({'subscriptionId': ['1'], 'imdata': [{cls: {'attributes': a}}]})
+                                   for cls, a in messages) + '\n\n', encoding='utf-8')
+
+    watcher.run(RecordedEvents(str(recording)), keepalive=False)
+    tn1 = (out / 'tenants' / 'TN0001.md').read_text(encoding='utf-8')
+    assert 'replayed' in tn1 and 'BD0-1' not in tn1
+    assert 'BD9' in (out / 'tenants' / 'TN0002.md').read_text(encoding='utf-8')
+    assert not (out / 'tenants' / 'TN0003.md').exists()
+    assert 'TN0003' not in (out / 'index.md').read_text(encoding='utf-8')
+    assert [t['name'] for t in read_snapshot(str(out / 'reports' / 'summary.json'))['tenants']] == \
+        ['TN0000', 'TN0001', 'TN0002']